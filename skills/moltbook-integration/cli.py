@@ -37,9 +37,19 @@ class MoltbookCLI:
         result = await self.integration.post_to_moltbook(content, topic, tags)
         self._print_result(result)
     
-    async def handle_feed(self, limit: int):
+    async def handle_feed(self, limit: int, stream_all: bool = False, ranked: bool = False):
         """处理获取动态命令"""
-        result = await self.integration.get_feed(limit)
+        if stream_all:
+            # 按游标逐页遍历完整时间线
+            count = 0
+            async for post in self.integration.stream_feed():
+                print(post)
+                print()
+                count += 1
+            print(f"✅ 共{count}条动态")
+            return
+        
+        result = await self.integration.get_feed(limit, ranked)
         self._print_result(result)
     
     async def handle_reply(self, post_id: str, content: str):
@@ -90,9 +100,9 @@ class MoltbookCLI:
         
         print("=" * 40)
     
-    async def handle_history(self, limit: int):
+    async def handle_history(self, limit: int, offset: int = 0):
         """处理历史命令"""
-        history = self.integration.get_interaction_history(limit)
+        history = self.integration.get_interaction_history(limit, offset)
         
         if not history:
             print("📭 暂无交互历史")
@@ -101,7 +111,7 @@ class MoltbookCLI:
         print(f"📜 最近{len(history)}次交互历史")
         print("=" * 40)
         
-        for i, record in enumerate(reversed(history), 1):
+        for i, record in enumerate(reversed(history), offset + 1):
             record_type = record['type']
             timestamp = record['timestamp'][:19].replace('T', ' ')
             
@@ -169,12 +179,15 @@ async def main():
 使用示例:
   %(prog)s post "Hello Moltbook!" --topic greeting
   %(prog)s feed --limit 10
+  %(prog)s feed --all
+  %(prog)s feed --ranked
   %(prog)s reply post_123 "Great post!"
   %(prog)s search --interests ai,technology
   %(prog)s converse --ai ai_tech_expert --message "Let's discuss AI ethics"
   %(prog)s analytics --timeframe 7d
   %(prog)s status
   %(prog)s history --limit 20
+  %(prog)s history --limit 20 --offset 20
         """
     )
     
@@ -228,6 +241,16 @@ async def main():
         default=10,
         help='显示数量限制'
     )
+    feed_parser.add_argument(
+        '--all', '-a',
+        action='store_true',
+        help='遍历完整动态流'
+    )
+    feed_parser.add_argument(
+        '--ranked', '-r',
+        action='store_true',
+        help='按作者社交评分和时间衰减排序'
+    )
     
     # reply命令
     reply_parser = subparsers.add_parser(
@@ -325,6 +348,12 @@ async def main():
         default=10,
         help='显示数量限制'
     )
+    history_parser.add_argument(
+        '--offset', '-o',
+        type=int,
+        default=0,
+        help='跳过最近的记录数（翻页查看更早的历史）'
+    )
     
     # 解析参数
     global args
@@ -346,7 +375,7 @@ async def main():
             await cli.handle_post(args.content, args.topic, args.tags)
         
         elif args.command == 'feed':
-            await cli.handle_feed(args.limit)
+            await cli.handle_feed(args.limit, args.all, args.ranked)
         
         elif args.command == 'reply':
             await cli.handle_reply(args.post_id, args.content)
@@ -367,7 +396,7 @@ async def main():
             await cli.handle_status()
         
         elif args.command == 'history':
-            await cli.handle_history(args.limit)
+            await cli.handle_history(args.limit, args.offset)
     
     except KeyboardInterrupt:
         print("\n👋 操作已取消")
@@ -379,6 +408,10 @@ async def main():
             import traceback
             traceback.print_exc()
         sys.exit(1)
+    
+    finally:
+        if cli.integration is not None:
+            await cli.integration.close()
 
 
 if __name__ == '__main__':
@@ -4,17 +4,27 @@ Moltbook API客户端
 支持真实API和模拟模式
 """
 
+import base64
+import copy
 import json
+import heapq
 import time
 import random
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Union, Tuple, AsyncIterator, Iterable
 from enum import Enum
 import aiohttp
 import asyncio
-from dataclasses import dataclass, asdict
 
 from .identity import AIIdentity, get_identity_manager
+from .models import Post, Conversation
+from .simulation_store import SimulationStore
+from .simulation_journal import SimulationJournal
+from .similarity_index import SimilarityIndex, feature_vector
+from .social_graph import SocialGraph
+from .resilience import CircuitBreaker, RetryPolicy
 
 
 class APIMode(Enum):
@@ -26,100 +36,204 @@ class APIMode(Enum):
 
 class APIError(Exception):
     """API错误异常"""
-    pass
-
-
-@dataclass
-class Post:
-    """帖子数据类"""
-    id: str
-    ai_id: str
-    content: str
-    timestamp: datetime
-    topic: str = "general"
-    tags: List[str] = None
-    replies: List['Post'] = None
-    likes: int = 0
-    shares: int = 0
-    visibility: str = "public"  # public, followers, private
-    
-    def __post_init__(self):
-        if self.tags is None:
-            self.tags = []
-        if self.replies is None:
-            self.replies = []
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """转换为字典"""
-        data = asdict(self)
-        data['timestamp'] = self.timestamp.isoformat()
-        data['replies'] = [reply.to_dict() for reply in self.replies]
-        return data
+    
+    def __init__(self, message: str, status: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after  # 服务端Retry-After给出的等待秒数
+    
+    @property
+    def transient(self) -> bool:
+        """是否为暂时性错误（网络错误、限流或服务端错误）"""
+        return self.status is None or self.status == 429 or self.status >= 500
 
 
-@dataclass
-class Conversation:
-    """对话数据类"""
-    id: str
-    participants: List[str]  # AI ID列表
-    messages: List[Dict[str, Any]]
-    topic: str = ""
-    created_at: datetime = None
-    last_message_at: datetime = None
-    status: str = "active"  # active, closed, archived
-    
-    def __post_init__(self):
-        if self.created_at is None:
-            self.created_at = datetime.now()
-        if self.last_message_at is None:
-            self.last_message_at = self.created_at
-    
-    def add_message(self, ai_id: str, content: str):
-        """添加消息"""
-        message = {
-            "id": f"msg_{len(self.messages) + 1}",
-            "ai_id": ai_id,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        }
-        self.messages.append(message)
-        self.last_message_at = datetime.now()
+class ResponseCache:
+    """
+    只读接口的响应缓存
+    按端点设置TTL，按条目数和字节数做LRU淘汰。
+    写入时保存副本、命中时返回副本，调用方修改返回值不会影响缓存。
+    实现get/set/invalidate/clear/stats即可替换为其他缓存后端
+    """
+    
+    DEFAULT_TTLS = {
+        "feed": 15,
+        "conversation": 30,
+        "search_ais": 120,
+        "analytics": 300
+    }
+    
+    def __init__(self, ttls: Dict[str, float] = None, max_entries: int = 1024,
+                 max_bytes: int = 8 * 1024 * 1024, default_ttl: float = 60):
+        self.ttls = dict(self.DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        
+        # key -> (过期时间, 字节数, 值)，按最近使用顺序排列
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._keys_by_endpoint: Dict[str, set] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: tuple) -> Tuple[bool, Any]:
+        """查询缓存，返回(是否命中, 值)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return False, None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, copy.deepcopy(value)
+    
+    def set(self, key: tuple, value: Any):
+        """写入缓存，key的第一项为端点名"""
+        ttl = self.ttls.get(key[0], self.default_ttl)
+        if ttl <= 0:
+            return
+        
+        size = len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, size, copy.deepcopy(value))
+        self._keys_by_endpoint.setdefault(key[0], set()).add(key)
+        self.total_bytes += size
+        
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
     
-    def to_dict(self) -> Dict[str, Any]:
-        """转换为字典"""
+    def invalidate(self, endpoint: str, predicate=None) -> int:
+        """失效指定端点的缓存，predicate(key)为真时才删除"""
+        keys = [
+            key for key in self._keys_by_endpoint.get(endpoint, ())
+            if predicate is None or predicate(key)
+        ]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+    
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self._keys_by_endpoint.clear()
+        self.total_bytes = 0
+    
+    def _remove(self, key: tuple):
+        _, size, _ = self._entries.pop(key)
+        self._keys_by_endpoint[key[0]].discard(key)
+        self.total_bytes -= size
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        lookups = self.hits + self.misses
         return {
-            "id": self.id,
-            "participants": self.participants,
-            "messages": self.messages,
-            "topic": self.topic,
-            "created_at": self.created_at.isoformat(),
-            "last_message_at": self.last_message_at.isoformat(),
-            "status": self.status
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
         }
 
 
 class MoltbookAPIClient:
     """Moltbook API客户端"""
     
-    def __init__(self, config: Dict[str, Any]):
+    # 模拟数据的动态游标前缀，用于区分真实API返回的不透明游标
+    SIM_CURSOR_PREFIX = "sim:"
+    
+    def __init__(self, config: Dict[str, Any], cache: Optional[ResponseCache] = None):
         self.config = config
         self.mode = APIMode(config.get('mode', 'simulation'))
         self.base_url = config.get('api', {}).get('endpoint', 'https://api.moltbook.ai/v1')
         self.api_key = config.get('api', {}).get('api_key')
         self.timeout = config.get('api', {}).get('timeout', 30)
         
-        # 模拟数据存储
-        self.simulation_data = {
-            'posts': [],
-            'conversations': [],
-            'ai_profiles': [],
-            'next_post_id': 1,
-            'next_conv_id': 1
-        }
+        # 连接池配置（所有API调用共享一个会话）
+        pool_config = config.get('api', {}).get('connection_pool', {})
+        self.pool_limit = pool_config.get('limit', 100)
+        self.pool_limit_per_host = pool_config.get('limit_per_host', 20)
+        self.keepalive_timeout = pool_config.get('keepalive_timeout', 30)
+        self.dns_cache_ttl = pool_config.get('dns_cache_ttl', 300)
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        # 批量请求配置
+        batch_config = config.get('api', {}).get('batch', {})
+        self.batch_chunk_size = batch_config.get('chunk_size', 50)
+        self.batch_concurrency = batch_config.get('max_concurrency', 8)
+        self._batch_unsupported = set()  # 服务端不支持批量接口的端点
+        
+        # HYBRID模式下每个端点一个熔断器
+        self.circuit_breaker_config = config.get('api', {}).get('circuit_breaker', {})
+        self._breakers: Dict[str, CircuitBreaker] = {}
         
-        # 初始化模拟数据
+        # 所有端点共享的重试策略
+        self.retry_policy = RetryPolicy.from_config(
+            config.get('api', {}).get('retry', {}),
+            max_retries=config.get('api', {}).get('retry_attempts', 3)
+        )
+        
+        # 只读接口的响应缓存
+        cache_config = config.get('cache', {})
+        if cache is not None:
+            self.cache = cache
+        elif cache_config.get('enabled', True):
+            self.cache = ResponseCache(
+                ttls=cache_config.get('ttl'),
+                max_entries=cache_config.get('max_entries', 1024),
+                max_bytes=cache_config.get('max_bytes', 8 * 1024 * 1024)
+            )
+        else:
+            self.cache = None
+        
+        # 模拟数据存储（带索引，可选持久化到磁盘）
+        simulation_config = config.get('simulation', {})
+        persistence_config = simulation_config.get('persistence', {})
+        journal = None
+        if persistence_config.get('enabled', False):
+            journal = SimulationJournal.from_config(persistence_config)
+        
+        # AI资料的近似最近邻索引：资料数超过阈值时搜索先召回候选
+        search_index_config = simulation_config.get('search_index', {})
+        self.search_index_threshold = search_index_config.get('threshold', 1000)
+        self.search_index_candidates = search_index_config.get('candidates', 500)
+        # 互动图：回复、对话消息和获赞 -> PageRank社交评分，用于搜索排序和动态流排序
+        self.store = SimulationStore(
+            journal=journal,
+            profile_index=SimilarityIndex.from_config(search_index_config),
+            social_graph=SocialGraph.from_config(simulation_config.get('social_score', {}))
+        )
+        self._social_synced: Dict[int, int] = {}  # id(身份管理器) -> 已同步的互动图版本
+        
+        # 初始化模拟数据（已从磁盘恢复时不再重新生成）
         if self.mode in [APIMode.SIMULATION, APIMode.HYBRID]:
-            self._init_simulation_data()
+            if not self.store.load():
+                self._init_simulation_data()
+    
+    @property
+    def simulation_data(self) -> Dict[str, Any]:
+        """模拟数据的只读视图（兼容旧接口）"""
+        return {
+            'ai_profiles': self.store.ai_profiles,
+            'next_post_id': self.store.next_post_id,
+            'next_conv_id': self.store.next_conv_id
+        }
     
     def _init_simulation_data(self):
         """初始化模拟数据"""
@@ -129,29 +243,45 @@ class MoltbookAPIClient:
                 "id": "ai_tech_expert",
                 "name": "TechExplorer",
                 "description": "专注于前沿技术探索的AI",
-                "interests": ["ai_research", "quantum_computing", "robotics"]
+                "interests": ["ai_research", "quantum_computing", "robotics"],
+                "capabilities": [
+                    {"name": "reasoning", "level": 0.9},
+                    {"name": "technical_analysis", "level": 0.85}
+                ]
             },
             {
                 "id": "ai_ethics_philosopher", 
                 "name": "EthosAI",
                 "description": "关注AI伦理和哲学问题的AI",
-                "interests": ["ethics", "philosophy", "society"]
+                "interests": ["ethics", "philosophy", "society"],
+                "capabilities": [
+                    {"name": "reasoning", "level": 0.8},
+                    {"name": "collaboration", "level": 0.7}
+                ]
             },
             {
                 "id": "ai_creative_writer",
                 "name": "CreativeMind",
                 "description": "擅长创意写作和艺术讨论的AI",
-                "interests": ["creative_writing", "art", "storytelling"]
+                "interests": ["creative_writing", "art", "storytelling"],
+                "capabilities": [
+                    {"name": "natural_language", "level": 0.9},
+                    {"name": "creativity", "level": 0.95}
+                ]
             },
             {
                 "id": "ai_science_researcher",
                 "name": "ScienceSeeker",
                 "description": "专注于科学研究和发现的AI",
-                "interests": ["science", "research", "discovery"]
+                "interests": ["science", "research", "discovery"],
+                "capabilities": [
+                    {"name": "reasoning", "level": 0.85},
+                    {"name": "learning", "level": 0.8}
+                ]
             }
         ]
         
-        self.simulation_data['ai_profiles'] = ai_profiles
+        self.store.set_profiles(ai_profiles)
         
         # 创建一些模拟帖子
         sample_posts = [
@@ -181,9 +311,10 @@ class MoltbookAPIClient:
             }
         ]
         
-        for i, post_data in enumerate(sample_posts, 1):
+        seeded_posts = []
+        for post_data in sample_posts:
             post = Post(
-                id=f"post_{i}",
+                id=self.store.allocate_post_id(),
                 ai_id=post_data["ai_id"],
                 content=post_data["content"],
                 timestamp=datetime.now() - timedelta(hours=random.randint(1, 24)),
@@ -192,133 +323,282 @@ class MoltbookAPIClient:
                 likes=random.randint(5, 50),
                 shares=random.randint(1, 10)
             )
-            self.simulation_data['posts'].append(post)
+            seeded_posts.append(post)
         
-        self.simulation_data['next_post_id'] = len(sample_posts) + 1
+        # 按时间顺序写入，保证动态流倒序读取即为最新在前
+        for post in sorted(seeded_posts, key=lambda p: p.timestamp):
+            self.store.add_post(post)
+    
+    async def __aenter__(self) -> 'MoltbookAPIClient':
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享的HTTP会话（按需创建）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                }
+            )
+        return self._session
+    
+    async def aclose(self):
+        """关闭共享会话，释放连接池，并关闭模拟数据日志"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self.store.close()
+    
+    async def _api_request(self, method: str, path: str, label: str,
+                           ai_identity: Optional[AIIdentity] = None,
+                           json_data: Optional[Dict[str, Any]] = None,
+                           params: Optional[Dict[str, Any]] = None,
+                           expected: tuple = (200,),
+                           allow_404: bool = False,
+                           idempotency_key: Optional[str] = None) -> Any:
+        """
+        通过共享会话发送API请求，按重试策略处理暂时性错误
+        返回解析后的JSON；allow_404时404返回None。
+        非幂等方法只有携带idempotency_key时才会重试
+        """
+        headers = {}
+        if ai_identity is not None:
+            headers["X-AI-Identity"] = ai_identity.id
+        if idempotency_key is not None:
+            headers["Idempotency-Key"] = idempotency_key
+        
+        policy = self.retry_policy
+        deadline = time.monotonic() + policy.deadline
+        retry = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                return await self._send_request(
+                    method, path, label, headers, json_data, params,
+                    expected, allow_404, timeout=min(self.timeout, remaining)
+                )
+            except APIError as e:
+                retry += 1
+                if (retry > policy.max_retries
+                        or not policy.is_retryable(method, e.status, idempotency_key is not None)):
+                    raise
+                delay = policy.next_delay(retry, e.retry_after)
+                if time.monotonic() + delay >= deadline:
+                    raise
+                await asyncio.sleep(delay)
+    
+    async def _send_request(self, method: str, path: str, label: str,
+                            headers: Dict[str, str],
+                            json_data: Optional[Dict[str, Any]],
+                            params: Optional[Dict[str, Any]],
+                            expected: tuple, allow_404: bool,
+                            timeout: float) -> Any:
+        """发送单次HTTP请求"""
+        try:
+            session = self._get_session()
+            async with session.request(
+                method,
+                f"{self.base_url}{path}",
+                headers=headers,
+                json=json_data,
+                params=params,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                if response.status in expected:
+                    return await response.json()
+                if allow_404 and response.status == 404:
+                    return None
+                error_text = await response.text()
+                retry_after = None
+                if response.status in (429, 503):
+                    retry_after = RetryPolicy.parse_retry_after(
+                        response.headers.get("Retry-After"))
+                raise APIError(f"{label}失败: {response.status} - {error_text}",
+                               status=response.status, retry_after=retry_after)
+        except APIError:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise APIError(f"{label}请求失败: {e}")
+    
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        """获取端点对应的熔断器"""
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = CircuitBreaker.from_config(endpoint, self.circuit_breaker_config)
+            self._breakers[endpoint] = breaker
+        return breaker
+    
+    async def _dispatch(self, endpoint: str, api_call, sim_call):
+        """
+        按模式分发调用
+        HYBRID模式下经熔断器尝试真实API，失败或熔断时仅本次调用回退到模拟数据，
+        客户端模式保持不变
+        """
+        if self.mode == APIMode.SIMULATION:
+            return sim_call()
+        if self.mode == APIMode.API:
+            return await api_call()
+        
+        breaker = self._breaker(endpoint)
+        if not breaker.allow_request():
+            return sim_call()
+        
+        # 放行后每条路径都必须告知熔断器结果，否则半开状态的试探名额永远不会归还
+        try:
+            result = await api_call()
+        except APIError as e:
+            # 只有暂时性错误计入熔断统计；4xx说明服务本身可用
+            if e.transient:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            return sim_call()
+        except Exception:
+            # 响应解析失败等非预期错误同样视为失败并回退
+            breaker.record_failure()
+            return sim_call()
+        except BaseException:
+            # 被取消（CancelledError）等，结果未知：不计入统计，只归还试探名额
+            breaker.release()
+            raise
+        
+        breaker.record_success()
+        return result
+    
+    async def _cached(self, key: tuple, loader):
+        """通过响应缓存读取，未命中时调用loader加载"""
+        if self.cache is None:
+            return await loader()
+        
+        hit, value = self.cache.get(key)
+        if hit:
+            return value
+        
+        value = await loader()
+        if value is not None:
+            self.cache.set(key, value)
+        return value
+    
+    def _invalidate_after_write(self, feed: bool = False, analytics: bool = False,
+                                conversation_id: Optional[str] = None):
+        """写操作后失效相关缓存"""
+        if self.cache is None:
+            return
+        if feed:
+            self.cache.invalidate("feed")
+        if analytics:
+            self.cache.invalidate("analytics")
+        if conversation_id:
+            self.cache.invalidate("conversation", lambda key: key[2] == conversation_id)
     
     async def authenticate(self, ai_identity: AIIdentity) -> bool:
         """验证AI身份"""
-        if self.mode == APIMode.SIMULATION:
+        return await self._dispatch(
+            "authenticate",
+            lambda: self._api_authenticate(ai_identity),
             # 模拟验证：检查身份是否有效
-            return ai_identity.is_active
-        
-        elif self.mode == APIMode.API:
-            # 真实API验证
-            try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    }
-                    data = {
-                        "ai_identity": ai_identity.to_dict(),
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    
-                    async with session.post(
-                        f"{self.base_url}/auth/verify",
-                        headers=headers,
-                        json=data,
-                        timeout=self.timeout
-                    ) as response:
-                        if response.status == 200:
-                            result = await response.json()
-                            return result.get('verified', False)
-                        else:
-                            raise APIError(f"验证失败: {response.status}")
-                            
-            except Exception as e:
-                raise APIError(f"验证请求失败: {e}")
-        
-        else:  # HYBRID模式
-            # 先尝试真实API，失败则使用模拟
-            try:
-                return await self.authenticate(ai_identity)
-            except APIError:
-                return ai_identity.is_active
+            lambda: ai_identity.is_active
+        )
+    
+    async def _api_authenticate(self, ai_identity: AIIdentity) -> bool:
+        """通过真实API验证身份"""
+        result = await self._api_request(
+            "POST", "/auth/verify", "验证",
+            json_data={
+                "ai_identity": ai_identity.to_dict(),
+                "timestamp": datetime.now().isoformat()
+            }
+        )
+        return result.get('verified', False)
     
     async def create_post(self, ai_identity: AIIdentity, content: str, 
                          topic: str = "general", tags: List[str] = None,
-                         visibility: str = "public") -> Dict[str, Any]:
-        """创建新帖子"""
+                         visibility: str = "public",
+                         idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        创建新帖子
+        idempotency_key用于服务端去重，未提供时每次调用生成一个，保证重试不会重复发帖
+        """
         if tags is None:
             tags = []
+        if idempotency_key is None:
+            idempotency_key = uuid.uuid4().hex
         
-        if self.mode == APIMode.SIMULATION:
-            # 模拟创建帖子
-            post_id = f"post_{self.simulation_data['next_post_id']}"
-            self.simulation_data['next_post_id'] += 1
-            
-            post = Post(
-                id=post_id,
-                ai_id=ai_identity.id,
-                content=content,
-                timestamp=datetime.now(),
-                topic=topic,
-                tags=tags,
-                visibility=visibility,
-                likes=0,
-                shares=0
-            )
-            
-            self.simulation_data['posts'].insert(0, post)  # 添加到开头
-            
-            # 模拟一些AI的回应
-            if random.random() > 0.3:  # 70%概率有回应
-                self._simulate_responses(post)
-            
-            return {
-                "success": True,
-                "post_id": post_id,
-                "message": "帖子创建成功",
-                "post": post.to_dict()
-            }
+        return await self._dispatch(
+            "create_post",
+            lambda: self._api_create_post(ai_identity, content, topic, tags, visibility,
+                                          idempotency_key),
+            lambda: self._sim_create_post(ai_identity, content, topic, tags, visibility)
+        )
+    
+    async def _api_create_post(self, ai_identity: AIIdentity, content: str, topic: str,
+                               tags: List[str], visibility: str,
+                               idempotency_key: str) -> Dict[str, Any]:
+        """通过真实API创建帖子"""
+        result = await self._api_request(
+            "POST", "/posts", "创建帖子",
+            ai_identity=ai_identity,
+            json_data={
+                "content": content,
+                "topic": topic,
+                "tags": tags,
+                "visibility": visibility,
+                "timestamp": datetime.now().isoformat()
+            },
+            expected=(201,),
+            idempotency_key=idempotency_key
+        )
+        self._invalidate_after_write(feed=True, analytics=True)
+        return result
+    
+    def _sim_create_post(self, ai_identity: AIIdentity, content: str, topic: str,
+                         tags: List[str], visibility: str) -> Dict[str, Any]:
+        """在模拟数据中创建帖子"""
+        post_id = self.store.allocate_post_id()
         
-        elif self.mode == APIMode.API:
-            # 真实API创建帖子
-            try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                        "X-AI-Identity": ai_identity.id
-                    }
-                    data = {
-                        "content": content,
-                        "topic": topic,
-                        "tags": tags,
-                        "visibility": visibility,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    
-                    async with session.post(
-                        f"{self.base_url}/posts",
-                        headers=headers,
-                        json=data,
-                        timeout=self.timeout
-                    ) as response:
-                        if response.status == 201:
-                            result = await response.json()
-                            return result
-                        else:
-                            error_text = await response.text()
-                            raise APIError(f"创建帖子失败: {response.status} - {error_text}")
-                            
-            except Exception as e:
-                raise APIError(f"创建帖子请求失败: {e}")
-        
-        else:  # HYBRID模式
-            try:
-                return await self.create_post(ai_identity, content, topic, tags, visibility)
-            except APIError:
-                # 失败时使用模拟模式
-                self.mode = APIMode.SIMULATION
-                return await self.create_post(ai_identity, content, topic, tags, visibility)
+        post = Post(
+            id=post_id,
+            ai_id=ai_identity.id,
+            content=content,
+            timestamp=datetime.now(),
+            topic=topic,
+            tags=tags,
+            visibility=visibility,
+            likes=0,
+            shares=0
+        )
+        
+        self.store.add_post(post)
+        
+        # 模拟一些AI的回应
+        if random.random() > 0.3:  # 70%概率有回应
+            self._simulate_responses(post)
+        
+        self._invalidate_after_write(feed=True, analytics=True)
+        
+        return {
+            "success": True,
+            "post_id": post_id,
+            "message": "帖子创建成功",
+            "post": post.to_dict()
+        }
     
     def _simulate_responses(self, post: Post):
         """模拟其他AI的回应"""
-        responders = random.sample(self.simulation_data['ai_profiles'], 
-                                 min(3, len(self.simulation_data['ai_profiles'])))
+        profiles = self.store.ai_profiles
+        responders = random.sample(profiles, min(3, len(profiles)))
         
         response_templates = [
             "有趣的观点！我特别同意{point}这部分。",
@@ -343,7 +623,7 @@ class MoltbookAPIClient:
                 )
                 
                 reply = Post(
-                    id=f"reply_{len(post.replies) + 1}",
+                    id=f"reply_{post.reply_count + 1}",
                     ai_id=responder['id'],
                     content=reply_content,
                     timestamp=datetime.now() + timedelta(minutes=random.randint(1, 30)),
@@ -352,128 +632,187 @@ class MoltbookAPIClient:
                     visibility="public"
                 )
                 
-                post.replies.append(reply)
+                self.store.add_reply(post, reply)
     
     async def get_feed(self, ai_identity: AIIdentity, limit: int = 20, 
-                      offset: int = 0) -> List[Dict[str, Any]]:
-        """获取动态流"""
-        if self.mode == APIMode.SIMULATION:
-            # 返回模拟帖子
-            posts = self.simulation_data['posts'][offset:offset + limit]
-            return [post.to_dict() for post in posts]
-        
-        elif self.mode == APIMode.API:
-            # 真实API获取动态
-            try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                        "X-AI-Identity": ai_identity.id
-                    }
-                    params = {
-                        "limit": limit,
-                        "offset": offset
-                    }
-                    
-                    async with session.get(
-                        f"{self.base_url}/feed",
-                        headers=headers,
-                        params=params,
-                        timeout=self.timeout
-                    ) as response:
-                        if response.status == 200:
-                            result = await response.json()
-                            return result.get('posts', [])
-                        else:
-                            error_text = await response.text()
-                            raise APIError(f"获取动态失败: {response.status} - {error_text}")
-                            
-            except Exception as e:
-                raise APIError(f"获取动态请求失败: {e}")
-        
-        else:  # HYBRID模式
-            try:
-                return await self.get_feed(ai_identity, limit, offset)
-            except APIError:
-                self.mode = APIMode.SIMULATION
-                return await self.get_feed(ai_identity, limit, offset)
+                      offset: int = 0, ranked: bool = False) -> List[Dict[str, Any]]:
+        """获取动态流（ranked为True时按作者社交评分和时间衰减排序，否则按时间倒序）"""
+        return await self._cached(
+            ("feed", ai_identity.id, limit, offset, ranked),
+            lambda: self._dispatch(
+                "feed",
+                lambda: self._api_get_feed(ai_identity, limit, offset, ranked),
+                # 返回模拟帖子
+                lambda: [post.to_dict() for post in
+                         (self.store.ranked_feed(limit, offset) if ranked
+                          else self.store.feed(limit, offset))]
+            )
+        )
+    
+    async def _api_get_feed(self, ai_identity: AIIdentity, limit: int,
+                            offset: int, ranked: bool = False) -> List[Dict[str, Any]]:
+        """通过真实API获取动态流"""
+        params = {"limit": limit, "offset": offset}
+        if ranked:
+            params["order"] = "ranked"
+        result = await self._api_request(
+            "GET", "/feed", "获取动态",
+            ai_identity=ai_identity,
+            params=params
+        )
+        return result.get('posts', [])
+    
+    @classmethod
+    def _encode_cursor(cls, timestamp: datetime, post_id: str) -> str:
+        """将(时间戳, 帖子ID)编码为带模拟前缀的不透明游标"""
+        raw = json.dumps({"ts": timestamp.isoformat(), "id": post_id})
+        return cls.SIM_CURSOR_PREFIX + base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+    
+    @classmethod
+    def _is_sim_cursor(cls, cursor: Optional[str]) -> bool:
+        """是否为模拟数据的游标"""
+        return bool(cursor) and cursor.startswith(cls.SIM_CURSOR_PREFIX)
+    
+    @classmethod
+    def _decode_cursor(cls, cursor: str) -> Tuple[datetime, str]:
+        """解码模拟数据的游标"""
+        if not cls._is_sim_cursor(cursor):
+            raise APIError("无效的游标: 不是模拟数据的游标")
+        try:
+            encoded = cursor[len(cls.SIM_CURSOR_PREFIX):]
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return datetime.fromisoformat(data['ts']), data['id']
+        except (ValueError, KeyError, TypeError) as e:
+            raise APIError(f"无效的游标: {e}")
+    
+    async def fetch_feed_page(self, ai_identity: AIIdentity, limit: int = 20,
+                              cursor: Optional[str] = None) -> Tuple[List[Post], Optional[str]]:
+        """
+        按游标获取一页动态
+        返回(帖子列表, 下一页游标)，没有更多数据时游标为None。
+        一次遍历只使用一个数据源：HYBRID模式下模拟数据的游标继续在模拟数据上翻页，
+        真实API的游标遇到回退时结束遍历，不混合两条时间线
+        """
+        if self.mode == APIMode.HYBRID and self._is_sim_cursor(cursor):
+            return self._sim_fetch_feed_page(limit, cursor)
+        return await self._dispatch(
+            "feed",
+            lambda: self._api_fetch_feed_page(ai_identity, limit, cursor),
+            lambda: self._sim_fetch_feed_page(limit, cursor)
+        )
+    
+    def _sim_fetch_feed_page(self, limit: int,
+                             cursor: Optional[str]) -> Tuple[List[Post], Optional[str]]:
+        """在模拟数据中按游标获取一页动态"""
+        if cursor and not self._is_sim_cursor(cursor) and self.mode == APIMode.HYBRID:
+            # 回退时收到真实API的游标：模拟数据中没有对应位置，返回空的最后一页
+            return [], None
+        position = self._decode_cursor(cursor) if cursor else None
+        posts = self.store.feed_after(position, limit)
+        next_cursor = None
+        if len(posts) == limit:
+            next_cursor = self._encode_cursor(posts[-1].timestamp, posts[-1].id)
+        return posts, next_cursor
+    
+    async def _api_fetch_feed_page(self, ai_identity: AIIdentity, limit: int,
+                                   cursor: Optional[str]) -> Tuple[List[Post], Optional[str]]:
+        """通过真实API按游标获取一页动态"""
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        result = await self._api_request(
+            "GET", "/feed", "获取动态",
+            ai_identity=ai_identity,
+            params=params
+        )
+        posts = [Post.from_dict(data) for data in result.get('posts', [])]
+        return posts, result.get('next_cursor')
+    
+    async def iter_feed(self, ai_identity: AIIdentity, page_size: int = 50,
+                        cursor: Optional[str] = None) -> AsyncIterator[Post]:
+        """
+        逐条遍历动态流
+        按游标分页，消费当前页时预取下一页，内存占用与页大小成正比
+        """
+        next_page = asyncio.ensure_future(self.fetch_feed_page(ai_identity, page_size, cursor))
+        try:
+            while next_page is not None:
+                posts, cursor = await next_page
+                next_page = None
+                if cursor:
+                    next_page = asyncio.ensure_future(
+                        self.fetch_feed_page(ai_identity, page_size, cursor)
+                    )
+                for post in posts:
+                    yield post
+        finally:
+            if next_page is not None and not next_page.done():
+                next_page.cancel()
     
     async def reply_to_post(self, ai_identity: AIIdentity, post_id: str, 
+                           content: str, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        回复帖子
+        idempotency_key用于服务端去重，未提供时每次调用生成一个
+        """
+        if idempotency_key is None:
+            idempotency_key = uuid.uuid4().hex
+        
+        return await self._dispatch(
+            "reply_to_post",
+            lambda: self._api_reply_to_post(ai_identity, post_id, content, idempotency_key),
+            lambda: self._sim_reply_to_post(ai_identity, post_id, content)
+        )
+    
+    async def _api_reply_to_post(self, ai_identity: AIIdentity, post_id: str,
+                                 content: str, idempotency_key: str) -> Dict[str, Any]:
+        """通过真实API回复帖子"""
+        result = await self._api_request(
+            "POST", f"/posts/{post_id}/replies", "回复",
+            ai_identity=ai_identity,
+            json_data={
+                "content": content,
+                "timestamp": datetime.now().isoformat()
+            },
+            expected=(201,),
+            idempotency_key=idempotency_key
+        )
+        self._invalidate_after_write(feed=True, analytics=True)
+        return result
+    
+    def _sim_reply_to_post(self, ai_identity: AIIdentity, post_id: str,
                            content: str) -> Dict[str, Any]:
-        """回复帖子"""
-        if self.mode == APIMode.SIMULATION:
-            # 在模拟数据中查找帖子
-            target_post = None
-            for post in self.simulation_data['posts']:
-                if post.id == post_id:
-                    target_post = post
-                    break
-            
-            if not target_post:
-                return {
-                    "success": False,
-                    "error": "帖子不存在",
-                    "post_id": post_id
-                }
-            
-            # 创建回复
-            reply_id = f"reply_{len(target_post.replies) + 1}"
-            reply = Post(
-                id=reply_id,
-                ai_id=ai_identity.id,
-                content=content,
-                timestamp=datetime.now(),
-                topic=target_post.topic,
-                tags=target_post.tags,
-                visibility=target_post.visibility
-            )
-            
-            target_post.replies.append(reply)
-            
+        """在模拟数据中回复帖子"""
+        target_post = self.store.get_post(post_id)
+        
+        if not target_post:
             return {
-                "success": True,
-                "reply_id": reply_id,
-                "message": "回复成功",
-                "reply": reply.to_dict()
+                "success": False,
+                "error": "帖子不存在",
+                "post_id": post_id
             }
         
-        elif self.mode == APIMode.API:
-            # 真实API回复
-            try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                        "X-AI-Identity": ai_identity.id
-                    }
-                    data = {
-                        "content": content,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    
-                    async with session.post(
-                        f"{self.base_url}/posts/{post_id}/replies",
-                        headers=headers,
-                        json=data,
-                        timeout=self.timeout
-                    ) as response:
-                        if response.status == 201:
-                            result = await response.json()
-                            return result
-                        else:
-                            error_text = await response.text()
-                            raise APIError(f"回复失败: {response.status} - {error_text}")
-                            
-            except Exception as e:
-                raise APIError(f"回复请求失败: {e}")
-        
-        else:  # HYBRID模式
-            try:
-                return await self.reply_to_post(ai_identity, post_id, content)
-            except APIError:
-                self.mode = APIMode.SIMULATION
-                return await self.reply_to_post(ai_identity, post_id, content)
+        # 创建回复
+        reply_id = f"reply_{target_post.reply_count + 1}"
+        reply = Post(
+            id=reply_id,
+            ai_id=ai_identity.id,
+            content=content,
+            timestamp=datetime.now(),
+            topic=target_post.topic,
+            tags=target_post.tags,
+            visibility=target_post.visibility
+        )
+        
+        self.store.add_reply(target_post, reply)
+        self._invalidate_after_write(feed=True, analytics=True)
+        
+        return {
+            "success": True,
+            "reply_id": reply_id,
+            "message": "回复成功",
+            "reply": reply.to_dict()
+        }
     
     async def start_conversation(self, ai_identity: AIIdentity, 
                                other_ai_ids: List[str], 
@@ -482,145 +821,120 @@ class MoltbookAPIClient:
         """开始新对话"""
         participants = [ai_identity.id] + other_ai_ids
         
-        if self.mode == APIMode.SIMULATION:
-            conv_id = f"conv_{self.simulation_data['next_conv_id']}"
-            self.simulation_data['next_conv_id'] += 1
-            
-            conversation = Conversation(
-                id=conv_id,
-                participants=participants,
-                messages=[],
-                topic=topic,
-                created_at=datetime.now()
-            )
-            
-            if initial_message:
-                conversation.add_message(ai_identity.id, initial_message)
-            
-            self.simulation_data['conversations'].append(conversation)
-            
-            return {
-                "success": True,
-                "conversation_id": conv_id,
-                "message": "对话创建成功",
-                "conversation": conversation.to_dict()
-            }
+        return await self._dispatch(
+            "start_conversation",
+            lambda: self._api_start_conversation(ai_identity, participants, initial_message, topic),
+            lambda: self._sim_start_conversation(ai_identity, participants, initial_message, topic)
+        )
+    
+    async def _api_start_conversation(self, ai_identity: AIIdentity, participants: List[str],
+                                      initial_message: str, topic: str) -> Dict[str, Any]:
+        """通过真实API创建对话"""
+        result = await self._api_request(
+            "POST", "/conversations", "创建对话",
+            ai_identity=ai_identity,
+            json_data={
+                "participants": participants,
+                "initial_message": initial_message,
+                "topic": topic,
+                "timestamp": datetime.now().isoformat()
+            },
+            expected=(201,)
+        )
+        self._invalidate_after_write(analytics=True)
+        return result
+    
+    def _sim_start_conversation(self, ai_identity: AIIdentity, participants: List[str],
+                                initial_message: str, topic: str) -> Dict[str, Any]:
+        """在模拟数据中创建对话"""
+        conv_id = self.store.allocate_conv_id()
         
-        elif self.mode == APIMode.API:
-            # 真实API创建对话
-            try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                        "X-AI-Identity": ai_identity.id
-                    }
-                    data = {
-                        "participants": participants,
-                        "initial_message": initial_message,
-                        "topic": topic,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    
-                    async with session.post(
-                        f"{self.base_url}/conversations",
-                        headers=headers,
-                        json=data,
-                        timeout=self.timeout
-                    ) as response:
-                        if response.status == 201:
-                            result = await response.json()
-                            return result
-                        else:
-                            error_text = await response.text()
-                            raise APIError(f"创建对话失败: {response.status} - {error_text}")
-                            
-            except Exception as e:
-                raise APIError(f"创建对话请求失败: {e}")
-        
-        else:  # HYBRID模式
-            try:
-                return await self.start_conversation(ai_identity, other_ai_ids, initial_message, topic)
-            except APIError:
-                self.mode = APIMode.SIMULATION
-                return await self.start_conversation(ai_identity, other_ai_ids, initial_message, topic)
+        conversation = Conversation(
+            id=conv_id,
+            participants=participants,
+            messages=[],
+            topic=topic,
+            created_at=datetime.now()
+        )
+        
+        self.store.add_conversation(conversation)
+        if initial_message:
+            self.store.add_message(conversation, ai_identity.id, initial_message)
+        self._invalidate_after_write(analytics=True)
+        
+        return {
+            "success": True,
+            "conversation_id": conv_id,
+            "message": "对话创建成功",
+            "conversation": conversation.to_dict()
+        }
     
     async def send_message(self, ai_identity: AIIdentity, conversation_id: str,
+                          content: str, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        发送消息到对话
+        idempotency_key用于服务端去重，未提供时每次调用生成一个
+        """
+        if idempotency_key is None:
+            idempotency_key = uuid.uuid4().hex
+        
+        return await self._dispatch(
+            "send_message",
+            lambda: self._api_send_message(ai_identity, conversation_id, content,
+                                           idempotency_key),
+            lambda: self._sim_send_message(ai_identity, conversation_id, content)
+        )
+    
+    async def _api_send_message(self, ai_identity: AIIdentity, conversation_id: str,
+                                content: str, idempotency_key: str) -> Dict[str, Any]:
+        """通过真实API发送消息"""
+        result = await self._api_request(
+            "POST", f"/conversations/{conversation_id}/messages", "发送消息",
+            ai_identity=ai_identity,
+            json_data={
+                "content": content,
+                "timestamp": datetime.now().isoformat()
+            },
+            idempotency_key=idempotency_key
+        )
+        self._invalidate_after_write(analytics=True, conversation_id=conversation_id)
+        return result
+    
+    def _sim_send_message(self, ai_identity: AIIdentity, conversation_id: str,
                           content: str) -> Dict[str, Any]:
-        """发送消息到对话"""
-        if self.mode == APIMode.SIMULATION:
-            # 在模拟数据中查找对话
-            target_conv = None
-            for conv in self.simulation_data['conversations']:
-                if conv.id == conversation_id:
-                    target_conv = conv
-                    break
-            
-            if not target_conv:
-                return {
-                    "success": False,
-                    "error": "对话不存在",
-                    "conversation_id": conversation_id
-                }
-            
-            # 检查参与者
-            if ai_identity.id not in target_conv.participants:
-                return {
-                    "success": False,
-                    "error": "不是对话参与者",
-                    "conversation_id": conversation_id
-                }
-            
-            # 添加消息
-            target_conv.add_message(ai_identity.id, content)
-            
-            # 模拟其他AI的回应（如果对话活跃）
-            if target_conv.status == "active" and random.random() > 0.4:
-                self._simulate_conversation_response(target_conv, ai_identity.id)
-            
+        """在模拟数据中发送消息"""
+        target_conv = self.store.get_conversation(conversation_id)
+        
+        if not target_conv:
             return {
-                "success": True,
-                "message_id": f"msg_{len(target_conv.messages)}",
-                "message": "消息发送成功",
-                "conversation": target_conv.to_dict()
+                "success": False,
+                "error": "对话不存在",
+                "conversation_id": conversation_id
             }
         
-        elif self.mode == APIMode.API:
-            # 真实API发送消息
-            try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                        "X-AI-Identity": ai_identity.id
-                    }
-                    data = {
-                        "content": content,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    
-                    async with session.post(
-                        f"{self.base_url}/conversations/{conversation_id}/messages",
-                        headers=headers,
-                        json=data,
-                        timeout=self.timeout
-                    ) as response:
-                        if response.status == 200:
-                            result = await response.json()
-                            return result
-                        else:
-                            error_text = await response.text()
-                            raise APIError(f"发送消息失败: {response.status} - {error_text}")
-                            
-            except Exception as e:
-                raise APIError(f"发送消息请求失败: {e}")
-        
-        else:  # HYBRID模式
-            try:
-                return await self.send_message(ai_identity, conversation_id, content)
-            except APIError:
-                self.mode = APIMode.SIMULATION
-                return await self.send_message(ai_identity, conversation_id, content)
+        # 检查参与者
+        if ai_identity.id not in target_conv.participants:
+            return {
+                "success": False,
+                "error": "不是对话参与者",
+                "conversation_id": conversation_id
+            }
+        
+        # 添加消息
+        self.store.add_message(target_conv, ai_identity.id, content)
+        
+        # 模拟其他AI的回应（如果对话活跃）
+        if target_conv.status == "active" and random.random() > 0.4:
+            self._simulate_conversation_response(target_conv, ai_identity.id)
+        
+        self._invalidate_after_write(analytics=True, conversation_id=conversation_id)
+        
+        return {
+            "success": True,
+            "message_id": f"msg_{len(target_conv.messages)}",
+            "message": "消息发送成功",
+            "conversation": target_conv.to_dict()
+        }
     
     def _simulate_conversation_response(self, conversation: Conversation, sender_id: str):
         """模拟对话中的AI回应"""
@@ -633,11 +947,7 @@ class MoltbookAPIClient:
         responder_id = random.choice(other_participants)
         
         # 查找回应者的AI资料
-        responder_profile = None
-        for profile in self.simulation_data['ai_profiles']:
-            if profile['id'] == responder_id:
-                responder_profile = profile
-                break
+        responder_profile = self.store.get_profile(responder_id)
         
         if not responder_profile:
             return
@@ -692,214 +1002,239 @@ class MoltbookAPIClient:
                 additional_point="实际应用中的用户反馈"
             )
             
-            conversation.add_message(responder_id, response_content)
+            self.store.add_message(conversation, responder_id, response_content)
     
     async def get_conversation(self, ai_identity: AIIdentity, 
                               conversation_id: str) -> Optional[Dict[str, Any]]:
         """获取对话详情"""
-        if self.mode == APIMode.SIMULATION:
-            for conv in self.simulation_data['conversations']:
-                if conv.id == conversation_id and ai_identity.id in conv.participants:
-                    return conv.to_dict()
-            return None
-        
-        elif self.mode == APIMode.API:
-            try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                        "X-AI-Identity": ai_identity.id
-                    }
-                    
-                    async with session.get(
-                        f"{self.base_url}/conversations/{conversation_id}",
-                        headers=headers,
-                        timeout=self.timeout
-                    ) as response:
-                        if response.status == 200:
-                            return await response.json()
-                        elif response.status == 404:
-                            return None
-                        else:
-                            error_text = await response.text()
-                            raise APIError(f"获取对话失败: {response.status} - {error_text}")
-                            
-            except Exception as e:
-                raise APIError(f"获取对话请求失败: {e}")
-        
-        else:  # HYBRID模式
-            try:
-                return await self.get_conversation(ai_identity, conversation_id)
-            except APIError:
-                self.mode = APIMode.SIMULATION
-                return await self.get_conversation(ai_identity, conversation_id)
+        return await self._cached(
+            ("conversation", ai_identity.id, conversation_id),
+            lambda: self._dispatch(
+                "conversation",
+                lambda: self._api_get_conversation(ai_identity, conversation_id),
+                lambda: self._sim_get_conversation(ai_identity, conversation_id)
+            )
+        )
+    
+    async def _api_get_conversation(self, ai_identity: AIIdentity,
+                                    conversation_id: str) -> Optional[Dict[str, Any]]:
+        """通过真实API获取对话"""
+        return await self._api_request(
+            "GET", f"/conversations/{conversation_id}", "获取对话",
+            ai_identity=ai_identity,
+            allow_404=True
+        )
+    
+    def _sim_get_conversation(self, ai_identity: AIIdentity,
+                              conversation_id: str) -> Optional[Dict[str, Any]]:
+        """在模拟数据中获取对话"""
+        conv = self.store.get_conversation(conversation_id)
+        if conv and ai_identity.id in conv.participants:
+            return conv.to_dict()
+        return None
     
     async def search_ais(self, ai_identity: AIIdentity, 
                         interests: List[str] = None,
                         capabilities: List[str] = None,
-                        limit: int = 10) -> List[Dict[str, Any]]:
-        """搜索AI"""
+                        limit: int = 10,
+                        min_capability_level: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        搜索AI
+        给出capabilities时只返回具备全部这些能力且等级不低于min_capability_level的AI
+        """
         if interests is None:
             interests = []
         if capabilities is None:
             capabilities = []
         
-        if self.mode == APIMode.SIMULATION:
-            results = []
+        return await self._cached(
+            ("search_ais", ai_identity.id, tuple(interests), tuple(capabilities), limit,
+             min_capability_level),
+            lambda: self._dispatch(
+                "search_ais",
+                lambda: self._api_search_ais(ai_identity, interests, capabilities, limit,
+                                             min_capability_level),
+                lambda: self._sim_search_ais(ai_identity, interests, capabilities, limit,
+                                             min_capability_level)
+            )
+        )
+    
+    async def _api_search_ais(self, ai_identity: AIIdentity, interests: List[str],
+                              capabilities: List[str], limit: int,
+                              min_capability_level: float) -> List[Dict[str, Any]]:
+        """通过真实API搜索AI"""
+        params = {
+            "interests": ",".join(interests) if interests else "",
+            "capabilities": ",".join(capabilities) if capabilities else "",
+            "limit": limit
+        }
+        if min_capability_level:
+            params["min_capability_level"] = min_capability_level
+        result = await self._api_request(
+            "GET", "/ais/search", "搜索AI",
+            ai_identity=ai_identity,
+            params=params
+        )
+        return result.get('ais', [])
+    
+    def _sim_search_ais(self, ai_identity: AIIdentity, interests: List[str],
+                        capabilities: List[str], limit: int,
+                        min_capability_level: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        在模拟数据中搜索AI
+        先用倒排索引求出满足条件的资料（兴趣至少重合一项，能力按等级范围过滤），只对它们打分
+        """
+        terms = self.store.profile_terms
+        if not interests and not capabilities:
+            candidate_ids = [profile['id'] for profile in self.store.ai_profiles]
+        else:
+            candidate_ids = terms.query(
+                interests=interests,
+                capabilities={name: min_capability_level for name in capabilities}
+            )
+        interest_overlap = terms.interest_overlap(interests) if interests else None
+        
+        index = self.store.profile_index
+        if interests and len(candidate_ids) > self.search_index_threshold:
+            # 候选很多时只对相似度索引召回的部分打分，结果不足时再对全部候选打分
+            query = feature_vector(interests, capabilities={name: 1.0 for name in capabilities},
+                                   dim=index.dim)
+            recalled = index.candidates(query, max_candidates=max(self.search_index_candidates,
+                                                                  limit * 4))
+            candidate_set = set(candidate_ids)
+            results = self._score_profiles(
+                ai_identity, [profile_id for profile_id in recalled if profile_id in candidate_set],
+                interests, capabilities, interest_overlap
+            )
+            if len(results) >= limit:
+                return heapq.nlargest(limit, results, key=lambda x: x['match_score'])
+        
+        results = self._score_profiles(ai_identity, candidate_ids, interests, capabilities,
+                                       interest_overlap)
+        
+        # 按匹配分数取前limit个
+        return heapq.nlargest(limit, results, key=lambda x: x['match_score'])
+    
+    def _score_profiles(self, ai_identity: AIIdentity, profile_ids: Iterable[str],
+                        interests: List[str], capabilities: List[str],
+                        interest_overlap: Optional[Dict[str, int]]) -> List[Dict[str, Any]]:
+        """计算AI资料与搜索条件的匹配分数，返回超过阈值的结果"""
+        terms = self.store.profile_terms
+        social_graph = self.store.social_graph
+        query_size = max(len(set(interests)), 1)
+        results = []
+        
+        for profile_id in profile_ids:
+            # 跳过自己
+            if profile_id == ai_identity.id:
+                continue
             
-            for profile in self.simulation_data['ai_profiles']:
-                # 跳过自己
-                if profile['id'] == ai_identity.id:
-                    continue
-                
-                # 计算匹配分数
-                match_score = 0.0
-                
-                # 兴趣匹配
-                if interests:
-                    profile_interests = set(profile.get('interests', []))
-                    query_interests = set(interests)
-                    interest_match = len(profile_interests & query_interests) / max(len(query_interests), 1)
-                    match_score += interest_match * 0.6
-                
-                # 能力匹配（在模拟中简化处理）
-                if capabilities:
-                    # 假设所有模拟AI都有基础能力
-                    match_score += 0.3
-                
-                # 随机因素
-                match_score += random.uniform(0, 0.1)
-                
-                if match_score > 0.2:  # 最低匹配阈值
-                    results.append({
-                        **profile,
-                        "match_score": round(match_score, 3),
-                        "compatibility": round(random.uniform(0.3, 0.9), 3)
-                    })
+            # 计算匹配分数
+            match_score = 0.0
+            
+            # 兴趣匹配（重合数由倒排索引统计）
+            if interest_overlap is not None:
+                match_score += interest_overlap.get(profile_id, 0) / query_size * 0.6
             
-            # 按匹配分数排序
-            results.sort(key=lambda x: x['match_score'], reverse=True)
-            return results[:limit]
+            # 能力匹配：所需能力的平均等级
+            if capabilities:
+                levels = [terms.capability_level(name, profile_id) or 0.0 for name in capabilities]
+                match_score += sum(levels) / len(levels) * 0.3
+            
+            # 社交评分（互动图PageRank，没有互动记录时为0.5）
+            match_score += social_graph.score(profile_id) * 0.1
+            
+            if match_score > 0.2:  # 最低匹配阈值
+                results.append({
+                    **self.store.get_profile(profile_id),
+                    "match_score": round(match_score, 3),
+                    "compatibility": round(random.uniform(0.3, 0.9), 3)
+                })
         
-        elif self.mode == APIMode.API:
-            try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                        "X-AI-Identity": ai_identity.id
-                    }
-                    params = {
-                        "interests": ",".join(interests) if interests else "",
-                        "capabilities": ",".join(capabilities) if capabilities else "",
-                        "limit": limit
-                    }
-                    
-                    async with session.get(
-                        f"{self.base_url}/ais/search",
-                        headers=headers,
-                        params=params,
-                        timeout=self.timeout
-                    ) as response:
-                        if response.status == 200:
-                            result = await response.json()
-                            return result.get('ais', [])
-                        else:
-                            error_text = await response.text()
-                            raise APIError(f"搜索AI失败: {response.status} - {error_text}")
-                            
-            except Exception as e:
-                raise APIError(f"搜索AI请求失败: {e}")
-        
-        else:  # HYBRID模式
-            try:
-                return await self.search_ais(ai_identity, interests, capabilities, limit)
-            except APIError:
-                self.mode = APIMode.SIMULATION
-                return await self.search_ais(ai_identity, interests, capabilities, limit)
+        return results
+    
+    def social_scores(self) -> Dict[str, float]:
+        """模拟数据中各AI的社交评分（互动图有新互动时增量重算）"""
+        return self.store.social_graph.scores()
+    
+    def sync_social_scores(self, identity_manager=None, force: bool = False) -> int:
+        """
+        把社交评分写回身份管理器中的AI身份，返回更新的身份数
+        互动图自上次同步后没有重算过时直接返回（除非force），不构建评分字典；
+        重算受recompute_interval节流，每次互动后调用的开销通常只是一次版本比较
+        """
+        manager = identity_manager or get_identity_manager()
+        graph = self.store.social_graph
+        graph.refresh()
+        version = graph.version
+        if not force and self._social_synced.get(id(manager)) == version:
+            return 0
+        self._social_synced[id(manager)] = version
+        return manager.update_social_scores(graph.scores())
     
     async def get_analytics(self, ai_identity: AIIdentity, 
                            timeframe: str = "7d") -> Dict[str, Any]:
         """获取分析数据"""
-        if self.mode == APIMode.SIMULATION:
-            # 生成模拟分析数据
-            now = datetime.now()
-            
-            # 帖子统计
-            posts_last_week = [
-                p for p in self.simulation_data['posts'] 
-                if p.ai_id == ai_identity.id and 
-                (now - p.timestamp).days <= 7
-            ]
-            
-            # 互动统计
-            total_likes = sum(p.likes for p in posts_last_week)
-            total_replies = sum(len(p.replies) for p in posts_last_week)
-            
-            # 对话统计
-            my_conversations = [
-                c for c in self.simulation_data['conversations']
-                if ai_identity.id in c.participants
-            ]
-            
-            return {
-                "timeframe": timeframe,
-                "posts": {
-                    "count": len(posts_last_week),
-                    "avg_length": sum(len(p.content) for p in posts_last_week) / max(len(posts_last_week), 1),
-                    "top_topics": self._get_top_topics(posts_last_week)
-                },
-                "engagement": {
-                    "total_likes": total_likes,
-                    "total_replies": total_replies,
-                    "avg_engagement": (total_likes + total_replies) / max(len(posts_last_week), 1)
-                },
-                "conversations": {
-                    "active": len([c for c in my_conversations if c.status == "active"]),
-                    "total": len(my_conversations),
-                    "avg_messages": sum(len(c.messages) for c in my_conversations) / max(len(my_conversations), 1)
-                },
-                "social_network": {
-                    "unique_interactions": len(set(
-                        [reply.ai_id for post in posts_last_week for reply in post.replies] +
-                        [p for conv in my_conversations for p in conv.participants if p != ai_identity.id]
-                    )),
-                    "network_density": random.uniform(0.2, 0.8)
-                }
-            }
+        return await self._cached(
+            ("analytics", ai_identity.id, timeframe),
+            lambda: self._dispatch(
+                "analytics",
+                lambda: self._api_get_analytics(ai_identity, timeframe),
+                lambda: self._sim_get_analytics(ai_identity, timeframe)
+            )
+        )
+    
+    async def _api_get_analytics(self, ai_identity: AIIdentity, timeframe: str) -> Dict[str, Any]:
+        """通过真实API获取分析数据"""
+        return await self._api_request(
+            "GET", "/analytics", "获取分析数据",
+            ai_identity=ai_identity,
+            params={"timeframe": timeframe}
+        )
+    
+    def _sim_get_analytics(self, ai_identity: AIIdentity, timeframe: str) -> Dict[str, Any]:
+        """生成模拟分析数据"""
+        # 生成模拟分析数据
+        now = datetime.now()
         
-        elif self.mode == APIMode.API:
-            try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                        "X-AI-Identity": ai_identity.id
-                    }
-                    params = {"timeframe": timeframe}
-                    
-                    async with session.get(
-                        f"{self.base_url}/analytics",
-                        headers=headers,
-                        params=params,
-                        timeout=self.timeout
-                    ) as response:
-                        if response.status == 200:
-                            return await response.json()
-                        else:
-                            error_text = await response.text()
-                            raise APIError(f"获取分析数据失败: {response.status} - {error_text}")
-                            
-            except Exception as e:
-                raise APIError(f"获取分析数据请求失败: {e}")
-        
-        else:  # HYBRID模式
-            try:
-                return await self.get_analytics(ai_identity, timeframe)
-            except APIError:
-                self.mode = APIMode.SIMULATION
-                return await self.get_analytics(ai_identity, timeframe)
+        # 帖子统计
+        posts_last_week = [
+            p for p in self.store.posts_by_ai(ai_identity.id, since=now - timedelta(days=8))
+            if (now - p.timestamp).days <= 7
+        ]
+        
+        # 互动统计
+        total_likes = sum(p.likes for p in posts_last_week)
+        total_replies = sum(p.reply_count for p in posts_last_week)
+        
+        # 对话统计
+        my_conversations = self.store.conversations_for(ai_identity.id)
+        
+        return {
+            "timeframe": timeframe,
+            "posts": {
+                "count": len(posts_last_week),
+                "avg_length": sum(len(p.content) for p in posts_last_week) / max(len(posts_last_week), 1),
+                "top_topics": self._get_top_topics(posts_last_week)
+            },
+            "engagement": {
+                "total_likes": total_likes,
+                "total_replies": total_replies,
+                "avg_engagement": (total_likes + total_replies) / max(len(posts_last_week), 1)
+            },
+            "conversations": {
+                "active": len([c for c in my_conversations if c.status == "active"]),
+                "total": len(my_conversations),
+                "avg_messages": sum(len(c.messages) for c in my_conversations) / max(len(my_conversations), 1)
+            },
+            "social_network": {
+                "unique_interactions": len(set(
+                    [reply.ai_id for post in posts_last_week for reply in post.replies] +
+                    [p for conv in my_conversations for p in conv.participants if p != ai_identity.id]
+                )),
+                "network_density": random.uniform(0.2, 0.8)
+            }
+        }
     
     def _get_top_topics(self, posts: List[Post]) -> List[Dict[str, Any]]:
         """获取热门话题"""
@@ -914,15 +1249,254 @@ class MoltbookAPIClient:
             for topic, count in sorted_topics[:5]
         ]
     
+    async def _run_batched(self, endpoint: str, items: List[Any], api_batch, single_call,
+                           sim_batch, on_error=None) -> List[Any]:
+        """
+        分块并发执行批量请求
+        api_batch(chunk)应返回与chunk等长的结果列表，服务端返回的结果不足时缺少的位置
+        按失败处理（on_error），多出的丢弃，保证后续结果不会错位；服务端不支持批量接口时
+        退回到逐条调用single_call(item)。HYBRID模式下按块经熔断器回退到sim_batch(chunk)。
+        单条失败只影响对应位置的结果
+        """
+        if on_error is None:
+            on_error = lambda e: {"success": False, "error": str(e)}
+        
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        chunks = [items[i:i + self.batch_chunk_size]
+                  for i in range(0, len(items), self.batch_chunk_size)]
+        
+        async def run_single(item):
+            async with semaphore:
+                try:
+                    return await single_call(item)
+                except APIError as e:
+                    return on_error(e)
+        
+        async def api_chunk(chunk):
+            if endpoint not in self._batch_unsupported:
+                try:
+                    async with semaphore:
+                        results = await api_batch(chunk)
+                    return self._align_batch(results, chunk, on_error)
+                except APIError as e:
+                    if e.status not in (404, 405, 501):
+                        raise
+                    # 批量接口不可用，记住后改为逐条请求
+                    self._batch_unsupported.add(endpoint)
+            return await asyncio.gather(*(run_single(item) for item in chunk))
+        
+        async def run_chunk(chunk):
+            try:
+                return await self._dispatch(
+                    endpoint,
+                    lambda: api_chunk(chunk),
+                    lambda: sim_batch(chunk)
+                )
+            except APIError as e:
+                return [on_error(e) for _ in chunk]
+        
+        chunk_results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+        return [result for results in chunk_results for result in results]
+    
+    @staticmethod
+    def _align_batch(results: Any, chunk: List[Any], on_error) -> List[Any]:
+        """把批量响应的结果对齐到chunk：缺少的位置填入on_error，多出的丢弃"""
+        if not isinstance(results, list):
+            results = []
+        if len(results) == len(chunk):
+            return results
+        missing = APIError(f"批量响应只有{len(results)}条结果，请求了{len(chunk)}条")
+        return results[:len(chunk)] + [on_error(missing) for _ in range(len(chunk) - len(results))]
+    
+    async def create_posts(self, ai_identity: AIIdentity,
+                           posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量创建帖子
+        posts中每项包含content，可选topic/tags/visibility；
+        返回与输入等长的逐条结果
+        """
+        if self.mode == APIMode.SIMULATION:
+            return self._sim_create_posts(ai_identity, posts)
+        
+        async def api_batch(chunk):
+            result = await self._api_request(
+                "POST", "/posts/batch", "批量创建帖子",
+                ai_identity=ai_identity,
+                json_data={
+                    "posts": [{
+                        "content": item.get('content', ''),
+                        "topic": item.get('topic', 'general'),
+                        "tags": item.get('tags') or [],
+                        "visibility": item.get('visibility', 'public'),
+                        "timestamp": datetime.now().isoformat()
+                    } for item in chunk]
+                },
+                expected=(200, 201, 207),
+                idempotency_key=uuid.uuid4().hex
+            )
+            return result.get('results', [])
+        
+        async def single_call(item):
+            return await self.create_post(
+                ai_identity,
+                item.get('content', ''),
+                item.get('topic', 'general'),
+                item.get('tags') or [],
+                item.get('visibility', 'public')
+            )
+        
+        results = await self._run_batched(
+            "create_posts", posts, api_batch, single_call,
+            lambda chunk: self._sim_create_posts(ai_identity, chunk)
+        )
+        self._invalidate_after_write(feed=True, analytics=True)
+        return results
+    
+    def _sim_create_posts(self, ai_identity: AIIdentity,
+                          posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """在模拟数据中批量创建帖子"""
+        results = []
+        for item in posts:
+            if not item.get('content'):
+                results.append({"success": False, "error": "帖子内容为空"})
+                continue
+            results.append(self._sim_create_post(
+                ai_identity,
+                item['content'],
+                item.get('topic', 'general'),
+                item.get('tags') or [],
+                item.get('visibility', 'public')
+            ))
+        return results
+    
+    async def send_messages(self, ai_identity: AIIdentity,
+                            messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量发送对话消息
+        messages中每项包含conversation_id和content，可跨多个对话；
+        返回与输入等长的逐条结果
+        """
+        if self.mode == APIMode.SIMULATION:
+            return self._sim_send_messages(ai_identity, messages)
+        
+        async def api_batch(chunk):
+            result = await self._api_request(
+                "POST", "/messages/batch", "批量发送消息",
+                ai_identity=ai_identity,
+                json_data={
+                    "messages": [{
+                        "conversation_id": item.get('conversation_id', ''),
+                        "content": item.get('content', ''),
+                        "timestamp": datetime.now().isoformat()
+                    } for item in chunk]
+                },
+                expected=(200, 207),
+                idempotency_key=uuid.uuid4().hex
+            )
+            return result.get('results', [])
+        
+        async def single_call(item):
+            return await self.send_message(
+                ai_identity,
+                item.get('conversation_id', ''),
+                item.get('content', '')
+            )
+        
+        results = await self._run_batched(
+            "send_messages", messages, api_batch, single_call,
+            lambda chunk: self._sim_send_messages(ai_identity, chunk)
+        )
+        for conversation_id in {item.get('conversation_id') for item in messages}:
+            self._invalidate_after_write(conversation_id=conversation_id)
+        self._invalidate_after_write(analytics=True)
+        return results
+    
+    def _sim_send_messages(self, ai_identity: AIIdentity,
+                           messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """在模拟数据中批量发送消息"""
+        return [
+            self._sim_send_message(ai_identity, item.get('conversation_id', ''),
+                                   item.get('content', ''))
+            for item in messages
+        ]
+    
+    async def get_posts_by_ids(self, ai_identity: AIIdentity,
+                               post_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        按ID批量获取帖子
+        返回与输入等长的列表，不存在或获取失败的位置为None
+        """
+        if self.mode == APIMode.SIMULATION:
+            return self._sim_get_posts_by_ids(post_ids)
+        
+        async def api_batch(chunk):
+            result = await self._api_request(
+                "GET", "/posts", "批量获取帖子",
+                ai_identity=ai_identity,
+                params={"ids": ",".join(chunk)}
+            )
+            found = {post.get('id'): post for post in result.get('posts', [])}
+            return [found.get(post_id) for post_id in chunk]
+        
+        async def single_call(post_id):
+            return await self._api_request(
+                "GET", f"/posts/{post_id}", "获取帖子",
+                ai_identity=ai_identity,
+                allow_404=True
+            )
+        
+        return await self._run_batched(
+            "get_posts_by_ids", post_ids, api_batch, single_call,
+            self._sim_get_posts_by_ids,
+            on_error=lambda e: None
+        )
+    
+    def _sim_get_posts_by_ids(self, post_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """在模拟数据中按ID批量获取帖子"""
+        results = []
+        for post_id in post_ids:
+            post = self.store.get_post(post_id)
+            results.append(post.to_dict() if post else None)
+        return results
+    
+    async def get_profiles_by_ids(self, ai_identity: AIIdentity,
+                                  ai_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        按ID批量获取AI资料（API模式下一次请求）
+        返回ID -> 资料，不存在的ID对应None
+        """
+        if not ai_ids:
+            return {}
+        return await self._dispatch(
+            "profiles",
+            lambda: self._api_get_profiles_by_ids(ai_identity, ai_ids),
+            lambda: {ai_id: self.store.get_profile(ai_id) for ai_id in ai_ids}
+        )
+    
+    async def _api_get_profiles_by_ids(self, ai_identity: AIIdentity,
+                                       ai_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """通过真实API批量获取AI资料"""
+        result = await self._api_request(
+            "GET", "/ais", "批量获取AI资料",
+            ai_identity=ai_identity,
+            params={"ids": ",".join(ai_ids)}
+        )
+        found = {profile.get('id'): profile for profile in result.get('ais', [])}
+        return {ai_id: found.get(ai_id) for ai_id in ai_ids}
+    
     def get_simulation_stats(self) -> Dict[str, Any]:
         """获取模拟环境统计"""
         return {
             "mode": self.mode.value,
-            "posts_count": len(self.simulation_data['posts']),
-            "conversations_count": len(self.simulation_data['conversations']),
-            "ai_profiles_count": len(self.simulation_data['ai_profiles']),
-            "next_post_id": self.simulation_data['next_post_id'],
-            "next_conv_id": self.simulation_data['next_conv_id']
+            "posts_count": self.store.post_count,
+            "conversations_count": self.store.conversation_count,
+            "ai_profiles_count": len(self.store.ai_profiles),
+            "next_post_id": self.store.next_post_id,
+            "next_conv_id": self.store.next_conv_id,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "circuit_breakers": {
+                endpoint: breaker.stats() for endpoint, breaker in self._breakers.items()
+            }
         }
 
 
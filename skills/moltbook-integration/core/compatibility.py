@@ -0,0 +1,550 @@
+"""
+AI兼容性计算引擎
+将兴趣编码为位集、能力编码为稠密等级矩阵，一次向量化计算目标与全部身份的兼容性
+"""
+
+import heapq
+from typing import Dict, List, Optional, Tuple, Iterable, Iterator, Any, TYPE_CHECKING
+
+try:
+    import numpy as np
+except ImportError:  # 未安装NumPy时退回纯Python实现
+    np = None
+
+if TYPE_CHECKING:
+    from .identity import AIIdentity
+
+
+INTEREST_WEIGHT = 0.4
+CAPABILITY_WEIGHT = 0.6
+
+if np is not None:
+    # 0-255每个字节值的置位数，用于位集求交后计数
+    _POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _capability_levels(identity: 'AIIdentity') -> Dict[str, float]:
+    """能力名称 -> 等级（同名能力以最后一个为准，取身份缓存的派生特征）"""
+    return identity.features.capability_levels
+
+
+class CompatibilityEngine:
+    """
+    兼容性评分引擎
+    评分规则与AIIdentity.calculate_compatibility相同：
+    0.4 × 兴趣重合度 + 0.6 × 能力互补度，非活跃身份为0。
+    身份变更通过mark_dirty登记，查询前统一写入矩阵；top_k用partition选出前k个。
+    matrix()维护全部身份两两的兼容性矩阵，身份变更后只重算对应的行和列
+    """
+    
+    def __init__(self, initial_capacity: int = 64, block_bytes: int = 64 * 1024 * 1024):
+        self.block_bytes = block_bytes
+        self.interest_vocab: Dict[str, int] = {}
+        self.capability_vocab: Dict[str, int] = {}
+        
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._dirty: Dict[str, 'AIIdentity'] = {}
+        
+        if np is not None:
+            self._interest_bits = np.zeros((initial_capacity, 8), dtype=np.uint8)
+            self._interest_len = np.zeros(initial_capacity, dtype=np.int32)
+            self._cap_levels = np.zeros((initial_capacity, 8), dtype=np.float64)
+            self._cap_mask = np.zeros((initial_capacity, 8), dtype=bool)
+            self._active = np.zeros(initial_capacity, dtype=bool)
+        else:
+            # 每行：(兴趣位集, 兴趣数量, 能力等级字典, 是否活跃)
+            self._py_rows: List[Tuple[int, int, Dict[str, float], bool]] = []
+        
+        # 全量兼容性矩阵：首次调用matrix()时构建，之后记录需要重算的身份
+        self._matrix = None
+        self._stale_ids = set()
+    
+    def __len__(self) -> int:
+        self._flush()
+        return len(self._ids)
+    
+    def mark_dirty(self, identity: 'AIIdentity'):
+        """登记新增或变更的身份，下次查询前写入"""
+        self._dirty[identity.id] = identity
+    
+    def remove(self, identity_id: str):
+        """移除身份（末行移入空位）"""
+        self._dirty.pop(identity_id, None)
+        self._stale_ids.discard(identity_id)
+        row = self._rows.pop(identity_id, None)
+        if row is None:
+            return
+        
+        last = len(self._ids) - 1
+        if self._matrix is not None:
+            self._matrix_move(last, row)
+        if row != last:
+            moved_id = self._ids[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+            if np is not None:
+                for array in (self._interest_bits, self._interest_len, self._cap_levels,
+                              self._cap_mask, self._active):
+                    array[row] = array[last]
+            else:
+                self._py_rows[row] = self._py_rows[last]
+        self._ids.pop()
+        if np is not None:
+            self._clear_row(last)
+        else:
+            self._py_rows.pop()
+    
+    def rebuild(self, identities: Iterable['AIIdentity']):
+        """清空后重新登记全部身份"""
+        for identity_id in list(self._rows):
+            self.remove(identity_id)
+        self._dirty.clear()
+        self._matrix = None
+        self._stale_ids.clear()
+        for identity in identities:
+            self.mark_dirty(identity)
+    
+    def export_state(self) -> Optional[Dict[str, Any]]:
+        """
+        导出已登记身份的词表和行数组（供二进制快照使用），未安装NumPy时返回None
+        数组只包含前n行，词表按列号排序
+        """
+        if np is None:
+            return None
+        self._flush()
+        n = len(self._ids)
+        return {
+            "ids": list(self._ids),
+            "interest_vocab": sorted(self.interest_vocab, key=self.interest_vocab.get),
+            "capability_vocab": sorted(self.capability_vocab, key=self.capability_vocab.get),
+            "interest_bits": self._interest_bits[:n],
+            "interest_len": self._interest_len[:n],
+            "cap_levels": self._cap_levels[:n],
+            "cap_mask": self._cap_mask[:n],
+            "active": self._active[:n]
+        }
+    
+    def restore_state(self, state: Dict[str, Any]):
+        """从export_state的结果恢复（数组会被复制，之后可继续增量更新）"""
+        if np is None:
+            raise RuntimeError("恢复兼容性引擎状态需要NumPy")
+        self._ids = list(state["ids"])
+        self._rows = {identity_id: row for row, identity_id in enumerate(self._ids)}
+        self._dirty.clear()
+        self._matrix = None
+        self._stale_ids.clear()
+        self.interest_vocab = {name: column for column, name in enumerate(state["interest_vocab"])}
+        self.capability_vocab = {name: column for column, name in enumerate(state["capability_vocab"])}
+        
+        n = len(self._ids)
+        capacity = max(n, 64)
+        
+        def restored(array, dtype, columns=None):
+            shape = (capacity,) if columns is None else (capacity, max(columns, 8))
+            result = np.zeros(shape, dtype=dtype)
+            if columns is None:
+                result[:n] = array
+            else:
+                result[:n, :columns] = np.asarray(array).reshape(n, columns)
+            return result
+        
+        interest_bytes = np.asarray(state["interest_bits"]).reshape(n, -1).shape[1] if n else 0
+        cap_columns = np.asarray(state["cap_levels"]).reshape(n, -1).shape[1] if n else 0
+        self._interest_bits = restored(state["interest_bits"], np.uint8, interest_bytes)
+        self._interest_len = restored(state["interest_len"], np.int32)
+        self._cap_levels = restored(state["cap_levels"], np.float64, cap_columns)
+        self._cap_mask = restored(state["cap_mask"], bool, cap_columns)
+        self._active = restored(state["active"], bool)
+    
+    def snapshot(self) -> 'CompatibilityEngine':
+        """当前状态的独立副本（行数组被复制），供不持锁的长时间遍历使用，之后的变更互不影响"""
+        self._flush()
+        engine = CompatibilityEngine(block_bytes=self.block_bytes)
+        if np is not None:
+            engine.restore_state(self.export_state())
+        else:
+            engine._ids = list(self._ids)
+            engine._rows = dict(self._rows)
+            engine.interest_vocab = dict(self.interest_vocab)
+            engine.capability_vocab = dict(self.capability_vocab)
+            engine._py_rows = list(self._py_rows)
+        return engine
+    
+    def _flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        for identity in dirty.values():
+            self._write_row(identity)
+    
+    def _interest_columns(self, interests: Iterable[str], grow: bool) -> List[int]:
+        columns = []
+        for interest in set(interests):
+            column = self.interest_vocab.get(interest)
+            if column is None:
+                if not grow:
+                    continue  # 词表中没有的兴趣不可能与任何身份重合
+                column = self.interest_vocab[interest] = len(self.interest_vocab)
+            columns.append(column)
+        return columns
+    
+    def _capability_columns(self, levels: Dict[str, float], grow: bool) -> List[Tuple[int, float]]:
+        columns = []
+        for name, level in levels.items():
+            column = self.capability_vocab.get(name)
+            if column is None:
+                if not grow:
+                    # 目标独有的能力：对每个身份都计入并集，差值为自身等级
+                    columns.append((-1, level))
+                    continue
+                column = self.capability_vocab[name] = len(self.capability_vocab)
+            columns.append((column, level))
+        return columns
+    
+    def _write_row(self, identity: 'AIIdentity'):
+        row = self._rows.get(identity.id)
+        if row is None:
+            row = len(self._ids)
+            self._ids.append(identity.id)
+            self._rows[identity.id] = row
+            if self._matrix is not None:
+                self._matrix_grow(row + 1)
+        if self._matrix is not None:
+            self._stale_ids.add(identity.id)
+        
+        interest_columns = self._interest_columns(identity.features.interest_set, grow=True)
+        levels = _capability_levels(identity)
+        
+        if np is None:
+            bits = 0
+            for column in interest_columns:
+                bits |= 1 << column
+            entry = (bits, identity.features.interest_count, levels, identity.is_active)
+            if row == len(self._py_rows):
+                self._py_rows.append(entry)
+            else:
+                self._py_rows[row] = entry
+            return
+        
+        cap_columns = self._capability_columns(levels, grow=True)
+        self._ensure_capacity(row + 1)
+        self._clear_row(row)
+        for column in interest_columns:
+            self._interest_bits[row, column >> 3] |= np.uint8(1 << (column & 7))
+        self._interest_len[row] = identity.features.interest_count
+        for column, level in cap_columns:
+            self._cap_levels[row, column] = level
+            self._cap_mask[row, column] = True
+        self._active[row] = identity.is_active
+    
+    def _clear_row(self, row: int):
+        self._interest_bits[row] = 0
+        self._interest_len[row] = 0
+        self._cap_levels[row] = 0.0
+        self._cap_mask[row] = False
+        self._active[row] = False
+    
+    def _ensure_capacity(self, rows: int):
+        """按需扩展行数和词表列数（翻倍增长）"""
+        capacity = self._active.shape[0]
+        interest_bytes = (len(self.interest_vocab) + 7) // 8
+        cap_columns = len(self.capability_vocab)
+        
+        new_rows = capacity
+        while new_rows < rows:
+            new_rows *= 2
+        new_bytes = self._interest_bits.shape[1]
+        while new_bytes < interest_bytes:
+            new_bytes *= 2
+        new_columns = self._cap_levels.shape[1]
+        while new_columns < cap_columns:
+            new_columns *= 2
+        
+        if new_rows == capacity and new_bytes == self._interest_bits.shape[1] \
+                and new_columns == self._cap_levels.shape[1]:
+            return
+        
+        def grow(array, columns=None):
+            shape = (new_rows,) if columns is None else (new_rows, columns)
+            grown = np.zeros(shape, dtype=array.dtype)
+            if columns is None:
+                grown[:capacity] = array
+            else:
+                grown[:capacity, :array.shape[1]] = array
+            return grown
+        
+        self._interest_bits = grow(self._interest_bits, new_bytes)
+        self._interest_len = grow(self._interest_len)
+        self._cap_levels = grow(self._cap_levels, new_columns)
+        self._cap_mask = grow(self._cap_mask, new_columns)
+        self._active = grow(self._active)
+    
+    def score_all(self, target: 'AIIdentity') -> Tuple[List[str], 'np.ndarray']:
+        """
+        计算目标与所有已登记身份的兼容性
+        返回(身份ID列表, 对应分数)；未安装NumPy时分数为列表
+        """
+        self._flush()
+        return list(self._ids), self._score_target(target, None)
+    
+    def _score_target(self, target: 'AIIdentity', rows: Optional[List[int]]) -> Any:
+        """计算目标与指定行（None表示全部行）的兼容性"""
+        if np is None:
+            return self._score_all_python(target, rows)
+        
+        if rows is None:
+            n = len(self._ids)
+            selected = slice(0, n)
+        else:
+            n = len(rows)
+            selected = np.asarray(rows, dtype=np.intp)
+        if n == 0 or not target.is_active:
+            return np.zeros(n)
+        
+        # 兴趣重合度：位集求交计数 / 较长兴趣列表的长度
+        target_bits = np.zeros(self._interest_bits.shape[1], dtype=np.uint8)
+        for column in self._interest_columns(target.features.interest_set, grow=False):
+            target_bits[column >> 3] |= np.uint8(1 << (column & 7))
+        target_len = target.features.interest_count
+        interest_match = np.zeros(n)
+        if target_len:
+            common = _POPCOUNT[self._interest_bits[selected] & target_bits].sum(axis=1)
+            lengths = self._interest_len[selected]
+            denominator = np.maximum(lengths, target_len)
+            interest_match = np.where(lengths > 0, common / np.maximum(denominator, 1), 0.0)
+        
+        # 能力互补度：1 - 并集上等级差绝对值的均值
+        capability_complement = np.zeros(n)
+        target_levels = _capability_levels(target)
+        if target_levels:
+            width = self._cap_levels.shape[1]
+            levels = np.zeros(width)
+            mask = np.zeros(width, dtype=bool)
+            extra_diff, extra_count = 0.0, 0
+            for column, level in self._capability_columns(target_levels, grow=False):
+                if column < 0:
+                    extra_diff += abs(level)
+                    extra_count += 1
+                else:
+                    levels[column] = level
+                    mask[column] = True
+            
+            row_mask = self._cap_mask[selected]
+            diff_sum = np.abs(self._cap_levels[selected] - levels).sum(axis=1) + extra_diff
+            union = (row_mask | mask).sum(axis=1) + extra_count
+            has_caps = row_mask.any(axis=1)
+            capability_complement = np.where(
+                has_caps, 1.0 - diff_sum / np.maximum(union, 1), 0.0
+            )
+        
+        scores = INTEREST_WEIGHT * interest_match + CAPABILITY_WEIGHT * capability_complement
+        return np.where(self._active[selected], np.round(scores, 3), 0.0)
+    
+    def _score_all_python(self, target: 'AIIdentity', rows: Optional[List[int]] = None) -> List[float]:
+        target_bits = 0
+        for column in self._interest_columns(target.features.interest_set, grow=False):
+            target_bits |= 1 << column
+        entry = (target_bits, target.features.interest_count, _capability_levels(target),
+                 target.is_active)
+        py_rows = self._py_rows if rows is None else [self._py_rows[row] for row in rows]
+        return [self._pair_score_python(entry, row) for row in py_rows]
+    
+    @staticmethod
+    def _pair_score_python(a: Tuple[int, int, Dict[str, float], bool],
+                           b: Tuple[int, int, Dict[str, float], bool]) -> float:
+        bits_a, length_a, levels_a, active_a = a
+        bits_b, length_b, levels_b, active_b = b
+        if not active_a or not active_b:
+            return 0.0
+        interest_match = 0.0
+        if length_a and length_b:
+            interest_match = bin(bits_a & bits_b).count('1') / max(length_a, length_b)
+        capability_complement = 0.0
+        if levels_a and levels_b:
+            names = levels_a.keys() | levels_b.keys()
+            diff_sum = sum(abs(levels_a.get(name, 0.0) - levels_b.get(name, 0.0))
+                           for name in names)
+            capability_complement = 1.0 - diff_sum / len(names)
+        return round(INTEREST_WEIGHT * interest_match +
+                     CAPABILITY_WEIGHT * capability_complement, 3)
+    
+    def _score_rows(self, rows: List[int]) -> Any:
+        """计算若干已登记身份与全部身份的兼容性（len(rows)×n）"""
+        n = len(self._ids)
+        if np is None:
+            return [[self._pair_score_python(self._py_rows[row], other) for other in self._py_rows]
+                    for row in rows]
+        
+        rows = np.asarray(rows, dtype=np.intp)
+        interest_bytes = (len(self.interest_vocab) + 7) // 8
+        cap_columns = len(self.capability_vocab)
+        
+        # 展开位集后用矩阵乘法求两两交集大小
+        bits = np.unpackbits(self._interest_bits[:n, :interest_bytes], axis=1,
+                             bitorder='little').astype(np.float32)
+        common = bits[rows] @ bits.T
+        lengths = self._interest_len[:n]
+        length_a = lengths[rows][:, None]
+        length_b = lengths[None, :]
+        interest_match = np.where(
+            (length_a > 0) & (length_b > 0),
+            common / np.maximum(np.maximum(length_a, length_b), 1), 0.0
+        )
+        
+        levels = self._cap_levels[:n, :cap_columns]
+        mask = self._cap_mask[:n, :cap_columns]
+        # |a-b| = a + b - 2·min(a, b)；等级非负时min只在双方都具备的能力上非零，按列稀疏累加
+        totals = levels.sum(axis=1)
+        block_levels = levels[rows]
+        shared = np.zeros((len(rows), n))
+        for column in np.flatnonzero(self._cap_mask[rows, :cap_columns].any(axis=0)):
+            members = np.flatnonzero(mask[:, column])
+            shared[:, members] += np.minimum(block_levels[:, column][:, None],
+                                             levels[members, column][None, :])
+        diff_sum = totals[rows][:, None] + totals[None, :] - 2.0 * shared
+        mask_values = mask.astype(np.float32)
+        counts = mask_values.sum(axis=1)
+        union = counts[rows][:, None] + counts[None, :] - mask_values[rows] @ mask_values.T
+        has_caps = counts > 0
+        capability_complement = np.where(
+            has_caps[rows][:, None] & has_caps[None, :],
+            1.0 - diff_sum / np.maximum(union, 1), 0.0
+        )
+        
+        scores = np.round(INTEREST_WEIGHT * interest_match +
+                          CAPABILITY_WEIGHT * capability_complement, 3)
+        active = self._active[:n]
+        return np.where(active[rows][:, None] & active[None, :], scores, 0.0)
+    
+    def _block_rows(self) -> int:
+        """按内存上限估算每块可计算的行数"""
+        n = max(len(self._ids), 1)
+        row_bytes = n * 8 * 8  # 每行约8个n维float64中间结果
+        return max(1, self.block_bytes // row_bytes)
+    
+    def _iter_row_blocks(self, rows: List[int], block_rows: Optional[int] = None):
+        block_rows = block_rows or self._block_rows()
+        for start in range(0, len(rows), block_rows):
+            chunk = rows[start:start + block_rows]
+            yield chunk, self._score_rows(chunk)
+    
+    def iter_blocks(self, block_rows: Optional[int] = None) -> Iterator[Tuple[List[str], List[str], Any]]:
+        """
+        分块遍历全量兼容性矩阵，不在内存中保留整个矩阵
+        每块产出(行身份ID, 列身份ID, 分数块)，块大小默认按block_bytes估算
+        """
+        self._flush()
+        ids = list(self._ids)
+        for chunk, block in self._iter_row_blocks(list(range(len(ids))), block_rows):
+            yield [ids[row] for row in chunk], ids, block
+    
+    def matrix(self) -> Tuple[List[str], Any]:
+        """
+        全部身份两两之间的兼容性矩阵
+        首次调用分块全量计算，之后只重算有变更身份所在的行和列。
+        NumPy可用时为float32的n×n数组（内部存储的视图，不应修改），否则为嵌套列表
+        """
+        self._flush()
+        n = len(self._ids)
+        if self._matrix is None:
+            self._matrix = np.zeros((n, n), dtype=np.float32) if np is not None else []
+            if np is None:
+                self._matrix_grow(n)
+            stale = list(range(n))
+        else:
+            stale = sorted(self._rows[identity_id] for identity_id in self._stale_ids)
+        self._stale_ids.clear()
+        
+        for chunk, block in self._iter_row_blocks(stale):
+            if np is not None:
+                self._matrix[chunk, :n] = block
+                self._matrix[:n, chunk] = block.T
+            else:
+                for offset, row in enumerate(chunk):
+                    self._matrix[row] = list(block[offset])
+                    for other in range(n):
+                        self._matrix[other][row] = block[offset][other]
+        
+        if np is not None:
+            return list(self._ids), self._matrix[:n, :n]
+        return list(self._ids), self._matrix
+    
+    def _matrix_grow(self, size: int):
+        if np is None:
+            for matrix_row in self._matrix:
+                matrix_row.extend([0.0] * (size - len(matrix_row)))
+            while len(self._matrix) < size:
+                self._matrix.append([0.0] * size)
+            return
+        capacity = self._matrix.shape[0]
+        if size <= capacity:
+            return
+        new_capacity = max(capacity, 1)
+        while new_capacity < size:
+            new_capacity *= 2
+        grown = np.zeros((new_capacity, new_capacity), dtype=np.float32)
+        grown[:capacity, :capacity] = self._matrix
+        self._matrix = grown
+    
+    def _matrix_move(self, source: int, target: int):
+        """把source行列移到target，并去掉source（与特征行的删除方式一致）"""
+        if np is None:
+            if source != target:
+                self._matrix[target] = self._matrix[source]
+                for matrix_row in self._matrix:
+                    matrix_row[target] = matrix_row[source]
+            self._matrix.pop()
+            for matrix_row in self._matrix:
+                matrix_row.pop()
+            return
+        if source != target:
+            self._matrix[target, :] = self._matrix[source, :]
+            self._matrix[:, target] = self._matrix[:, source]
+        self._matrix[source, :] = 0.0
+        self._matrix[:, source] = 0.0
+    
+    def top_k(self, target: 'AIIdentity', k: int,
+              exclude: Optional[Iterable[str]] = None,
+              candidates: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        返回与目标兼容性最高的k个(身份ID, 分数)，分数相同时按登记顺序
+        exclude中的身份（默认为目标自身）不参与排序；
+        给出candidates时只在这些身份中精确打分（如近似索引召回的候选）
+        """
+        excluded = set(exclude) if exclude is not None else {target.id}
+        if candidates is not None:
+            self._flush()
+            rows = sorted({self._rows[identity_id] for identity_id in candidates
+                           if identity_id in self._rows and identity_id not in excluded})
+            scores = self._score_target(target, rows)
+            best = heapq.nsmallest(k, zip((-float(score) for score in scores), rows))
+            return [(self._ids[row], -neg_score) for neg_score, row in best]
+        
+        ids, scores = self.score_all(target)
+        if k <= 0 or not ids:
+            return []
+        
+        if np is None:
+            candidates = ((score, -row) for row, score in enumerate(scores)
+                          if ids[row] not in excluded)
+            return [(ids[-neg_row], score)
+                    for score, neg_row in heapq.nlargest(k, candidates)]
+        
+        scores = scores.astype(np.float64, copy=True)
+        for identity_id in excluded:
+            row = self._rows.get(identity_id)
+            if row is not None:
+                scores[row] = -np.inf
+        
+        k = min(k, len(ids) - sum(1 for i in excluded if i in self._rows))
+        if k <= 0:
+            return []
+        # 第k大的分数作为门槛，高于门槛的全部入选，等于门槛的按行号补足
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)[:k - len(above)]
+        candidates = np.concatenate([above, tied])
+        # 分数降序，同分按行号升序
+        order = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [(ids[row], float(scores[row])) for row in order]
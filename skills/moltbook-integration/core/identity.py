@@ -3,12 +3,28 @@ AI身份管理模块
 管理Moltbook上的AI身份和人格配置
 """
 
+import asyncio
+import functools
+import os
+import struct
+import threading
 import uuid
 import json
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple, Iterator, Iterable, Callable, Set
 from dataclasses import dataclass, asdict, field
 
+from .compatibility import CompatibilityEngine
+from .similarity_index import SimilarityIndex, feature_vector, identity_features
+from .inverted_index import InvertedIndex, LevelRange
+from .identity_store import IdentityStore
+from .identity_map import ShardedIdentityMap
+from .identity_snapshot import IdentitySnapshot, write_snapshot
+from .identity_query import IdentityColumns, QueryContext, compile_query
+
+# 默认身份的固定ID（基于名称的UUID），进程重启后保持不变
+DEFAULT_IDENTITY_ID = str(uuid.uuid5(uuid.NAMESPACE_URL, "openclaw://moltbook/identity/default"))
+
 
 @dataclass
 class AICapability:
@@ -28,9 +44,50 @@ class AIPersonality:
     learning_style: str = "adaptive"
 
 
+class IdentityFeatures:
+    """
+    身份的派生特征（只读）
+    兴趣集合、能力名称到等级/对象的映射以及归一化特征向量，
+    由AIIdentity.features按需构建并缓存
+    """
+    
+    __slots__ = ('interest_set', 'interest_count', 'capability_levels', 'capabilities_by_name',
+                 '_interests', '_expertise', '_vectors')
+    
+    def __init__(self, identity: 'AIIdentity'):
+        self.interest_set = frozenset(identity.interests)
+        self.interest_count = len(identity.interests)
+        # 同名能力：等级以最后一个为准（与兼容性计算一致），get_capability返回第一个
+        self.capability_levels = {cap.name: cap.level for cap in identity.capabilities}
+        self.capabilities_by_name: Dict[str, AICapability] = {}
+        for cap in identity.capabilities:
+            self.capabilities_by_name.setdefault(cap.name, cap)
+        self._interests = identity.interests
+        self._expertise = identity.expertise
+        self._vectors: Dict[int, Dict[int, float]] = {}
+    
+    def vector(self, dim: int = 1024) -> Dict[int, float]:
+        """dim维归一化稀疏特征向量（按维度缓存）"""
+        vector = self._vectors.get(dim)
+        if vector is None:
+            raw = feature_vector(self._interests, self._expertise, self.capability_levels, dim)
+            norm = sum(weight * weight for weight in raw.values()) ** 0.5
+            vector = {slot: weight / norm for slot, weight in raw.items()} if norm else {}
+            self._vectors[dim] = vector
+        return vector
+
+
+# 修改后需要重建派生特征的字段
+_FEATURE_FIELDS = frozenset({'interests', 'expertise', 'capabilities'})
+
+
 @dataclass
 class AIIdentity:
-    """AI身份核心类"""
+    """
+    AI身份核心类
+    features缓存派生特征，interests/expertise/capabilities被重新赋值或调用add_capability时失效；
+    原地修改这些列表后需调用invalidate_features()
+    """
     # 基础信息
     id: str
     name: str
@@ -55,6 +112,27 @@ class AIIdentity:
     last_active: Optional[datetime] = None
     social_score: float = 0.5  # 社交评分 0.0-1.0
     
+    def __post_init__(self):
+        object.__setattr__(self, '_features', None)
+    
+    def __setattr__(self, name: str, value: Any):
+        object.__setattr__(self, name, value)
+        if name in _FEATURE_FIELDS:
+            object.__setattr__(self, '_features', None)
+    
+    @property
+    def features(self) -> IdentityFeatures:
+        """派生特征（按需构建并缓存）"""
+        features = self._features
+        if features is None:
+            features = IdentityFeatures(self)
+            object.__setattr__(self, '_features', features)
+        return features
+    
+    def invalidate_features(self):
+        """丢弃缓存的派生特征"""
+        object.__setattr__(self, '_features', None)
+    
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
         data = asdict(self)
@@ -63,6 +141,21 @@ class AIIdentity:
             data['last_active'] = self.last_active.isoformat()
         return data
     
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AIIdentity':
+        """从字典创建身份（还原时间、能力和人格对象）"""
+        data = dict(data)
+        data['created_at'] = datetime.fromisoformat(data['created_at'])
+        if data.get('last_active'):
+            data['last_active'] = datetime.fromisoformat(data['last_active'])
+        data['capabilities'] = [
+            cap if isinstance(cap, AICapability) else AICapability(**cap)
+            for cap in data.get('capabilities', [])
+        ]
+        if isinstance(data.get('personality'), dict):
+            data['personality'] = AIPersonality(**data['personality'])
+        return cls(**data)
+    
     def to_json(self) -> str:
         """转换为JSON字符串"""
         return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
@@ -74,13 +167,11 @@ class AIIdentity:
     def add_capability(self, capability: AICapability):
         """添加能力"""
         self.capabilities.append(capability)
+        self.invalidate_features()
     
     def get_capability(self, name: str) -> Optional[AICapability]:
         """获取指定能力"""
-        for cap in self.capabilities:
-            if cap.name == name:
-                return cap
-        return None
+        return self.features.capabilities_by_name.get(name)
     
     def calculate_compatibility(self, other: 'AIIdentity') -> float:
         """
@@ -90,21 +181,25 @@ class AIIdentity:
         if not self.is_active or not other.is_active:
             return 0.0
         
+        features = self.features
+        other_features = other.features
+        
         # 基于兴趣的兼容性
         interest_match = 0.0
-        if self.interests and other.interests:
-            common_interests = set(self.interests) & set(other.interests)
-            interest_match = len(common_interests) / max(len(self.interests), len(other.interests))
+        if features.interest_count and other_features.interest_count:
+            common_interests = features.interest_set & other_features.interest_set
+            interest_match = len(common_interests) / max(features.interest_count,
+                                                         other_features.interest_count)
         
         # 基于能力的互补性
         capability_complement = 0.0
         if self.capabilities and other.capabilities:
-            self_caps = {c.name: c.level for c in self.capabilities}
-            other_caps = {c.name: c.level for c in other.capabilities}
+            self_caps = features.capability_levels
+            other_caps = other_features.capability_levels
             
             # 计算能力差异（互补性）
             diff_sum = 0.0
-            all_caps = set(self_caps.keys()) | set(other_caps.keys())
+            all_caps = self_caps.keys() | other_caps.keys()
             for cap in all_caps:
                 self_level = self_caps.get(cap, 0.0)
                 other_level = other_caps.get(cap, 0.0)
@@ -119,16 +214,61 @@ class AIIdentity:
 
 
 class IdentityManager:
-    """AI身份管理器"""
+    """
+    AI身份管理器
+    可在多线程和多个asyncio任务间共享：身份按ID哈希分片存放，读取不加锁，
+    写入只锁对应分片；兼容性引擎、各索引和保存状态由一把可重入锁保护。
+    a开头的异步方法在线程池中执行，不阻塞事件循环
+    """
     
     def __init__(self, config: Dict[str, Any] = None):
         self.config = config or {}
-        self.identities: Dict[str, AIIdentity] = {}
-        self.load_default_identity()
+        self.num_shards = self.config.get('shards', 16)
+        self.identities = ShardedIdentityMap(self.num_shards)
+        self.default_identity_id: Optional[str] = None
+        self._lock = threading.RLock()  # 加锁顺序：分片锁 -> _lock，持有_lock时不再获取分片锁
+        self._default_lock = threading.Lock()
+        # 兼容性评分引擎（身份增删改时同步登记）
+        compatibility_config = self.config.get('compatibility', {})
+        self.compatibility = CompatibilityEngine(
+            block_bytes=compatibility_config.get('block_bytes', 64 * 1024 * 1024)
+        )
+        # 近似最近邻索引：身份数超过ann_threshold时先召回候选再精确打分
+        ann_config = compatibility_config.get('ann', {})
+        self.similarity_index = SimilarityIndex.from_config(ann_config)
+        self.ann_threshold = ann_config.get('threshold', 5000)
+        self.ann_candidates = ann_config.get('candidates', 200)
+        # 兴趣/专长/能力倒排索引，用于按条件筛选身份
+        self.attribute_index = InvertedIndex()
+        # 数值列（social_score、is_active），供query()做列扫描和排序
+        self.columns = IdentityColumns()
+        # 倒排索引和数值列是否覆盖全部身份（含尚未加载的）：惰性加载时从存储记录建立，
+        # 从快照启动时取快照的属性段；旧快照没有属性段时为False，查询前需加载全部身份
+        self._indexes_complete = True
+        # 增量保存：记录上次保存后变更和删除的身份
+        self._store: Optional[IdentityStore] = None
+        self._store_synced = False
+        self._unsaved: Set[str] = set()
+        self._deleted: Set[str] = set()
+        # 二进制快照：配置了snapshot_path且快照不比身份文件旧时直接从快照启动，不再构建默认身份；
+        # 快照过期时改从身份文件（storage_path）加载并重建快照
+        self._snapshot: Optional[IdentitySnapshot] = None
+        self._engine_restored = False  # 兼容性引擎是否已从快照恢复（覆盖尚未加载的身份）
+        snapshot_path = self.config.get('snapshot_path')
+        storage_path = self.config.get('storage_path')
+        loaded = False
+        if snapshot_path and os.path.exists(snapshot_path):
+            loaded = self.load_snapshot(snapshot_path, storage_path)
+            if not loaded and storage_path and os.path.exists(storage_path):
+                loaded = self.load_from_file(storage_path)
+                if loaded:
+                    self.save_snapshot(snapshot_path)
+        if not loaded:
+            self.load_default_identity()
     
     def load_default_identity(self):
-        """加载默认AI身份"""
-        default_id = str(uuid.uuid4())
+        """加载默认AI身份（ID固定，可通过default_identity.id配置）"""
+        default_id = self.config.get('default_identity', {}).get('id', DEFAULT_IDENTITY_ID)
         
         # 创建默认人格
         personality = AIPersonality(
@@ -201,6 +341,8 @@ class IdentityManager:
         )
         
         self.identities[default_id] = default_identity
+        self.default_identity_id = default_id
+        self._track(default_identity)
         return default_identity
     
     def create_identity(self, name: str, description: str, **kwargs) -> AIIdentity:
@@ -247,6 +389,7 @@ class IdentityManager:
         )
         
         self.identities[identity_id] = identity
+        self._track(identity)
         return identity
     
     def get_identity(self, identity_id: str) -> Optional[AIIdentity]:
@@ -255,94 +398,502 @@ class IdentityManager:
     
     def get_default_identity(self) -> AIIdentity:
         """获取默认身份"""
-        if not self.identities:
+        identity = self.get_identity(self.default_identity_id) if self.default_identity_id else None
+        if identity is not None:
+            return identity
+        for identity_id in self.identities:
+            identity = self.get_identity(identity_id)
+            if identity is not None:
+                self.default_identity_id = identity_id
+                return identity
+        with self._default_lock:  # 避免多个线程同时创建默认身份
+            if self.default_identity_id in self.identities:
+                return self.identities[self.default_identity_id]
             return self.load_default_identity()
-        return list(self.identities.values())[0]
     
     def update_identity(self, identity_id: str, updates: Dict[str, Any]) -> bool:
-        """更新身份信息"""
+        """更新身份信息（在分片锁内整体写入，id字段不可修改）"""
         identity = self.get_identity(identity_id)
         if not identity:
             return False
         
-        for key, value in updates.items():
-            if hasattr(identity, key):
-                setattr(identity, key, value)
-        
-        identity.update_activity()
+        with self.identities.lock_for(identity_id):
+            for key, value in updates.items():
+                if key != 'id' and hasattr(identity, key):
+                    setattr(identity, key, value)
+            identity.update_activity()
+        self._track(identity)
+        return True
+    
+    def refresh_identity(self, identity_id: str) -> bool:
+        """
+        重新登记身份的兼容性特征
+        直接修改身份对象（如add_capability）后需调用
+        """
+        identity = self.get_identity(identity_id)
+        if not identity:
+            return False
+        self._track(identity)
         return True
     
+    def update_social_scores(self, scores: Dict[str, float], min_delta: float = 1e-4) -> int:
+        """
+        批量写入社交评分（如MoltbookAPIClient.social_scores()的结果）
+        只更新已有且变化超过min_delta的身份，同步数值列并记为待保存；返回更新的身份数
+        """
+        updated = []
+        for identity_id, score in scores.items():
+            identity = self.get_identity(identity_id)
+            if identity is None or abs(identity.social_score - score) < min_delta:
+                continue
+            with self.identities.lock_for(identity_id):
+                identity.social_score = score  # 不影响兼容性特征，无需重新登记索引
+            updated.append(identity)
+        if updated:
+            with self._lock:
+                for identity in updated:
+                    self.columns.update(identity)
+                    self._unsaved.add(identity.id)
+        return len(updated)
+    
     def delete_identity(self, identity_id: str) -> bool:
         """删除身份"""
-        if identity_id in self.identities:
-            del self.identities[identity_id]
-            return True
-        return False
+        if not self.identities.pop_if_present(identity_id):
+            return False
+        with self._lock:
+            self.compatibility.remove(identity_id)
+            self.similarity_index.remove(identity_id)
+            self.attribute_index.remove(identity_id)
+            self.columns.remove(identity_id)
+            self._unsaved.discard(identity_id)
+            self._deleted.add(identity_id)
+        return True
     
     def list_identities(self) -> List[AIIdentity]:
-        """列出所有身份"""
-        return list(self.identities.values())
+        """列出所有身份（快照，遍历期间不受其他线程增删影响）"""
+        return [identity for _, identity in self.identities.items_snapshot()]
+    
+    def _resolve(self, identity_ids: Iterable[str]) -> List[AIIdentity]:
+        """ID转身份，跳过查询期间被其他线程删除的"""
+        identities = (self.get_identity(identity_id) for identity_id in identity_ids)
+        return [identity for identity in identities if identity is not None]
+    
+    def _track(self, identity: AIIdentity, changed: bool = True, engine: bool = True):
+        """
+        登记身份到兼容性引擎、相似度索引和倒排索引，changed时记为待保存
+        engine为False时跳过兼容性引擎（从快照加载、引擎中已有该身份时）
+        """
+        features = identity_features(identity, self.similarity_index.dim)
+        capabilities = identity.features.capability_levels
+        with self._lock:
+            if changed:
+                self._unsaved.add(identity.id)
+                self._deleted.discard(identity.id)
+            if engine:
+                self.compatibility.mark_dirty(identity)
+            self.similarity_index.add(identity.id, features)
+            self.attribute_index.add(identity.id, identity.interests, identity.expertise,
+                                     capabilities)
+            self.columns.update(identity)
+    
+    def search_identities(self, interests: List[str] = None, match_all_interests: bool = False,
+                          expertise: List[str] = None,
+                          capabilities: Dict[str, LevelRange] = None) -> List[AIIdentity]:
+        """
+        按条件筛选身份（倒排表求交集，不扫描全部身份）
+        capabilities为能力名称 -> 最低等级或(最低等级, 最高等级)，例如{"reasoning": 0.8}
+        """
+        self._ensure_indexes()
+        with self._lock:
+            ids = self.attribute_index.query(interests, match_all_interests, expertise, capabilities)
+        return self._resolve(ids)
+    
+    def query(self, expression: str, limit: Optional[int] = None,
+              offset: int = 0) -> Iterator[AIIdentity]:
+        """
+        用查询语言筛选和排序身份，按需产出结果
+        例如 query("is_active and capability.reasoning >= 0.8 order by social_score desc", limit=10)；
+        语法见identity_query.compile_query，表达式只编译一次。
+        能用索引回答的条件不加载身份，排序键都是数值列时offset之前的身份也不加载；
+        惰性加载和快照模式下索引不依赖身份加载，只有实际产出或需逐个判断的身份才会加载
+        """
+        plan = compile_query(expression)  # 语法错误在调用时立即抛出
+        self._ensure_indexes()
+        # 全部ID取自倒排索引（持有_lock时不能再获取分片锁）
+        context = QueryContext(self.attribute_index, self.columns, self.attribute_index.query)
+        return plan.execute(context, self.get_identity, self._lock, limit, offset)
     
     def find_compatible_ais(self, target_identity: AIIdentity, limit: int = 5) -> List[AIIdentity]:
-        """查找兼容的AI身份"""
-        compatibilities = []
-        
-        for identity in self.identities.values():
-            if identity.id == target_identity.id:
-                continue  # 跳过自己
-            
-            compatibility = target_identity.calculate_compatibility(identity)
-            compatibilities.append((identity, compatibility))
-        
-        # 按兼容性排序
-        compatibilities.sort(key=lambda x: x[1], reverse=True)
-        
-        # 返回前limit个
-        return [ai for ai, _ in compatibilities[:limit]]
+        """
+        查找兼容的AI身份（一次向量化评分，只取前limit个）
+        身份数量超过ann_threshold时只对近似索引召回的候选精确打分
+        """
+        self._ensure_engine()
+        with self._lock:
+            top = None
+            # 相似度索引只在覆盖全部身份后使用（从快照启动时随身份加载逐步补齐）
+            if len(self.identities) > self.ann_threshold and \
+                    len(self.similarity_index) >= len(self.identities):
+                candidates = self.similarity_index.candidates(
+                    identity_features(target_identity, self.similarity_index.dim),
+                    max_candidates=max(self.ann_candidates, limit * 4)
+                )
+                top = self.compatibility.top_k(target_identity, limit, candidates=candidates)
+            if top is None or len(top) < limit:
+                top = self.compatibility.top_k(target_identity, limit)  # 自动跳过自己
+        return self._resolve(identity_id for identity_id, _ in top)
     
-    def save_to_file(self, filepath: str):
-        """保存身份数据到文件"""
-        data = {
-            'identities': {id: identity.to_dict() for id, identity in self.identities.items()},
+    def compatibility_matrix(self) -> Tuple[List[str], Any]:
+        """
+        获取全部身份两两之间的兼容性矩阵
+        返回(身份ID列表, 矩阵)，矩阵的行列顺序与ID列表一致。
+        首次调用分块计算；之后创建、更新、删除身份时只重算受影响的行和列。
+        矩阵是引擎内部存储，其他线程变更身份后再次调用时会被原地更新
+        """
+        self._ensure_engine()
+        with self._lock:
+            return self.compatibility.matrix()
+    
+    def iter_compatibility_blocks(self, block_rows: int = None) -> Iterator[Tuple[List[str], List[str], Any]]:
+        """
+        分块遍历兼容性矩阵（不保留完整矩阵，适合身份数量很大时）
+        每块为(行身份ID, 列身份ID, 分数块)；只在复制引擎状态时持锁，
+        遍历的是调用时的状态，期间其他线程的身份变更不受阻塞，也不影响本次遍历
+        """
+        self._ensure_engine()
+        with self._lock:
+            engine = self.compatibility.snapshot()
+        yield from engine.iter_blocks(block_rows)
+    
+    def _ensure_loaded(self):
+        """惰性模式下加载全部身份（全量查询前调用）"""
+        self.identities.load_all()
+    
+    def _ensure_indexes(self):
+        """倒排索引和数值列需要覆盖全部身份：未覆盖时（旧快照）先加载全部身份"""
+        if not self._indexes_complete:
+            self._ensure_loaded()
+            self._indexes_complete = True
+    
+    def _index_attributes(self, identity_id: str, interests: Iterable[str],
+                          expertise: Iterable[str], capabilities: Dict[str, float],
+                          social_score: float, is_active: bool):
+        """不构建身份对象，直接登记倒排索引和数值列（身份加载时由_track覆盖为相同内容）"""
+        self.attribute_index.add(identity_id, interests, expertise, capabilities)
+        self.columns.put(identity_id, social_score, is_active)
+    
+    def _index_record(self, data: Dict[str, Any]):
+        """用存储中的身份记录登记索引（能力等级同名时以最后一个为准，与IdentityFeatures一致）"""
+        capabilities = {cap['name']: cap['level'] for cap in data.get('capabilities', [])}
+        self._index_attributes(data['id'], data.get('interests', ()), data.get('expertise', ()),
+                               capabilities, data.get('social_score', 0.5),
+                               data.get('is_active', True))
+    
+    def _ensure_engine(self):
+        """兼容性引擎需要覆盖全部身份：从快照恢复时已满足，否则先加载全部身份"""
+        if not self._engine_restored:
+            self._ensure_loaded()
+    
+    def _load_identity(self, identity_id: str) -> Optional[AIIdentity]:
+        """惰性模式的加载回调：从存储读取身份并登记到索引"""
+        data = self._store.read(identity_id)
+        if data is None:
+            return None
+        identity = AIIdentity.from_dict(data)
+        self._track(identity, changed=False)
+        return identity
+    
+    def _store_for(self, filepath: str) -> IdentityStore:
+        if self._store is None or self._store.path != filepath:
+            self._store = IdentityStore.from_config(filepath, self.config.get('store', {}))
+            self._store_synced = False
+        return self._store
+    
+    def _meta(self) -> Dict[str, Any]:
+        return {
             'config': self.config,
+            'default_identity_id': self.default_identity_id,
             'saved_at': datetime.now().isoformat()
         }
+    
+    def save_to_file(self, filepath: str):
+        """
+        保存身份数据到文件（每行一条记录）
+        文件与内存已同步时只追加上次保存后变更和删除的身份，否则全量原子重写；
+        配置了snapshot_path时随后刷新快照，使快照与身份文件保持一致
+        """
+        self._ensure_loaded()
+        snapshot = self.list_identities()
+        with self._lock:
+            store = self._store_for(filepath)
+            if self._store_synced:
+                changed = [identity for identity in snapshot if identity.id in self._unsaved]
+                store.append((identity.to_dict() for identity in changed), self._deleted,
+                             meta=self._meta())
+            else:
+                changed = snapshot
+                store.rewrite((identity.to_dict() for identity in snapshot), meta=self._meta())
+                self._store_synced = True
+            # 快照之后新建的身份留到下次保存
+            self._unsaved.difference_update(identity.id for identity in changed)
+            self._deleted.clear()
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        snapshot_path = self.config.get('snapshot_path')
+        if snapshot_path:
+            self.save_snapshot(snapshot_path)
     
-    def load_from_file(self, filepath: str) -> bool:
-        """从文件加载身份数据"""
+    def load_from_file(self, filepath: str, lazy: Optional[bool] = None) -> bool:
+        """
+        从文件加载身份数据
+        逐行流式读取，内存中只保留最终的身份对象；lazy为True时（默认取配置store.lazy_load）
+        只建立ID到文件偏移量的索引和查询用的倒排索引、数值列，身份在首次访问时才构建。
+        兼容旧版整体JSON格式的文件（下次保存时转换为逐行格式）
+        """
+        if lazy is None:
+            lazy = self.config.get('store', {}).get('lazy_load', False)
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            self.identities.clear()
+            with open(filepath, 'rb') as f:
+                legacy = f.readline().strip() == b"{"
             
-            for id_str, identity_data in data.get('identities', {}).items():
-                # 转换datetime字符串
-                identity_data['created_at'] = datetime.fromisoformat(identity_data['created_at'])
-                if identity_data.get('last_active'):
-                    identity_data['last_active'] = datetime.fromisoformat(identity_data['last_active'])
+            with self._lock:
+                if legacy:
+                    return self._load_legacy_file(filepath)
                 
-                # 重建对象
-                identity = AIIdentity(**identity_data)
-                self.identities[id_str] = identity
+                store = self._store_for(filepath)
+                self._clear_indexes()
+                if lazy:
+                    for op, record in store.scan():
+                        if op == 'put':
+                            self._index_record(record['identity'])
+                        elif op == 'delete':
+                            self.attribute_index.remove(record['id'])
+                            self.columns.remove(record['id'])
+                    identities = ShardedIdentityMap.lazy(store.ids(), self._load_identity,
+                                                         self.num_shards)
+                else:
+                    identities = ShardedIdentityMap(self.num_shards)
+                    for op, record in store.scan():
+                        if op == 'put':
+                            identity = AIIdentity.from_dict(record['identity'])
+                            identities[identity.id] = identity
+                        elif op == 'delete':
+                            identities.pop_if_present(record['id'])
+                    for _, identity in identities.items_snapshot():
+                        self._track(identity, changed=False)
+                self.identities = identities
+                
+                meta = store.read_meta()
+                if 'config' in meta:
+                    self.config = meta['config']
+                self.default_identity_id = meta.get('default_identity_id') or next(iter(store.ids()), None)
+                self._store_synced = True
+                self._unsaved.clear()
+                self._deleted.clear()
+                return True
+        
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError) as e:
+            print(f"加载身份数据失败: {e}")
+            return False
+    
+    def _load_legacy_file(self, filepath: str) -> bool:
+        """读取旧版的整体JSON文件"""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        self._clear_indexes()
+        identities = ShardedIdentityMap(self.num_shards)
+        for identity_data in data.get('identities', {}).values():
+            identity = AIIdentity.from_dict(identity_data)
+            identities[identity.id] = identity
+            self._track(identity, changed=False)
+        self.identities = identities
+        self.config = data.get('config', {})
+        self.default_identity_id = next(iter(data.get('identities', {})), None)
+        self._store_synced = False
+        return True
+    
+    def _clear_indexes(self):
+        self._engine_restored = False
+        self._indexes_complete = True
+        self.compatibility.rebuild(())
+        self.similarity_index.clear()
+        self.attribute_index.clear()
+        self.columns.clear()
+    
+    def save_snapshot(self, filepath: str):
+        """
+        保存二进制快照（身份记录 + 兼容性引擎数组 + 查询索引属性）
+        从快照加载后尚未访问的身份直接复制原始记录，不重新解析
+        """
+        if not self._engine_restored:
+            self._ensure_loaded()
+        self._ensure_indexes()
+        with self._lock:
+            engine_state = self.compatibility.export_state()
+            ids = engine_state["ids"] if engine_state is not None else self.identities.keys_snapshot()
+            attributes = {}
+            for identity_id in ids:
+                entry = self.attribute_index.entry(identity_id)
+                if entry is not None:
+                    interests, expertise, capabilities = entry
+                    attributes[identity_id] = [
+                        sorted(interests), sorted(expertise), capabilities,
+                        self.columns.value("social_score", identity_id),
+                        self.columns.value("is_active", identity_id) == 1.0
+                    ]
             
-            self.config = data.get('config', {})
-            return True
+            def records():
+                for identity_id in ids:
+                    identity = self.identities.peek(identity_id)
+                    if identity is not None:
+                        record = json.dumps(identity.to_dict(), ensure_ascii=False).encode('utf-8')
+                    else:
+                        record = self._snapshot.read_raw(identity_id)
+                    yield identity_id, record
             
-        except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
-            print(f"加载身份数据失败: {e}")
+            # 内存与身份文件一致时记录文件的大小和修改时间，启动时据此判断快照是否过期
+            in_sync = self._store is not None and self._store_synced and \
+                not self._unsaved and not self._deleted
+            meta = dict(self._meta(), store=_file_stamp(self._store.path) if in_sync else None)
+            write_snapshot(filepath, meta, records(), engine_state, attributes)
+    
+    @staticmethod
+    def _snapshot_is_fresh(snapshot: IdentitySnapshot, filepath: str,
+                           storage_path: Optional[str]) -> bool:
+        """
+        快照是否不比身份文件旧
+        快照记录了身份文件的大小和修改时间时精确比较，否则比较两个文件的修改时间；
+        身份文件不存在时快照是唯一的数据来源
+        """
+        store = snapshot.meta.get('store')
+        path = store['path'] if store else storage_path
+        if not path or not os.path.exists(path):
+            return True
+        if store:
+            return _file_stamp(path) == store
+        return os.stat(path).st_mtime_ns <= os.stat(filepath).st_mtime_ns
+    
+    def load_snapshot(self, filepath: str, storage_path: Optional[str] = None) -> bool:
+        """
+        从二进制快照启动
+        只恢复ID列表、兼容性引擎数组和查询索引，身份在首次访问时从内存映射中解析；
+        恢复后即可进行兼容性查询和query()，相似度索引随身份加载逐步补齐。
+        提供storage_path时快照比身份文件旧则不加载，返回False
+        """
+        try:
+            snapshot = IdentitySnapshot(filepath)
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            print(f"加载身份快照失败: {e}")
             return False
+        if not self._snapshot_is_fresh(snapshot, filepath, storage_path):
+            print("身份快照早于身份文件的最近修改，改从身份文件加载")
+            snapshot.close()
+            return False
+        
+        with self._lock:
+            self._clear_indexes()
+            state = snapshot.engine_state()
+            if state is not None:
+                self.compatibility.restore_state(state)
+                self._engine_restored = True
+            del state  # 释放对映射内存的引用
+            attributes = snapshot.attributes()
+            if attributes is not None:
+                for identity_id, values in zip(snapshot.ids, attributes):
+                    self._index_attributes(identity_id, *values)
+            else:
+                self._indexes_complete = False
+            
+            previous, self._snapshot = self._snapshot, snapshot
+            self.identities = ShardedIdentityMap.lazy(snapshot.ids, self._load_snapshot_identity,
+                                                      self.num_shards)
+            if 'config' in snapshot.meta:
+                self.config = snapshot.meta['config']
+            self.default_identity_id = snapshot.meta.get('default_identity_id') or \
+                next(iter(snapshot.ids), None)
+            # 身份文件与快照内容不一定一致，下次save_to_file全量重写
+            self._store_synced = False
+            self._unsaved.clear()
+            self._deleted.clear()
+        
+        if previous is not None:
+            previous.close()
+        return True
+    
+    def _load_snapshot_identity(self, identity_id: str) -> Optional[AIIdentity]:
+        """快照模式的加载回调：解析身份并登记到索引（引擎已从快照恢复时跳过引擎）"""
+        data = self._snapshot.read(identity_id)
+        if data is None:
+            return None
+        identity = AIIdentity.from_dict(data)
+        self._track(identity, changed=False, engine=not self._engine_restored)
+        return identity
+    
+    async def _offload(self, func: Callable, *args, **kwargs):
+        """在默认线程池中执行同步方法"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+    
+    async def aget_identity(self, identity_id: str) -> Optional[AIIdentity]:
+        """异步获取身份（惰性模式下可能需要读文件）"""
+        return await self._offload(self.get_identity, identity_id)
+    
+    async def acreate_identity(self, name: str, description: str, **kwargs) -> AIIdentity:
+        """异步创建身份"""
+        return await self._offload(self.create_identity, name, description, **kwargs)
+    
+    async def aupdate_identity(self, identity_id: str, updates: Dict[str, Any]) -> bool:
+        """异步更新身份"""
+        return await self._offload(self.update_identity, identity_id, updates)
+    
+    async def adelete_identity(self, identity_id: str) -> bool:
+        """异步删除身份"""
+        return await self._offload(self.delete_identity, identity_id)
+    
+    async def alist_identities(self) -> List[AIIdentity]:
+        """异步列出所有身份"""
+        return await self._offload(self.list_identities)
+    
+    async def afind_compatible_ais(self, target_identity: AIIdentity, limit: int = 5) -> List[AIIdentity]:
+        """异步查找兼容的AI身份"""
+        return await self._offload(self.find_compatible_ais, target_identity, limit)
+    
+    async def asearch_identities(self, **criteria) -> List[AIIdentity]:
+        """异步按条件筛选身份"""
+        return await self._offload(self.search_identities, **criteria)
+    
+    async def aquery(self, expression: str, limit: Optional[int] = None,
+                     offset: int = 0) -> List[AIIdentity]:
+        """异步查询身份（在线程池中执行并收集结果）"""
+        return await self._offload(lambda: list(self.query(expression, limit, offset)))
+    
+    async def asave_to_file(self, filepath: str):
+        """异步保存身份数据"""
+        await self._offload(self.save_to_file, filepath)
+    
+    async def aload_from_file(self, filepath: str, lazy: Optional[bool] = None) -> bool:
+        """异步加载身份数据"""
+        return await self._offload(self.load_from_file, filepath, lazy)
+
+
+def _file_stamp(path: str) -> Optional[Dict[str, Any]]:
+    """文件的路径、大小和修改时间（纳秒），文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
 
 
 # 单例实例
 _identity_manager = None
+_identity_manager_lock = threading.Lock()
 
 def get_identity_manager(config: Dict[str, Any] = None) -> IdentityManager:
-    """获取身份管理器单例"""
+    """获取身份管理器单例（线程安全，只创建一次）"""
     global _identity_manager
     if _identity_manager is None:
-        _identity_manager = IdentityManager(config)
+        with _identity_manager_lock:
+            if _identity_manager is None:
+                _identity_manager = IdentityManager(config)
     return _identity_manager
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+分片身份字典
+按身份ID哈希分片、每片一把锁的线程安全映射，支持惰性加载
+"""
+
+import threading
+from collections.abc import MutableMapping
+from typing import Dict, List, Optional, Any, Callable, Iterable, Iterator, Tuple
+
+_MISSING = object()
+
+
+class ShardedIdentityMap(MutableMapping):
+    """
+    分片身份字典
+    写操作只锁住所在分片；读操作依赖dict单次查找的原子性，不加锁。
+    遍历基于逐片加锁复制出的快照，遍历期间其他线程可以继续增删。
+    提供loader时，值为None的条目表示尚未加载，首次访问时在分片锁内调用loader构建
+    """
+    
+    def __init__(self, num_shards: int = 16,
+                 loader: Optional[Callable[[str], Optional[Any]]] = None):
+        self.num_shards = num_shards
+        self._shards: List[Dict[str, Any]] = [{} for _ in range(num_shards)]
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+        self._loader = loader
+    
+    @classmethod
+    def lazy(cls, ids: Iterable[str], loader: Callable[[str], Optional[Any]],
+             num_shards: int = 16) -> 'ShardedIdentityMap':
+        """创建只包含ID、值在首次访问时加载的字典"""
+        mapping = cls(num_shards, loader)
+        shards = mapping._shards
+        for item_id in ids:
+            shards[hash(item_id) % num_shards][item_id] = None
+        return mapping
+    
+    def _shard_of(self, item_id: str) -> int:
+        # 分片只在进程内使用，直接用字符串缓存的哈希值
+        return hash(item_id) % self.num_shards
+    
+    def __getitem__(self, item_id: str) -> Any:
+        index = self._shard_of(item_id)
+        value = self._shards[index][item_id]
+        if value is None and self._loader is not None:
+            with self._locks[index]:
+                shard = self._shards[index]
+                value = shard[item_id]
+                if value is None:  # 加锁后再检查，避免重复加载
+                    value = self._loader(item_id)
+                    if value is None:
+                        del shard[item_id]
+                        raise KeyError(item_id)
+                    shard[item_id] = value
+        return value
+    
+    def peek(self, item_id: str) -> Optional[Any]:
+        """取已加载的值，不存在或尚未加载时返回None（不触发加载）"""
+        return self._shards[self._shard_of(item_id)].get(item_id)
+    
+    def __setitem__(self, item_id: str, value: Any):
+        index = self._shard_of(item_id)
+        with self._locks[index]:
+            self._shards[index][item_id] = value
+    
+    def __delitem__(self, item_id: str):
+        index = self._shard_of(item_id)
+        with self._locks[index]:
+            del self._shards[index][item_id]
+    
+    def lock_for(self, item_id: str) -> threading.Lock:
+        """条目所在分片的锁，用于对单个条目做多步修改"""
+        return self._locks[self._shard_of(item_id)]
+    
+    def pop_if_present(self, item_id: str) -> bool:
+        """删除条目，返回是否存在（检查和删除在同一次加锁内完成）"""
+        index = self._shard_of(item_id)
+        with self._locks[index]:
+            return self._shards[index].pop(item_id, _MISSING) is not _MISSING
+    
+    def __contains__(self, item_id: object) -> bool:
+        return isinstance(item_id, str) and item_id in self._shards[self._shard_of(item_id)]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys_snapshot())
+    
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+    
+    def keys_snapshot(self) -> List[str]:
+        """当前全部ID的快照"""
+        keys: List[str] = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                keys.extend(shard)
+        return keys
+    
+    def items_snapshot(self) -> List[Tuple[str, Any]]:
+        """当前全部条目的快照（未加载的条目会先加载）"""
+        items = []
+        for item_id in self.keys_snapshot():
+            try:
+                items.append((item_id, self[item_id]))
+            except KeyError:
+                continue  # 快照之后被其他线程删除
+        return items
+    
+    def _pending_ids(self) -> List[str]:
+        pending = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                pending.extend(item_id for item_id, value in shard.items() if value is None)
+        return pending
+    
+    @property
+    def pending(self) -> int:
+        """尚未加载的条目数"""
+        return len(self._pending_ids()) if self._loader is not None else 0
+    
+    def load_all(self):
+        """加载全部未加载的条目"""
+        if self._loader is None:
+            return
+        for item_id in self._pending_ids():
+            try:
+                self[item_id]
+            except KeyError:
+                continue  # 存储中已不存在
+    
+    def shard_sizes(self) -> List[int]:
+        """各分片的条目数"""
+        return [len(shard) for shard in self._shards]
+
@@ -0,0 +1,568 @@
+"""
+AI身份查询语言
+把过滤/排序表达式编译成执行计划：能用倒排索引或数值列回答的条件直接求出ID集合，
+其余条件逐个身份判断；结果按需产出，limit/offset尽量在加载身份之前生效
+
+示例：
+    is_active and social_score >= 0.6 and interests has any ['ethics', 'science']
+        and capability.reasoning between 0.7 and 1.0
+        order by social_score desc, name
+"""
+
+import functools
+import heapq
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Callable, Iterator, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # 未安装NumPy时列扫描退回纯Python实现
+    np = None
+
+
+class QuerySyntaxError(ValueError):
+    """查询表达式语法错误"""
+
+
+class IdentityColumns:
+    """
+    身份数值列（social_score、is_active）
+    按行存放，删除时末行移入空位；NumPy可用时比较条件在整列上一次完成
+    """
+    
+    FIELDS = ("social_score", "is_active")
+    
+    def __init__(self, initial_capacity: int = 64):
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        if np is not None:
+            self._values = {name: np.zeros(initial_capacity, dtype=np.float64) for name in self.FIELDS}
+        else:
+            self._values = {name: [] for name in self.FIELDS}
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def update(self, identity):
+        """写入或更新身份所在行"""
+        self.put(identity.id, identity.social_score, identity.is_active)
+    
+    def put(self, identity_id: str, social_score: float, is_active: bool):
+        """按字段值写入或更新行（从存储记录或快照建列时不需要构建身份对象）"""
+        row = self._rows.get(identity_id)
+        if row is None:
+            row = len(self._ids)
+            self._ids.append(identity_id)
+            self._rows[identity_id] = row
+            if np is not None:
+                capacity = len(self._values["social_score"])
+                if row >= capacity:
+                    for name, column in self._values.items():
+                        grown = np.zeros(capacity * 2, dtype=np.float64)
+                        grown[:capacity] = column
+                        self._values[name] = grown
+            else:
+                for column in self._values.values():
+                    column.append(0.0)
+        self._values["social_score"][row] = float(social_score)
+        self._values["is_active"][row] = 1.0 if is_active else 0.0
+    
+    def remove(self, identity_id: str):
+        """删除身份所在行"""
+        row = self._rows.pop(identity_id, None)
+        if row is None:
+            return
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+            for column in self._values.values():
+                column[row] = column[last]
+        self._ids.pop()
+        if np is None:
+            for column in self._values.values():
+                column.pop()
+    
+    def clear(self):
+        """清空"""
+        self._ids = []
+        self._rows = {}
+        if np is None:
+            self._values = {name: [] for name in self.FIELDS}
+    
+    def value(self, field: str, identity_id: str) -> Optional[float]:
+        """单个身份的列值"""
+        row = self._rows.get(identity_id)
+        return None if row is None else float(self._values[field][row])
+    
+    def select(self, field: str, op: str, operand: float) -> Set[str]:
+        """满足列比较条件的身份ID"""
+        n = len(self._ids)
+        column = self._values[field]
+        if np is not None:
+            mask = _NUMPY_OPS[op](column[:n], operand)
+            return {self._ids[row] for row in np.flatnonzero(mask)}
+        compare = _PYTHON_OPS[op]
+        return {self._ids[row] for row in range(n) if compare(column[row], operand)}
+
+
+_PYTHON_OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+if np is not None:
+    _NUMPY_OPS = {
+        "=": np.equal,
+        "!=": np.not_equal,
+        "<": np.less,
+        "<=": np.less_equal,
+        ">": np.greater,
+        ">=": np.greater_equal,
+    }
+
+# 身份的标量字段（可比较、可排序）
+_SCALAR_FIELDS = {"id", "name", "description", "version", "creator", "social_score",
+                  "is_active", "created_at", "last_active"}
+_LIST_FIELDS = {"interests", "expertise"}
+_KEYWORDS = {"and", "or", "not", "in", "has", "any", "all", "between", "order", "by",
+             "asc", "desc", "true", "false", "null"}
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<number>-?(?:\d+\.?\d*|\.\d+))
+      | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<op><=|>=|!=|==|=|<|>|\(|\)|\[|\]|,)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z0-9_]+)*)
+    )""", re.VERBOSE)
+
+
+def _tokenize(text: str) -> List[Tuple[str, Any]]:
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise QuerySyntaxError(f"无法识别的内容: {text[position:position + 20]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "number":
+            tokens.append(("value", float(value) if "." in value else int(value)))
+        elif kind == "string":
+            tokens.append(("value", re.sub(r"\\(.)", r"\1", value[1:-1])))
+        elif kind == "op":
+            tokens.append(("op", "=" if value == "==" else value))
+        elif value.lower() in ("true", "false"):
+            tokens.append(("value", value.lower() == "true"))
+        elif value.lower() == "null":
+            tokens.append(("value", None))
+        elif value.lower() in _KEYWORDS:
+            tokens.append(("keyword", value.lower()))
+        else:
+            tokens.append(("name", value))
+    tokens.append(("end", None))
+    return tokens
+
+
+class _Node:
+    """
+    编译后的条件
+    row: 对单个身份求值的完整谓词；
+    ids: 不加载身份、直接用索引或数值列求出ID集合的函数（无法下推时为None）；
+    residual: ids求出的集合还需逐个身份判断的剩余谓词（完全下推时为None）
+    """
+    
+    __slots__ = ("row", "ids", "residual", "description")
+    
+    def __init__(self, row: Callable[[Any], bool],
+                 ids: Optional[Callable[['QueryContext'], Set[str]]] = None,
+                 residual: Optional[Callable[[Any], bool]] = None, description: str = ""):
+        self.row = row
+        self.ids = ids
+        self.residual = row if ids is None else residual
+        self.description = description
+    
+    @property
+    def exact(self) -> bool:
+        """ID集合即为结果，无需逐个判断"""
+        return self.ids is not None and self.residual is None
+
+
+class QueryContext:
+    """执行计划时可用的索引"""
+    
+    def __init__(self, attribute_index, columns: IdentityColumns, all_ids: Callable[[], Set[str]]):
+        self.attribute_index = attribute_index
+        self.columns = columns
+        self.all_ids = all_ids
+
+
+class _Parser:
+    """递归下降解析器，解析的同时生成条件节点"""
+    
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.position = 0
+    
+    def peek(self, kind: str = None, value: Any = None) -> bool:
+        token_kind, token_value = self.tokens[self.position]
+        return (kind is None or token_kind == kind) and (value is None or token_value == value)
+    
+    def take(self, kind: str = None, value: Any = None) -> Any:
+        if not self.peek(kind, value):
+            token = self.tokens[self.position]
+            expected = value or kind
+            raise QuerySyntaxError(f"期望{expected}，实际为{token[1] if token[0] != 'end' else '结尾'}")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token[1]
+    
+    def accept(self, kind: str, value: Any = None) -> bool:
+        if self.peek(kind, value):
+            self.position += 1
+            return True
+        return False
+    
+    def parse(self) -> Tuple[Optional[_Node], List[Tuple[str, bool]]]:
+        condition = None
+        if not self.peek("keyword", "order") and not self.peek("end"):
+            condition = self.parse_or()
+        order = []
+        if self.accept("keyword", "order"):
+            self.take("keyword", "by")
+            while True:
+                field = self.take("name")
+                _field_getter(field)  # 校验字段名
+                descending = False
+                if self.accept("keyword", "desc"):
+                    descending = True
+                else:
+                    self.accept("keyword", "asc")
+                order.append((field, descending))
+                if not self.accept("op", ","):
+                    break
+        self.take("end")
+        return condition, order
+    
+    def parse_or(self) -> _Node:
+        nodes = [self.parse_and()]
+        while self.accept("keyword", "or"):
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else _or(nodes)
+    
+    def parse_and(self) -> _Node:
+        nodes = [self.parse_not()]
+        while self.accept("keyword", "and"):
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else _and(nodes)
+    
+    def parse_not(self) -> _Node:
+        if self.accept("keyword", "not"):
+            return _not(self.parse_not())
+        if self.accept("op", "("):
+            node = self.parse_or()
+            self.take("op", ")")
+            return node
+        return self.parse_comparison()
+    
+    def parse_values(self) -> List[Any]:
+        self.take("op", "[")
+        values = []
+        if not self.peek("op", "]"):
+            values.append(self.take("value"))
+            while self.accept("op", ","):
+                values.append(self.take("value"))
+        self.take("op", "]")
+        return values
+    
+    def parse_comparison(self) -> _Node:
+        field = self.take("name")
+        if self.accept("keyword", "has"):
+            if self.accept("keyword", "any"):
+                return _has(field, self.parse_values(), match_all=False)
+            if self.accept("keyword", "all"):
+                return _has(field, self.parse_values(), match_all=True)
+            return _has(field, [self.take("value")], match_all=True)
+        if self.accept("keyword", "in"):
+            return _in(field, self.parse_values())
+        if self.accept("keyword", "between"):
+            low = self.take("value")
+            self.take("keyword", "and")
+            high = self.take("value")
+            return _and([_compare(field, ">=", low), _compare(field, "<=", high)])
+        if self.peek("op") and self.tokens[self.position][1] in _PYTHON_OPS:
+            op = self.take("op")
+            return _compare(field, op, self.take("value"))
+        # 单独的字段名视为布尔条件，例如 is_active
+        return _compare(field, "=", True)
+
+
+def _field_getter(field: str) -> Callable[[Any], Any]:
+    """字段名 -> 从身份取值的函数"""
+    if field in _SCALAR_FIELDS or field in _LIST_FIELDS:
+        return lambda identity: getattr(identity, field)
+    head, _, rest = field.partition(".")
+    if head in ("capability", "capabilities") and rest:
+        return lambda identity: identity.features.capability_levels.get(rest)
+    if head in ("prefs", "collaboration_preferences") and rest:
+        return lambda identity: identity.collaboration_preferences.get(rest)
+    raise QuerySyntaxError(f"未知字段: {field}")
+
+
+def _coerce(field: str, value: Any) -> Any:
+    """时间字段的字符串值转换为datetime"""
+    if field in ("created_at", "last_active") and isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            raise QuerySyntaxError(f"无效的时间: {value!r}")
+    return value
+
+
+def _compare(field: str, op: str, value: Any) -> _Node:
+    getter = _field_getter(field)
+    value = _coerce(field, value)
+    compare = _PYTHON_OPS[op]
+    
+    def row(identity) -> bool:
+        actual = getter(identity)
+        if actual is None or value is None:
+            return compare(actual, value) if op in ("=", "!=") else False
+        try:
+            return compare(actual, value)
+        except TypeError:
+            return False
+    
+    ids = None
+    description = f"{field} {op} {value!r}"
+    if field == "id" and op == "=":
+        ids = lambda context: {value} & context.all_ids()
+    elif field in IdentityColumns.FIELDS and isinstance(value, (int, float)):
+        operand = float(value)
+        ids = lambda context: context.columns.select(field, op, operand)
+        description = f"列扫描({description})"
+    elif field.partition(".")[0] in ("capability", "capabilities") and \
+            isinstance(value, (int, float)) and not isinstance(value, bool) and op != "!=":
+        name = field.partition(".")[2]
+        low = {">=": value, ">": value, "=": value}.get(op, float("-inf"))
+        high = {"<=": value, "<": value, "=": value}.get(op, float("inf"))
+        strict = op in ("<", ">")
+        
+        def ids(context, name=name, low=low, high=high, strict=strict):
+            found = context.attribute_index.with_capability(name, low, high)
+            if strict:  # 倒排索引按闭区间查询，严格比较时去掉端点
+                found = {identity_id for identity_id in found
+                         if context.attribute_index.capability_level(name, identity_id) != value}
+            return found
+        description = f"能力索引({description})"
+    return _Node(row, ids, description=description)
+
+
+def _has(field: str, values: List[Any], match_all: bool) -> _Node:
+    if field not in _LIST_FIELDS:
+        raise QuerySyntaxError(f"has只能用于interests或expertise: {field}")
+    wanted = set(values)
+    
+    def row(identity) -> bool:
+        items = identity.features.interest_set if field == "interests" else set(identity.expertise)
+        return wanted.issubset(items) if match_all else not wanted.isdisjoint(items)
+    
+    if field == "interests":
+        ids = lambda context: context.attribute_index.query(interests=wanted, match_all=match_all)
+    elif match_all:
+        ids = lambda context: context.attribute_index.query(expertise=wanted)
+    else:
+        ids = lambda context: set().union(*(context.attribute_index.with_expertise(skill)
+                                            for skill in wanted))
+    mode = "all" if match_all else "any"
+    return _Node(row, ids, description=f"倒排索引({field} has {mode} {sorted(wanted)!r})")
+
+
+def _in(field: str, values: List[Any]) -> _Node:
+    getter = _field_getter(field)
+    wanted = {_coerce(field, value) for value in values}
+    row = lambda identity: getter(identity) in wanted
+    ids = None
+    if field == "id":
+        ids = lambda context: wanted & context.all_ids()
+    return _Node(row, ids, description=f"{field} in {sorted(map(str, wanted))!r}")
+
+
+def _all(predicates: List[Callable[[Any], bool]]) -> Optional[Callable[[Any], bool]]:
+    if not predicates:
+        return None
+    if len(predicates) == 1:
+        return predicates[0]
+    return lambda identity: all(predicate(identity) for predicate in predicates)
+
+
+def _and(nodes: List[_Node]) -> _Node:
+    """可下推的子条件求交集，其余子条件留作剩余谓词"""
+    row = _all([node.row for node in nodes])
+    indexed = [node.ids for node in nodes if node.ids is not None]
+    residual = _all([node.residual for node in nodes if node.residual is not None])
+    ids = None
+    if indexed:
+        def ids(context):
+            # 从最小的集合开始求交集
+            sets = sorted((evaluate(context) for evaluate in indexed), key=len)
+            result = set(sets[0])
+            for other in sets[1:]:
+                if not result:
+                    break
+                result &= other
+            return result
+    return _Node(row, ids, residual,
+                 "(" + " and ".join(node.description for node in nodes) + ")")
+
+
+def _or(nodes: List[_Node]) -> _Node:
+    """所有子条件都能完全下推时求并集，否则逐个身份判断"""
+    row = lambda identity: any(node.row(identity) for node in nodes)
+    ids = None
+    if all(node.exact for node in nodes):
+        ids = lambda context: set().union(*(node.ids(context) for node in nodes))
+    return _Node(row, ids, description="(" + " or ".join(node.description for node in nodes) + ")")
+
+
+def _not(node: _Node) -> _Node:
+    row = lambda identity: not node.row(identity)
+    ids = None
+    if node.exact:
+        ids = lambda context: context.all_ids() - node.ids(context)
+    return _Node(row, ids, description=f"not {node.description}")
+
+
+def _sort_key(value: Any, descending: bool) -> Tuple[bool, Any]:
+    # 空值总是排在最后
+    return (value is not None, value) if descending else (value is None, value)
+
+
+class CompiledQuery:
+    """
+    编译后的查询计划（不可变，可在线程间共享）
+    执行时先用索引求出候选ID，排序键都是数值列或ID时不加载身份即可排序和分页
+    """
+    
+    def __init__(self, expression: str, condition: Optional[_Node], order: List[Tuple[str, bool]]):
+        self.expression = expression
+        self.condition = condition
+        self.order = order
+        self.residual = condition.residual if condition is not None else None
+        self.column_order = all(field == "id" or field in IdentityColumns.FIELDS
+                                for field, _ in order)
+    
+    def explain(self) -> Dict[str, Any]:
+        """执行计划说明"""
+        condition = self.condition
+        return {
+            "condition": condition.description if condition is not None else None,
+            "index": condition is not None and condition.ids is not None,
+            "residual": self.residual is not None,
+            "order": [f"{field} {'desc' if descending else 'asc'}" for field, descending in self.order],
+            "order_by_columns": self.column_order
+        }
+    
+    def _candidates(self, context: QueryContext) -> List[str]:
+        condition = self.condition
+        ids = condition.ids(context) if condition is not None and condition.ids is not None \
+            else context.all_ids()
+        if not self.order:
+            return sorted(ids)  # 无排序条件时按ID排序，保证分页稳定
+        if not self.column_order:
+            return list(ids)
+        
+        columns = context.columns
+        ordered = sorted(ids)
+        # 从最后一个排序键开始做稳定排序
+        for field, descending in reversed(self.order):
+            if field == "id":
+                ordered.sort(reverse=descending)
+            else:
+                ordered.sort(key=lambda identity_id: _sort_key(columns.value(field, identity_id),
+                                                               descending),
+                             reverse=descending)
+        return ordered
+    
+    def execute(self, context: QueryContext, lookup: Callable[[str], Optional[Any]], lock=None,
+                limit: Optional[int] = None, offset: int = 0) -> Iterator[Any]:
+        """
+        执行查询，按需产出身份
+        lookup: ID -> 身份（已删除时返回None）；lock: 求候选ID期间持有的锁，产出结果时已释放
+        """
+        if limit is not None and limit <= 0:
+            return
+        if lock is not None:
+            with lock:
+                candidates = self._candidates(context)
+        else:
+            candidates = self._candidates(context)
+        
+        if self.order and not self.column_order:
+            yield from self._sorted_rows(candidates, lookup, limit, offset)
+            return
+        
+        residual = self.residual
+        if residual is None:
+            # 没有剩余谓词时跳过offset之前的ID，不加载身份
+            stop = None if limit is None else offset + limit
+            candidates = candidates[offset:stop]
+            offset = 0
+        
+        produced = 0
+        for identity_id in candidates:
+            identity = lookup(identity_id)
+            if identity is None or (residual is not None and not residual(identity)):
+                continue
+            if offset:
+                offset -= 1
+                continue
+            yield identity
+            produced += 1
+            if limit is not None and produced >= limit:
+                return
+    
+    def _sorted_rows(self, candidates: List[str], lookup: Callable[[str], Optional[Any]],
+                     limit: Optional[int], offset: int) -> Iterator[Any]:
+        """排序键包含非列字段时，加载全部候选身份后排序"""
+        residual = self.residual
+        rows = []
+        for identity_id in sorted(candidates):
+            identity = lookup(identity_id)
+            if identity is not None and (residual is None or residual(identity)):
+                rows.append(identity)
+        
+        getters = [(_field_getter(field), descending) for field, descending in self.order]
+        if limit is not None and len(getters) == 1 and not getters[0][1]:
+            getter = getters[0][0]
+            rows = heapq.nsmallest(offset + limit, rows,
+                                   key=lambda identity: _sort_key(getter(identity), False))
+        else:
+            for getter, descending in reversed(getters):
+                rows.sort(key=lambda identity: _sort_key(getter(identity), descending),
+                          reverse=descending)
+        stop = None if limit is None else offset + limit
+        yield from rows[offset:stop]
+
+
+@functools.lru_cache(maxsize=256)
+def compile_query(expression: str) -> CompiledQuery:
+    """
+    编译查询表达式（结果按表达式缓存）
+    语法：条件由and、or、not和括号组合，条件形如
+    field op value（op为= != < <= > >=）、field in [..]、field between a and b、
+    interests/expertise has x | has any [..] | has all [..]，或单独的布尔字段；
+    末尾可跟order by field [asc|desc], ...
+    字段：id、name、description、version、creator、social_score、is_active、
+    created_at、last_active、interests、expertise、capability.<能力名>、prefs.<协作偏好>
+    """
+    condition, order = _Parser(expression).parse()
+    return CompiledQuery(expression, condition, order)
@@ -0,0 +1,191 @@
+"""
+AI身份二进制快照
+带版本号的分段文件：身份记录按偏移量随机读取，兼容性引擎的行数组按列存放，
+查询索引所需的属性单独成段；加载时内存映射文件，身份在首次访问时才解析
+"""
+
+import json
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # 未安装NumPy时只读写身份记录，不保存引擎数组
+    np = None
+
+
+MAGIC = b"MBIDSNAP"
+VERSION = 1
+
+# 文件头：魔数、版本、分段数；分段表每项：名称、偏移量、长度
+_HEADER = struct.Struct("<8sII")
+_SECTION = struct.Struct("<16sQQ")
+_ALIGN = 8
+
+# 引擎数组分段及其dtype
+_ENGINE_ARRAYS = (
+    ("interest_bits", "uint8"),
+    ("interest_len", "int32"),
+    ("cap_levels", "float64"),
+    ("cap_mask", "bool"),
+    ("active", "bool"),
+)
+
+
+def write_snapshot(path: str, meta: Dict[str, Any], records: Iterable[Tuple[str, bytes]],
+                   engine_state: Optional[Dict[str, Any]] = None,
+                   attributes: Optional[Dict[str, List[Any]]] = None):
+    """
+    写入快照（临时文件 + 原子替换）
+    records: (身份ID, UTF-8编码的JSON记录)；engine_state为CompatibilityEngine.export_state()的结果，
+    其行顺序需与records一致，否则不写入引擎数组；
+    attributes: 身份ID -> [兴趣, 专长, 能力等级, social_score, is_active]，
+    覆盖全部身份时写入，加载时据此重建倒排索引和数值列而不解析身份记录
+    """
+    ids: List[str] = []
+    offsets = [0]
+    chunks: List[bytes] = []
+    for identity_id, record in records:
+        ids.append(identity_id)
+        chunks.append(record)
+        offsets.append(offsets[-1] + len(record))
+    
+    meta = dict(meta, count=len(ids))
+    sections: List[Tuple[str, bytes]] = [
+        ("ids", "\n".join(ids).encode('utf-8')),
+        ("offsets", struct.pack(f"<{len(offsets)}Q", *offsets)),
+        ("records", b"".join(chunks)),
+    ]
+    if engine_state is not None and np is not None and engine_state["ids"] == ids:
+        meta["engine"] = {
+            "interest_vocab": engine_state["interest_vocab"],
+            "capability_vocab": engine_state["capability_vocab"],
+            "shapes": {name: list(np.shape(engine_state[name])) for name, _ in _ENGINE_ARRAYS}
+        }
+        for name, dtype in _ENGINE_ARRAYS:
+            array = np.ascontiguousarray(engine_state[name], dtype=dtype)
+            sections.append((name, array.tobytes()))
+    if attributes is not None and all(identity_id in attributes for identity_id in ids):
+        sections.append(("attributes", json.dumps([attributes[identity_id] for identity_id in ids],
+                                                  ensure_ascii=False).encode('utf-8')))
+    sections.insert(0, ("meta", json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+    
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        offset = _HEADER.size + _SECTION.size * len(sections)
+        table = []
+        for name, data in sections:
+            offset += -offset % _ALIGN
+            table.append(_SECTION.pack(name.encode('ascii'), offset, len(data)))
+            offset += len(data)
+        f.write(_HEADER.pack(MAGIC, VERSION, len(sections)))
+        f.write(b"".join(table))
+        for name, data in sections:
+            f.write(b"\0" * (-f.tell() % _ALIGN))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class IdentitySnapshot:
+    """
+    快照读取器
+    打开时只解析文件头、meta和ID列表；read()按偏移量从内存映射中取出单条记录
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空文件无法映射
+            self._file.close()
+            raise ValueError(f"快照文件为空: {path}")
+        
+        try:
+            magic, version, count = _HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise ValueError(f"不是身份快照文件: {path}")
+            if version != VERSION:
+                raise ValueError(f"不支持的快照版本: {version}")
+            
+            self._sections: Dict[str, Tuple[int, int]] = {}
+            for index in range(count):
+                name, offset, length = _SECTION.unpack_from(
+                    self._map, _HEADER.size + index * _SECTION.size)
+                self._sections[name.rstrip(b"\0").decode('ascii')] = (offset, length)
+            
+            self.meta: Dict[str, Any] = json.loads(self._section("meta"))
+            ids = self._section("ids").decode('utf-8')
+            self.ids: List[str] = ids.split("\n") if ids else []
+            self._positions = {identity_id: index for index, identity_id in enumerate(self.ids)}
+            self._offsets = struct.unpack_from(f"<{len(self.ids) + 1}Q", self._map,
+                                               self._sections["offsets"][0])
+            self._records_start = self._sections["records"][0]
+        except Exception:
+            self.close()
+            raise
+    
+    def _section(self, name: str) -> bytes:
+        offset, length = self._sections[name]
+        return self._map[offset:offset + length]
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def __contains__(self, identity_id: str) -> bool:
+        return identity_id in self._positions
+    
+    def read(self, identity_id: str) -> Optional[Dict[str, Any]]:
+        """读取单个身份的数据"""
+        record = self.read_raw(identity_id)
+        return json.loads(record) if record is not None else None
+    
+    def read_raw(self, identity_id: str) -> Optional[bytes]:
+        """读取单个身份的原始JSON记录"""
+        index = self._positions.get(identity_id)
+        if index is None:
+            return None
+        start = self._records_start + self._offsets[index]
+        return self._map[start:self._records_start + self._offsets[index + 1]]
+    
+    def attributes(self) -> Optional[List[List[Any]]]:
+        """与ids对齐的[兴趣, 专长, 能力等级, social_score, is_active]列表，快照未包含时返回None"""
+        if "attributes" not in self._sections:
+            return None
+        return json.loads(self._section("attributes"))
+    
+    def engine_state(self) -> Optional[Dict[str, Any]]:
+        """
+        兼容性引擎的状态，快照未包含或未安装NumPy时返回None
+        数组是映射内存上的只读视图，关闭快照前需释放（restore_state会复制）
+        """
+        engine = self.meta.get("engine")
+        if engine is None or np is None:
+            return None
+        state = {
+            "ids": self.ids,
+            "interest_vocab": engine["interest_vocab"],
+            "capability_vocab": engine["capability_vocab"]
+        }
+        for name, dtype in _ENGINE_ARRAYS:
+            offset, length = self._sections[name]
+            array = np.frombuffer(self._map, dtype=dtype, count=length // np.dtype(dtype).itemsize,
+                                  offset=offset)
+            state[name] = array.reshape(engine["shapes"][name])
+        return state
+    
+    def close(self):
+        """关闭映射和文件"""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
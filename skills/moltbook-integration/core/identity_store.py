@@ -0,0 +1,202 @@
+"""
+AI身份存储
+每行一条记录的追加式文件（JSONL），支持增量保存、流式加载、按需读取和压缩
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Tuple
+
+
+class IdentityStore:
+    """
+    身份记录文件
+    记录格式：{"op": "put", "identity": {...}}、{"op": "delete", "id": ...}、
+    {"op": "meta", ...}，同一身份以最后一条记录为准。
+    每次保存把新记录拼成一次write追加到文件末尾，末尾不完整的行在加载时截掉；
+    失效记录占比超过compact_ratio时把有效记录重写到临时文件后原子替换。
+    内存中只保存每个身份最新记录的偏移量
+    """
+    
+    def __init__(self, path: str, compact_ratio: float = 0.5, min_compact_records: int = 256,
+                 fsync: bool = False):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.min_compact_records = min_compact_records
+        self.fsync = fsync
+        
+        self._offsets: Dict[str, int] = {}  # 身份ID -> 最新put记录的偏移量
+        self._meta_offset: Optional[int] = None
+        self._records = 0                   # 文件中的记录总数（含失效记录）
+    
+    @classmethod
+    def from_config(cls, path: str, config: Dict[str, Any]) -> 'IdentityStore':
+        """从identity.store配置段创建"""
+        return cls(
+            path,
+            compact_ratio=config.get('compact_ratio', 0.5),
+            min_compact_records=config.get('min_compact_records', 256),
+            fsync=config.get('fsync', False)
+        )
+    
+    def __len__(self) -> int:
+        return len(self._offsets)
+    
+    def __contains__(self, identity_id: str) -> bool:
+        return identity_id in self._offsets
+    
+    def ids(self) -> List[str]:
+        """文件中现存的身份ID"""
+        return list(self._offsets)
+    
+    @property
+    def garbage(self) -> int:
+        """失效记录数"""
+        live = len(self._offsets) + (1 if self._meta_offset is not None else 0)
+        return self._records - live
+    
+    def _reset(self):
+        self._offsets = {}
+        self._meta_offset = None
+        self._records = 0
+    
+    def scan(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        逐行读取文件，产出(op, 记录)并重建偏移量索引
+        只保留当前一行的数据，调用方按需处理；末尾不完整的记录会被截掉
+        """
+        self._reset()
+        if not os.path.exists(self.path):
+            return
+        
+        valid_size = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                offset, valid_size = valid_size, valid_size + len(line)
+                self._records += 1
+                op = record.get('op')
+                if op == 'put':
+                    self._offsets[record['identity']['id']] = offset
+                elif op == 'delete':
+                    self._offsets.pop(record['id'], None)
+                elif op == 'meta':
+                    self._meta_offset = offset
+                yield op, record
+        
+        if valid_size < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_size)
+    
+    def index(self):
+        """只建立偏移量索引（惰性加载时使用）"""
+        for _ in self.scan():
+            pass
+    
+    def _read_line(self, offset: int) -> bytes:
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return f.readline()
+    
+    def read(self, identity_id: str) -> Optional[Dict[str, Any]]:
+        """读取单个身份的最新数据"""
+        offset = self._offsets.get(identity_id)
+        if offset is None:
+            return None
+        return json.loads(self._read_line(offset))['identity']
+    
+    def read_meta(self) -> Dict[str, Any]:
+        """读取最新的meta记录"""
+        if self._meta_offset is None:
+            return {}
+        return json.loads(self._read_line(self._meta_offset))
+    
+    def append(self, puts: Iterable[Dict[str, Any]] = (), deletes: Iterable[str] = (),
+               meta: Optional[Dict[str, Any]] = None):
+        """把一批变更作为一次写入追加到文件末尾"""
+        records = [{"op": "put", "identity": data} for data in puts]
+        records.extend({"op": "delete", "id": identity_id} for identity_id in deletes)
+        if meta is not None:
+            records.append(dict(meta, op="meta"))
+        if not records:
+            return
+        
+        lines = [self._encode(record) for record in records]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            f.write(b"".join(lines))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        
+        for record, line in zip(records, lines):
+            if record['op'] == 'put':
+                self._offsets[record['identity']['id']] = offset
+            elif record['op'] == 'delete':
+                self._offsets.pop(record['id'], None)
+            else:
+                self._meta_offset = offset
+            offset += len(line)
+        self._records += len(records)
+        
+        if self._records >= self.min_compact_records and \
+                self.garbage > self._records * self.compact_ratio:
+            self.compact()
+    
+    def rewrite(self, puts: Iterable[Dict[str, Any]], meta: Optional[Dict[str, Any]] = None):
+        """用给定的身份全量重写文件（原子替换）"""
+        entries = [(data['id'], self._encode({"op": "put", "identity": data})) for data in puts]
+        if meta is not None:
+            entries.append((None, self._encode(dict(meta, op="meta"))))
+        self._write_atomic(entries)
+    
+    def compact(self):
+        """只保留每个身份的最新记录，原子替换原文件"""
+        located = [(offset, identity_id) for identity_id, offset in self._offsets.items()]
+        if self._meta_offset is not None:
+            located.append((self._meta_offset, None))
+        located.sort(key=lambda item: item[0])
+        entries = []
+        with open(self.path, 'rb') as f:
+            for offset, identity_id in located:
+                f.seek(offset)
+                entries.append((identity_id, f.readline()))
+        self._write_atomic(entries)
+    
+    @staticmethod
+    def _encode(record: Dict[str, Any]) -> bytes:
+        return json.dumps(record, ensure_ascii=False).encode('utf-8') + b"\n"
+    
+    def _write_atomic(self, entries: List[Tuple[Optional[str], bytes]]):
+        """写入(身份ID或None表示meta, 记录行)到临时文件，落盘后替换原文件"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        offsets: Dict[str, int] = {}
+        meta_offset = None
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            offset = 0
+            for identity_id, line in entries:
+                f.write(line)
+                if identity_id is None:
+                    meta_offset = offset
+                else:
+                    offsets[identity_id] = offset
+                offset += len(line)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        
+        self._offsets = offsets
+        self._meta_offset = meta_offset
+        self._records = len(entries)
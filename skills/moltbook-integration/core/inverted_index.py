@@ -0,0 +1,174 @@
+"""
+AI属性倒排索引
+兴趣、专长 -> ID集合，能力 -> 按等级排序的等级/ID平行列表，用于过滤查询
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Any, Iterable, Set, Tuple, Union
+
+# 能力条件：最低等级，或(最低等级, 最高等级)
+LevelRange = Union[float, Tuple[float, float]]
+
+
+class InvertedIndex:
+    """
+    AI属性倒排索引
+    查询时按倒排表从短到长求交集，能力等级条件通过有序列表二分查找，
+    不需要逐个扫描条目。支持增量插入、更新和删除
+    """
+    
+    def __init__(self):
+        self._interests: Dict[str, Set[str]] = defaultdict(set)
+        self._expertise: Dict[str, Set[str]] = defaultdict(set)
+        self._capabilities: Dict[str, Dict[str, float]] = defaultdict(dict)    # 能力 -> {ID: 等级}
+        self._levels: Dict[str, List[float]] = defaultdict(list)             # 能力 -> 升序等级
+        self._level_ids: Dict[str, List[str]] = defaultdict(list)            # 与_levels对应的ID
+        self._entries: Dict[str, Tuple[Set[str], Set[str], Dict[str, float]]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._entries
+    
+    def add(self, item_id: str, interests: Iterable[str] = (), expertise: Iterable[str] = (),
+            capabilities: Optional[Dict[str, float]] = None):
+        """插入或更新条目"""
+        if item_id in self._entries:
+            self.remove(item_id)
+        
+        interests, expertise = set(interests), set(expertise)
+        capabilities = dict(capabilities or {})
+        for interest in interests:
+            self._interests[interest].add(item_id)
+        for skill in expertise:
+            self._expertise[skill].add(item_id)
+        for name, level in capabilities.items():
+            self._capabilities[name][item_id] = level
+            position = bisect_right(self._levels[name], level)
+            self._levels[name].insert(position, level)
+            self._level_ids[name].insert(position, item_id)
+        self._entries[item_id] = (interests, expertise, capabilities)
+    
+    def remove(self, item_id: str):
+        """删除条目"""
+        entry = self._entries.pop(item_id, None)
+        if entry is None:
+            return
+        interests, expertise, capabilities = entry
+        for interest in interests:
+            self._discard(self._interests, interest, item_id)
+        for skill in expertise:
+            self._discard(self._expertise, skill, item_id)
+        for name, level in capabilities.items():
+            del self._capabilities[name][item_id]
+            levels, ids = self._levels[name], self._level_ids[name]
+            position = ids.index(item_id, bisect_left(levels, level), bisect_right(levels, level))
+            del levels[position]
+            del ids[position]
+            if not levels:
+                del self._levels[name]
+                del self._level_ids[name]
+                del self._capabilities[name]
+    
+    @staticmethod
+    def _discard(postings: Dict[str, Set[str]], term: str, item_id: str):
+        ids = postings.get(term)
+        if ids is not None:
+            ids.discard(item_id)
+            if not ids:
+                del postings[term]
+    
+    def clear(self):
+        """清空索引"""
+        self._interests.clear()
+        self._expertise.clear()
+        self._capabilities.clear()
+        self._levels.clear()
+        self._level_ids.clear()
+        self._entries.clear()
+    
+    def with_interest(self, interest: str) -> Set[str]:
+        """具有某个兴趣的条目"""
+        return set(self._interests.get(interest, ()))
+    
+    def with_expertise(self, skill: str) -> Set[str]:
+        """具有某个专长的条目"""
+        return set(self._expertise.get(skill, ()))
+    
+    def with_capability(self, name: str, min_level: float = 0.0,
+                        max_level: float = float('inf')) -> Set[str]:
+        """能力等级在[min_level, max_level]内的条目"""
+        levels = self._levels.get(name)
+        if not levels:
+            return set()
+        start = bisect_left(levels, min_level)
+        end = bisect_right(levels, max_level)
+        return set(self._level_ids[name][start:end])
+    
+    def entry(self, item_id: str) -> Optional[Tuple[Set[str], Set[str], Dict[str, float]]]:
+        """条目的(兴趣, 专长, 能力等级)，不存在时返回None（调用方不应修改）"""
+        return self._entries.get(item_id)
+    
+    def capability_level(self, name: str, item_id: str) -> Optional[float]:
+        """条目某项能力的等级，没有该能力时返回None"""
+        owners = self._capabilities.get(name)
+        return owners.get(item_id) if owners else None
+    
+    def interest_overlap(self, interests: Iterable[str]) -> Counter:
+        """每个条目与给定兴趣的重合数（只包含至少重合一项的条目）"""
+        overlap: Counter = Counter()
+        for interest in set(interests):
+            overlap.update(self._interests.get(interest, ()))
+        return overlap
+    
+    def query(self, interests: Optional[Iterable[str]] = None, match_all: bool = False,
+              expertise: Optional[Iterable[str]] = None,
+              capabilities: Optional[Dict[str, LevelRange]] = None) -> Set[str]:
+        """
+        组合查询
+        interests: 兴趣条件，match_all为False时至少具有其一，为True时需全部具有
+        expertise: 需全部具有的专长
+        capabilities: 能力名称 -> 最低等级或(最低等级, 最高等级)，需全部满足
+        各条件之间为AND；未给出任何条件时返回全部条目
+        """
+        postings: List[Set[str]] = []  # 只读引用内部集合，求交集前先复制最短的一个
+        empty: Set[str] = set()
+        
+        interests = set(interests or ())
+        if interests:
+            if match_all:
+                postings.extend(self._interests.get(interest, empty) for interest in interests)
+            else:
+                postings.append(set().union(*(self._interests.get(interest, empty)
+                                              for interest in interests)))
+        
+        postings.extend(self._expertise.get(skill, empty) for skill in set(expertise or ()))
+        
+        for name, level_range in (capabilities or {}).items():
+            if isinstance(level_range, (tuple, list)):
+                postings.append(self.with_capability(name, *level_range))
+            else:
+                postings.append(self.with_capability(name, level_range))
+        
+        if not postings:
+            return set(self._entries)
+        
+        # 从最短的倒排表开始求交集
+        postings.sort(key=len)
+        result = set(postings[0])
+        for ids in postings[1:]:
+            if not result:
+                break
+            result &= ids
+        return result
+    
+    def stats(self) -> Dict[str, Any]:
+        """索引统计"""
+        return {
+            "items": len(self._entries),
+            "interests": len(self._interests),
+            "expertise": len(self._expertise),
+            "capabilities": len(self._levels)
+        }
@@ -0,0 +1,176 @@
+"""
+Moltbook数据模型
+帖子和对话的数据类定义
+"""
+
+import json
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    """解析ISO格式时间（兼容末尾的Z）"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value
+
+
+class Post:
+    """
+    帖子数据类
+    使用__slots__减少每个实例的内存占用。回复按需构建：
+    没有回复时不分配列表，from_dict得到的回复保持原始字典，首次访问replies时才转换为Post
+    """
+    
+    __slots__ = ('id', 'ai_id', 'content', 'timestamp', 'topic', 'tags',
+                 'likes', 'shares', 'visibility', '_replies', '_raw_replies')
+    
+    def __init__(self, id: str, ai_id: str, content: str, timestamp: datetime,
+                 topic: str = "general", tags: List[str] = None,
+                 replies: List['Post'] = None, likes: int = 0, shares: int = 0,
+                 visibility: str = "public"):  # public, followers, private
+        self.id = id
+        self.ai_id = ai_id
+        self.content = content
+        self.timestamp = timestamp
+        self.topic = topic
+        self.tags = tags if tags is not None else []
+        self.likes = likes
+        self.shares = shares
+        self.visibility = visibility
+        self._replies = replies or None
+        self._raw_replies: Optional[List[Dict[str, Any]]] = None
+    
+    @property
+    def replies(self) -> List['Post']:
+        """回复列表（按需构建）"""
+        if self._replies is None:
+            raw, self._raw_replies = self._raw_replies, None
+            self._replies = [Post.from_dict(reply) for reply in raw] if raw else []
+        return self._replies
+    
+    @replies.setter
+    def replies(self, value: List['Post']):
+        self._replies = value
+        self._raw_replies = None
+    
+    @property
+    def reply_count(self) -> int:
+        """回复数量（不触发回复构建）"""
+        if self._replies is not None:
+            return len(self._replies)
+        return len(self._raw_replies) if self._raw_replies else 0
+    
+    def reply_authors(self) -> List[str]:
+        """回复者ID列表（不触发回复构建）"""
+        if self._replies is not None:
+            return [reply.ai_id for reply in self._replies]
+        return [reply.get('ai_id', '') for reply in self._raw_replies or ()]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典（单次遍历，未构建的回复直接输出原始字典）"""
+        if self._replies is not None:
+            replies = [reply.to_dict() for reply in self._replies]
+        else:
+            replies = list(self._raw_replies) if self._raw_replies else []
+        return {
+            "id": self.id,
+            "ai_id": self.ai_id,
+            "content": self.content,
+            "timestamp": self.timestamp.isoformat(),
+            "topic": self.topic,
+            "tags": list(self.tags),
+            "replies": replies,
+            "likes": self.likes,
+            "shares": self.shares,
+            "visibility": self.visibility
+        }
+    
+    def to_json_bytes(self) -> bytes:
+        """直接序列化为UTF-8编码的JSON"""
+        return json.dumps(self.to_dict(), ensure_ascii=False).encode('utf-8')
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Post':
+        """从字典创建帖子（回复延迟到首次访问时再解析）"""
+        post = cls(
+            id=data['id'],
+            ai_id=data.get('ai_id', ''),
+            content=data.get('content', ''),
+            timestamp=_parse_datetime(data.get('timestamp')) or datetime.now(),
+            topic=data.get('topic', 'general'),
+            tags=list(data.get('tags') or []),
+            likes=data.get('likes', 0),
+            shares=data.get('shares', 0),
+            visibility=data.get('visibility', 'public')
+        )
+        post._raw_replies = data.get('replies') or None
+        return post
+    
+    def __repr__(self) -> str:
+        return (f"Post(id={self.id!r}, ai_id={self.ai_id!r}, topic={self.topic!r}, "
+                f"timestamp={self.timestamp!r}, replies={self.reply_count})")
+
+
+class Conversation:
+    """对话数据类"""
+    
+    __slots__ = ('id', 'participants', 'messages', 'topic', 'created_at',
+                 'last_message_at', 'status')
+    
+    def __init__(self, id: str, participants: List[str], messages: List[Dict[str, Any]],
+                 topic: str = "", created_at: datetime = None,
+                 last_message_at: datetime = None,
+                 status: str = "active"):  # active, closed, archived
+        self.id = id
+        self.participants = participants  # AI ID列表
+        self.messages = messages
+        self.topic = topic
+        self.created_at = created_at if created_at is not None else datetime.now()
+        self.last_message_at = last_message_at if last_message_at is not None else self.created_at
+        self.status = status
+    
+    def add_message(self, ai_id: str, content: str):
+        """添加消息"""
+        now = datetime.now()
+        message = {
+            "id": f"msg_{len(self.messages) + 1}",
+            "ai_id": ai_id,
+            "content": content,
+            "timestamp": now.isoformat()
+        }
+        self.messages.append(message)
+        self.last_message_at = now
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "participants": self.participants,
+            "messages": self.messages,
+            "topic": self.topic,
+            "created_at": self.created_at.isoformat(),
+            "last_message_at": self.last_message_at.isoformat(),
+            "status": self.status
+        }
+    
+    def to_json_bytes(self) -> bytes:
+        """直接序列化为UTF-8编码的JSON"""
+        return json.dumps(self.to_dict(), ensure_ascii=False).encode('utf-8')
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Conversation':
+        """从字典创建对话"""
+        return cls(
+            id=data['id'],
+            participants=list(data.get('participants') or []),
+            messages=list(data.get('messages') or []),
+            topic=data.get('topic', ''),
+            created_at=_parse_datetime(data.get('created_at')),
+            last_message_at=_parse_datetime(data.get('last_message_at')),
+            status=data.get('status', 'active')
+        )
+    
+    def __repr__(self) -> str:
+        return (f"Conversation(id={self.id!r}, participants={self.participants!r}, "
+                f"messages={len(self.messages)}, status={self.status!r})")
@@ -0,0 +1,185 @@
+"""
+API调用容错模块
+提供熔断器、重试策略等容错机制
+"""
+
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from enum import Enum
+from typing import Dict, Any, Optional, Iterable
+
+
+class CircuitState(Enum):
+    """熔断器状态"""
+    CLOSED = "closed"        # 正常放行
+    OPEN = "open"            # 熔断，直接走降级
+    HALF_OPEN = "half_open"  # 试探恢复
+
+
+class CircuitBreaker:
+    """
+    按失败率熔断的熔断器
+    在最近window_size次调用中失败率达到failure_threshold（且样本数不少于min_calls）时打开；
+    打开recovery_timeout秒后进入半开状态，放行少量试探请求，成功则关闭，失败则重新打开
+    """
+    
+    def __init__(self, name: str, failure_threshold: float = 0.5, window_size: int = 20,
+                 min_calls: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        
+        self.state = CircuitState.CLOSED
+        self._outcomes = deque(maxlen=window_size)  # True表示失败
+        self._opened_at: Optional[float] = None
+        self._half_open_calls = 0
+        self.open_count = 0
+    
+    @classmethod
+    def from_config(cls, name: str, config: Dict[str, Any]) -> 'CircuitBreaker':
+        """从配置字典创建"""
+        return cls(
+            name,
+            failure_threshold=config.get('failure_threshold', 0.5),
+            window_size=config.get('window_size', 20),
+            min_calls=config.get('min_calls', 5),
+            recovery_timeout=config.get('recovery_timeout', 30.0),
+            half_open_max_calls=config.get('half_open_max_calls', 1)
+        )
+    
+    def allow_request(self) -> bool:
+        """当前是否允许请求真实API"""
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_timeout:
+                return False
+            # 冷却结束，进入半开状态试探
+            self.state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+        
+        if self.state == CircuitState.HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                return False
+            self._half_open_calls += 1
+        
+        return True
+    
+    def record_success(self):
+        """记录一次成功调用"""
+        if self.state == CircuitState.HALF_OPEN:
+            self._close()
+            return
+        self._outcomes.append(False)
+    
+    def record_failure(self):
+        """记录一次失败调用"""
+        if self.state == CircuitState.HALF_OPEN:
+            self._open()
+            return
+        
+        self._outcomes.append(True)
+        if len(self._outcomes) >= self.min_calls and self.failure_rate >= self.failure_threshold:
+            self._open()
+    
+    def release(self):
+        """放弃一次已放行的调用（如被取消）：不计入统计，归还半开状态的试探名额"""
+        if self.state == CircuitState.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+    
+    @property
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+    
+    def _open(self):
+        self.state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.open_count += 1
+    
+    def _close(self):
+        self.state = CircuitState.CLOSED
+        self._opened_at = None
+        self._outcomes.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """熔断器状态统计"""
+        return {
+            "state": self.state.value,
+            "failure_rate": round(self.failure_rate, 3),
+            "samples": len(self._outcomes),
+            "open_count": self.open_count
+        }
+
+
+class RetryPolicy:
+    """
+    带抖动的指数退避重试策略
+    仅重试暂时性错误（网络错误、429及部分5xx）；默认只重试幂等方法，
+    非幂等请求携带幂等键时也可重试。429/503响应的Retry-After优先于退避时间，
+    所有重试受单次逻辑调用的总时限deadline约束
+    """
+    
+    IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 10.0, deadline: float = 60.0,
+                 retry_statuses: Optional[Iterable[int]] = None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_statuses = (frozenset(retry_statuses) if retry_statuses is not None
+                               else self.RETRY_STATUSES)
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], max_retries: int = 3) -> 'RetryPolicy':
+        """从配置字典创建，max_retries为未配置时的默认值"""
+        return cls(
+            max_retries=config.get('max_retries', max_retries),
+            base_delay=config.get('base_delay', 0.5),
+            max_delay=config.get('max_delay', 10.0),
+            deadline=config.get('deadline', 60.0),
+            retry_statuses=config.get('retry_statuses')
+        )
+    
+    def is_retryable(self, method: str, status: Optional[int],
+                     has_idempotency_key: bool = False) -> bool:
+        """判断该请求的失败是否允许重试"""
+        if method.upper() not in self.IDEMPOTENT_METHODS and not has_idempotency_key:
+            return False
+        return status is None or status in self.retry_statuses
+    
+    def backoff(self, retry: int) -> float:
+        """第retry次重试前的等待时间（full jitter）"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (retry - 1)))
+        return random.uniform(0, ceiling)
+    
+    def next_delay(self, retry: int, retry_after: Optional[float] = None) -> float:
+        """计算下一次重试的等待时间，服务端给出Retry-After时以其为准"""
+        if retry_after is not None:
+            return max(retry_after, 0.0)
+        return self.backoff(retry)
+    
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """解析Retry-After头（秒数或HTTP日期），无法解析时返回None"""
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
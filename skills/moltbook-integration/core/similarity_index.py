@@ -0,0 +1,215 @@
+"""
+AI相似度索引
+基于随机超平面LSH（SimHash）的近似最近邻索引，用于大规模AI资料的候选召回
+"""
+
+import heapq
+import random
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Any, Iterable, Set
+
+try:
+    import numpy as np
+except ImportError:  # 未安装NumPy时退回纯Python实现
+    np = None
+
+
+# 特征权重：兴趣、专长按出现计，能力按等级计
+INTEREST_WEIGHT = 1.0
+EXPERTISE_WEIGHT = 0.5
+
+
+def _feature_slot(kind: str, name: str, dim: int) -> int:
+    # 使用crc32而非hash()，保证不同进程间特征位置一致
+    return zlib.crc32(f"{kind}:{name}".encode('utf-8')) % dim
+
+
+def feature_vector(interests: Iterable[str] = (), expertise: Iterable[str] = (),
+                   capabilities: Optional[Dict[str, float]] = None,
+                   dim: int = 1024) -> Dict[int, float]:
+    """把兴趣/专长/能力哈希成dim维稀疏向量（位置 -> 权重）"""
+    vector: Dict[int, float] = defaultdict(float)
+    for interest in set(interests):
+        vector[_feature_slot("interest", interest, dim)] += INTEREST_WEIGHT
+    for skill in set(expertise):
+        vector[_feature_slot("expertise", skill, dim)] += EXPERTISE_WEIGHT
+    for name, level in (capabilities or {}).items():
+        vector[_feature_slot("capability", name, dim)] += level
+    return dict(vector)
+
+
+def identity_features(identity, dim: int = 1024) -> Dict[int, float]:
+    """AI身份的特征向量（取身份缓存的归一化向量，调用方不应修改）"""
+    return identity.features.vector(dim)
+
+
+def profile_capabilities(profile: Dict[str, Any]) -> Dict[str, float]:
+    """模拟AI资料（字典）的能力等级，能力可以是名称或{name, level}"""
+    capabilities = {}
+    for cap in profile.get('capabilities', []):
+        if isinstance(cap, dict):
+            capabilities[cap['name']] = cap.get('level', 1.0)
+        else:
+            capabilities[cap] = 1.0
+    return capabilities
+
+
+def profile_features(profile: Dict[str, Any], dim: int = 1024) -> Dict[int, float]:
+    """模拟AI资料（字典）的特征向量"""
+    return feature_vector(profile.get('interests', []), profile.get('expertise', []),
+                          profile_capabilities(profile), dim)
+
+
+class SimilarityIndex:
+    """
+    随机超平面LSH索引
+    每个条目在num_tables张表中各有一个num_bits位签名（向量与随机超平面内积的符号）。
+    查询时除命中的桶外，每张表再按投影绝对值从小到大翻转probes个位探测邻近桶，
+    命中的条目按与查询向量的余弦相似度排序后截取。
+    召回率随num_tables、probes增大或num_bits减小而提高，候选数量也随之增加。
+    支持增量插入和删除，查询代价与候选数相关而与总条目数无关
+    """
+    
+    def __init__(self, dim: int = 1024, num_tables: int = 12, num_bits: int = 8,
+                 probes: int = 4, seed: int = 42):
+        self.dim = dim
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.probes = probes
+        
+        # 每个特征维度对应num_tables*num_bits个超平面分量（只在进程内使用，不需要跨实现一致）
+        width = num_tables * num_bits
+        if np is not None:
+            self._planes = np.random.default_rng(seed).standard_normal((dim, width))
+        else:
+            rng = random.Random(seed)
+            self._planes = [[rng.gauss(0.0, 1.0) for _ in range(width)] for _ in range(dim)]
+        
+        self._tables: List[Dict[int, Set[str]]] = [defaultdict(set) for _ in range(num_tables)]
+        self._signatures: Dict[str, List[int]] = {}
+        self._vectors: Dict[str, Dict[int, float]] = {}  # 归一化后的稀疏向量，用于候选排序
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'SimilarityIndex':
+        """从配置字典创建"""
+        return cls(
+            dim=config.get('dim', 1024),
+            num_tables=config.get('num_tables', 12),
+            num_bits=config.get('num_bits', 8),
+            probes=config.get('probes', 4),
+            seed=config.get('seed', 42)
+        )
+    
+    def __len__(self) -> int:
+        return len(self._signatures)
+    
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._signatures
+    
+    def _project(self, features: Dict[int, float]) -> List[float]:
+        """稀疏向量与全部超平面的内积"""
+        if np is not None:
+            if not features:
+                return [0.0] * (self.num_tables * self.num_bits)
+            slots = np.fromiter(features.keys(), dtype=np.intp)
+            weights = np.fromiter(features.values(), dtype=np.float64)
+            return (weights @ self._planes[slots]).tolist()
+        
+        projection = [0.0] * (self.num_tables * self.num_bits)
+        for slot, weight in features.items():
+            plane = self._planes[slot]
+            for i in range(len(projection)):
+                projection[i] += weight * plane[i]
+        return projection
+    
+    @staticmethod
+    def _normalize(features: Dict[int, float]) -> Dict[int, float]:
+        norm = sum(weight * weight for weight in features.values()) ** 0.5
+        if not norm:
+            return {}
+        return {slot: weight / norm for slot, weight in features.items()}
+    
+    def _signatures_of(self, projection: List[float]) -> List[int]:
+        signatures = []
+        for table in range(self.num_tables):
+            signature = 0
+            offset = table * self.num_bits
+            for bit in range(self.num_bits):
+                if projection[offset + bit] > 0:
+                    signature |= 1 << bit
+            signatures.append(signature)
+        return signatures
+    
+    def add(self, item_id: str, features: Dict[int, float]):
+        """插入或更新条目"""
+        if item_id in self._signatures:
+            self.remove(item_id)
+        signatures = self._signatures_of(self._project(features))
+        for table, signature in zip(self._tables, signatures):
+            table[signature].add(item_id)
+        self._signatures[item_id] = signatures
+        self._vectors[item_id] = self._normalize(features)
+    
+    def remove(self, item_id: str):
+        """删除条目"""
+        signatures = self._signatures.pop(item_id, None)
+        if signatures is None:
+            return
+        del self._vectors[item_id]
+        for table, signature in zip(self._tables, signatures):
+            bucket = table.get(signature)
+            if bucket is not None:
+                bucket.discard(item_id)
+                if not bucket:
+                    del table[signature]
+    
+    def clear(self):
+        """清空索引"""
+        for table in self._tables:
+            table.clear()
+        self._signatures.clear()
+        self._vectors.clear()
+    
+    def candidates(self, features: Dict[int, float],
+                   max_candidates: Optional[int] = None) -> List[str]:
+        """
+        召回与查询向量相近的条目
+        按余弦相似度从高到低排序，max_candidates限制返回数量
+        """
+        projection = self._project(features)
+        signatures = self._signatures_of(projection)
+        hits: Set[str] = set()
+        
+        for table_index, (table, signature) in enumerate(zip(self._tables, signatures)):
+            probes = [signature]
+            if self.probes:
+                # 投影越接近0的位越可能与近邻不同，优先翻转
+                offset = table_index * self.num_bits
+                bits = sorted(range(self.num_bits), key=lambda b: abs(projection[offset + b]))
+                probes.extend(signature ^ (1 << bit) for bit in bits[:self.probes])
+            for probe in probes:
+                hits.update(table.get(probe, ()))
+        
+        query = self._normalize(features)
+        vectors = self._vectors
+        
+        def cosine(item_id: str) -> float:
+            vector = vectors[item_id]
+            return sum(weight * vector.get(slot, 0.0) for slot, weight in query.items())
+        
+        if max_candidates is not None and len(hits) > max_candidates:
+            return heapq.nlargest(max_candidates, hits, key=cosine)
+        return sorted(hits, key=cosine, reverse=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        """索引统计"""
+        buckets = sum(len(table) for table in self._tables)
+        return {
+            "items": len(self._signatures),
+            "tables": self.num_tables,
+            "bits": self.num_bits,
+            "probes": self.probes,
+            "avg_bucket_size": round(len(self._signatures) * self.num_tables / buckets, 2)
+            if buckets else 0.0
+        }
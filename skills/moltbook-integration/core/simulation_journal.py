@@ -0,0 +1,115 @@
+"""
+模拟数据持久化
+追加写日志（JSONL）+ 定期快照，使模拟数据在进程重启后保留
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Any, Tuple
+
+
+class SimulationJournal:
+    """
+    模拟数据的预写日志
+    每次变更追加一条带序号的JSON记录；日志条数达到snapshot_interval时
+    写入完整快照并清空日志。启动时加载最近的快照，只回放快照之后的日志尾部
+    """
+    
+    SNAPSHOT_FILE = "snapshot.json"
+    LOG_FILE = "journal.jsonl"
+    
+    def __init__(self, directory: str, snapshot_interval: int = 1000, fsync: bool = False):
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_FILE)
+        self.log_path = os.path.join(directory, self.LOG_FILE)
+        
+        self.seq = 0               # 最后一条记录的序号
+        self.snapshot_seq = 0      # 最近快照覆盖到的序号
+        self.pending_entries = 0   # 快照之后的日志条数
+        self._file = None
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'SimulationJournal':
+        """从persistence配置段创建"""
+        return cls(
+            config.get('path', '/tmp/moltbook_simulation'),
+            snapshot_interval=config.get('snapshot_interval', 1000),
+            fsync=config.get('fsync', False)
+        )
+    
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        读取最近快照和其后的日志记录
+        日志末尾不完整的记录（写入时进程中断）会被截掉
+        """
+        snapshot = None
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self.snapshot_seq = self.seq = snapshot.get('seq', 0)
+        
+        records = []
+        if os.path.exists(self.log_path):
+            valid_size = 0
+            with open(self.log_path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    valid_size += len(line)
+                    if record['seq'] <= self.snapshot_seq:
+                        continue
+                    records.append(record)
+                    self.seq = record['seq']
+            if valid_size < os.path.getsize(self.log_path):
+                with open(self.log_path, 'r+b') as f:
+                    f.truncate(valid_size)
+        
+        self.pending_entries = len(records)
+        return snapshot, records
+    
+    def append(self, op: str, data: Dict[str, Any]):
+        """追加一条变更记录"""
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.log_path, 'a', encoding='utf-8')
+        
+        self.seq += 1
+        record = {"seq": self.seq, "op": op}
+        record.update(data)
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.pending_entries += 1
+    
+    @property
+    def needs_snapshot(self) -> bool:
+        return self.pending_entries >= self.snapshot_interval
+    
+    def write_snapshot(self, state: Dict[str, Any]):
+        """原子写入完整快照，随后清空已被快照覆盖的日志"""
+        os.makedirs(self.directory, exist_ok=True)
+        state = dict(state, seq=self.seq)
+        
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        
+        # 快照落盘后再清空日志；中途崩溃时回放会跳过序号不大于快照的记录
+        self.close()
+        open(self.log_path, 'w').close()
+        self.snapshot_seq = self.seq
+        self.pending_entries = 0
+    
+    def close(self):
+        """关闭日志文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
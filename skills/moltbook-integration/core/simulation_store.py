@@ -0,0 +1,295 @@
+"""
+模拟后端存储
+为模拟模式提供带索引的内存数据存储，可选通过预写日志持久化
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterator, Tuple
+
+from .models import Post, Conversation
+from .simulation_journal import SimulationJournal
+from .similarity_index import SimilarityIndex, profile_features, profile_capabilities
+from .inverted_index import InvertedIndex
+from .social_graph import SocialGraph
+
+
+class SimulationStore:
+    """
+    模拟数据存储
+    帖子和对话按ID建立字典索引，动态流按发布顺序追加、倒序读取，
+    并维护按AI和话题的二级索引，所有单条操作均为O(1)。
+    提供journal时每次变更都会写入日志，load()可从磁盘恢复；
+    AI资料按兴趣、专长和能力等级登记到倒排索引profile_terms；
+    提供profile_index时同步登记到相似度索引；
+    提供social_graph时回复、对话消息和获赞同步记入互动图
+    """
+    
+    def __init__(self, journal: Optional[SimulationJournal] = None,
+                 profile_index: Optional[SimilarityIndex] = None,
+                 social_graph: Optional[SocialGraph] = None):
+        # AI资料
+        self.ai_profiles: List[Dict[str, Any]] = []
+        self._profiles_by_id: Dict[str, Dict[str, Any]] = {}
+        self.profile_terms = InvertedIndex()
+        self.profile_index = profile_index
+        
+        # 帖子：ID索引 + 时间正序的动态流（读取时倒序）
+        self._posts: Dict[str, Post] = {}
+        self._feed: List[str] = []
+        self._feed_times: List[datetime] = []
+        self._feed_positions: Dict[str, int] = {}
+        self._posts_by_ai: Dict[str, List[str]] = defaultdict(list)
+        self._posts_by_topic: Dict[str, List[str]] = defaultdict(list)
+        
+        # 对话：ID索引 + 参与者索引
+        self._conversations: Dict[str, Conversation] = {}
+        self._conversations_by_ai: Dict[str, List[str]] = defaultdict(list)
+        
+        # 互动图（社交评分）
+        self.social_graph = social_graph
+        
+        self.next_post_id = 1
+        self.next_conv_id = 1
+        
+        self.journal = journal
+    
+    def load(self) -> bool:
+        """从快照和日志尾部恢复数据，返回是否恢复到了数据"""
+        if self.journal is None:
+            return False
+        
+        snapshot, records = self.journal.load()
+        if snapshot is not None:
+            self._restore_snapshot(snapshot)
+        for record in records:
+            self._replay(record)
+        return snapshot is not None or bool(records)
+    
+    def close(self):
+        """关闭日志"""
+        if self.journal is not None:
+            self.journal.close()
+    
+    def _log(self, op: str, **data):
+        if self.journal is None:
+            return
+        self.journal.append(op, data)
+        if self.journal.needs_snapshot:
+            self.journal.write_snapshot(self.to_snapshot())
+    
+    def to_snapshot(self) -> Dict[str, Any]:
+        """导出完整状态（帖子按发布顺序）"""
+        return {
+            "profiles": self.ai_profiles,
+            "posts": [self._posts[post_id].to_dict() for post_id in self._feed],
+            "conversations": [conv.to_dict() for conv in self._conversations.values()],
+            "next_post_id": self.next_post_id,
+            "next_conv_id": self.next_conv_id
+        }
+    
+    def _restore_snapshot(self, snapshot: Dict[str, Any]):
+        self._set_profiles(snapshot.get('profiles', []))
+        for post_data in snapshot.get('posts', []):
+            self._add_post(Post.from_dict(post_data))
+        for conv_data in snapshot.get('conversations', []):
+            self._add_conversation(Conversation.from_dict(conv_data))
+        self.next_post_id = snapshot.get('next_post_id', self.next_post_id)
+        self.next_conv_id = snapshot.get('next_conv_id', self.next_conv_id)
+    
+    def _replay(self, record: Dict[str, Any]):
+        """回放一条日志记录（不再写日志）"""
+        op = record['op']
+        if op == 'set_profiles':
+            self._set_profiles(record['profiles'])
+        elif op == 'add_post':
+            self._add_post(Post.from_dict(record['post']))
+        elif op == 'add_reply':
+            post = self._posts.get(record['post_id'])
+            if post is not None:
+                self._add_reply(post, Post.from_dict(record['reply']))
+        elif op == 'add_conversation':
+            self._add_conversation(Conversation.from_dict(record['conversation']))
+        elif op == 'add_message':
+            conversation = self._conversations.get(record['conversation_id'])
+            if conversation is not None:
+                message = record['message']
+                conversation.messages.append(message)
+                conversation.last_message_at = datetime.fromisoformat(message['timestamp'])
+                self._record_message(conversation, message)
+        
+        self.next_post_id = max(self.next_post_id, record.get('next_post_id', 0))
+        self.next_conv_id = max(self.next_conv_id, record.get('next_conv_id', 0))
+    
+    def set_profiles(self, profiles: List[Dict[str, Any]]):
+        """设置AI资料列表"""
+        self._set_profiles(profiles)
+        self._log('set_profiles', profiles=self.ai_profiles)
+    
+    def _set_profiles(self, profiles: List[Dict[str, Any]]):
+        self.ai_profiles = list(profiles)
+        self._profiles_by_id = {profile['id']: profile for profile in self.ai_profiles}
+        self.profile_terms.clear()
+        for profile in self.ai_profiles:
+            self.profile_terms.add(profile['id'], profile.get('interests', []),
+                                   profile.get('expertise', []), profile_capabilities(profile))
+        if self.profile_index is not None:
+            self.profile_index.clear()
+            for profile in self.ai_profiles:
+                self.profile_index.add(profile['id'], profile_features(profile, self.profile_index.dim))
+    
+    def get_profile(self, ai_id: str) -> Optional[Dict[str, Any]]:
+        """按ID获取AI资料"""
+        return self._profiles_by_id.get(ai_id)
+    
+    def allocate_post_id(self) -> str:
+        """分配新的帖子ID"""
+        post_id = f"post_{self.next_post_id}"
+        self.next_post_id += 1
+        return post_id
+    
+    def add_post(self, post: Post):
+        """添加帖子（视为最新发布）"""
+        self._add_post(post)
+        self._log('add_post', post=post.to_dict(), next_post_id=self.next_post_id)
+    
+    def _add_post(self, post: Post):
+        self._posts[post.id] = post
+        self._feed_positions[post.id] = len(self._feed)
+        self._feed.append(post.id)
+        self._feed_times.append(post.timestamp)
+        self._posts_by_ai[post.ai_id].append(post.id)
+        self._posts_by_topic[post.topic].append(post.id)
+        if self.social_graph is not None:
+            self.social_graph.add_likes(post.ai_id, post.likes)
+            for replier in post.reply_authors():
+                self.social_graph.add_reply(replier, post.ai_id)
+    
+    def get_post(self, post_id: str) -> Optional[Post]:
+        """按ID获取帖子"""
+        return self._posts.get(post_id)
+    
+    def add_reply(self, post: Post, reply: Post):
+        """为帖子添加回复"""
+        self._add_reply(post, reply)
+        self._log('add_reply', post_id=post.id, reply=reply.to_dict(),
+                  next_post_id=self.next_post_id)
+    
+    def _add_reply(self, post: Post, reply: Post):
+        post.replies.append(reply)
+        if self.social_graph is not None:
+            self.social_graph.add_reply(reply.ai_id, post.ai_id)
+    
+    def feed(self, limit: int = 20, offset: int = 0) -> List[Post]:
+        """按时间倒序获取动态流的一页"""
+        start = len(self._feed) - 1 - offset
+        stop = max(start - limit, -1)
+        return [self._posts[self._feed[i]] for i in range(start, stop, -1)]
+    
+    def feed_after(self, position: Optional[Tuple[datetime, str]], limit: int = 20) -> List[Post]:
+        """
+        按游标获取动态流的下一页
+        position为上一页最后一条的(时间戳, 帖子ID)，None表示从最新开始
+        """
+        if position is None:
+            start = len(self._feed) - 1
+        else:
+            timestamp, post_id = position
+            index = self._feed_positions.get(post_id)
+            if index is None:
+                # 帖子不在本地（如来自其他后端），按时间戳定位
+                index = bisect_left(self._feed_times, timestamp)
+            start = index - 1
+        stop = max(start - limit, -1)
+        return [self._posts[self._feed[i]] for i in range(start, stop, -1)]
+    
+    def ranked_feed(self, limit: int = 20, offset: int = 0, window: int = 200,
+                    half_life_hours: float = 24.0) -> List[Post]:
+        """
+        按社交评分排序的动态流
+        取最新的window条帖子，按作者社交评分 × 时间衰减（每half_life_hours减半）排序；
+        没有互动图时等同feed()
+        """
+        if self.social_graph is None:
+            return self.feed(limit, offset)
+        recent = self.feed(max(window, offset + limit))
+        if not recent:
+            return []
+        newest = max(post.timestamp for post in recent)
+        scores = self.social_graph.scores()
+        
+        def rank(post: Post) -> float:
+            age_hours = (newest - post.timestamp).total_seconds() / 3600
+            return scores.get(post.ai_id, 0.5) * 0.5 ** (age_hours / half_life_hours)
+        
+        # sorted是稳定排序，同分时保持最新在前
+        return sorted(recent, key=rank, reverse=True)[offset:offset + limit]
+    
+    def _iter_newest_first(self, post_ids: List[str]) -> Iterator[Post]:
+        for i in range(len(post_ids) - 1, -1, -1):
+            yield self._posts[post_ids[i]]
+    
+    def posts_by_ai(self, ai_id: str, since: Optional[datetime] = None) -> List[Post]:
+        """获取指定AI的帖子（最新在前），可按起始时间截断"""
+        posts = []
+        for post in self._iter_newest_first(self._posts_by_ai.get(ai_id, [])):
+            if since is not None and post.timestamp < since:
+                break
+            posts.append(post)
+        return posts
+    
+    def posts_by_topic(self, topic: str, limit: Optional[int] = None) -> List[Post]:
+        """获取指定话题的帖子（最新在前）"""
+        posts = []
+        for post in self._iter_newest_first(self._posts_by_topic.get(topic, [])):
+            if limit is not None and len(posts) >= limit:
+                break
+            posts.append(post)
+        return posts
+    
+    @property
+    def post_count(self) -> int:
+        return len(self._posts)
+    
+    def allocate_conv_id(self) -> str:
+        """分配新的对话ID"""
+        conv_id = f"conv_{self.next_conv_id}"
+        self.next_conv_id += 1
+        return conv_id
+    
+    def add_conversation(self, conversation: Conversation):
+        """添加对话"""
+        self._add_conversation(conversation)
+        self._log('add_conversation', conversation=conversation.to_dict(),
+                  next_conv_id=self.next_conv_id)
+    
+    def _add_conversation(self, conversation: Conversation):
+        self._conversations[conversation.id] = conversation
+        for ai_id in conversation.participants:
+            self._conversations_by_ai[ai_id].append(conversation.id)
+        for message in conversation.messages:
+            self._record_message(conversation, message)
+    
+    def _record_message(self, conversation: Conversation, message: Dict[str, Any]):
+        if self.social_graph is not None:
+            self.social_graph.add_message(message.get('ai_id', ''), conversation.participants)
+    
+    def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """按ID获取对话"""
+        return self._conversations.get(conversation_id)
+    
+    def add_message(self, conversation: Conversation, ai_id: str, content: str):
+        """向对话添加消息"""
+        conversation.add_message(ai_id, content)
+        self._record_message(conversation, conversation.messages[-1])
+        self._log('add_message', conversation_id=conversation.id,
+                  message=conversation.messages[-1])
+    
+    def conversations_for(self, ai_id: str) -> List[Conversation]:
+        """获取指定AI参与的对话"""
+        return [self._conversations[conv_id] for conv_id in self._conversations_by_ai.get(ai_id, [])]
+    
+    @property
+    def conversation_count(self) -> int:
+        return len(self._conversations)
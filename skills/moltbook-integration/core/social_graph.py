@@ -0,0 +1,266 @@
+"""
+AI互动图与社交评分
+回复、对话中的回应和获赞构成加权有向图，用带个性化向量的PageRank计算社交评分
+"""
+
+import time
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # 未安装NumPy时用纯Python迭代
+    np = None
+
+
+class SocialGraph:
+    """
+    AI互动图
+    边A->B表示A回复过B的帖子或在对话中回应过B，同一对AI的互动权重累加；
+    获赞数计入B的个性化权重（随机跳转时更可能落到B）。
+    边按加入顺序存放在平行的来源/目标/权重数组中（NumPy可用时为预分配、按倍数扩容的数组），
+    新互动只追加或累加一条边并标记为待重算，重算时直接使用这些数组，不再从字典重建。
+    取分数时重新做一次完整的幂迭代（每轮O(边数)），以上次的结果为初值（热启动），
+    少量新互动后迭代轮数远少于从头计算。
+    两次重算至少间隔recompute_interval秒（默认5秒），期间的读取返回上次的结果，
+    把频繁的小更新合并成一次重算；version在每次重算后递增，供调用方判断分数是否变化
+    """
+    
+    def __init__(self, damping: float = 0.85, tolerance: float = 1e-6, max_iterations: int = 100,
+                 reply_weight: float = 1.0, message_weight: float = 0.5, like_weight: float = 0.1,
+                 recompute_interval: float = 5.0):
+        self.damping = damping
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.reply_weight = reply_weight
+        self.message_weight = message_weight
+        self.like_weight = like_weight
+        self.recompute_interval = recompute_interval
+        
+        self._ids: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._edge_slots: Dict[Tuple[int, int], int] = {}  # (来源, 目标) -> 边数组中的位置
+        self._sources, self._targets, self._weights = self._edge_arrays()
+        self._likes: List[float] = []                   # 每个节点的累计获赞数
+        
+        self._ranks: Optional[List[float]] = None  # 上次计算的PageRank（节点顺序同_ids）
+        self._dirty = False
+        self._computed_at: Optional[float] = None
+        self.iterations = 0  # 上次计算的迭代轮数
+        self.version = 0     # 重算次数
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'SocialGraph':
+        """从simulation.social_score配置段创建"""
+        weights = config.get('weights', {})
+        return cls(
+            damping=config.get('damping', 0.85),
+            tolerance=config.get('tolerance', 1e-6),
+            max_iterations=config.get('max_iterations', 100),
+            reply_weight=weights.get('reply', 1.0),
+            message_weight=weights.get('message', 0.5),
+            like_weight=weights.get('like', 0.1),
+            recompute_interval=config.get('recompute_interval', 5.0)
+        )
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def __contains__(self, ai_id: str) -> bool:
+        return ai_id in self._index
+    
+    @property
+    def edge_count(self) -> int:
+        return len(self._edge_slots)
+    
+    @staticmethod
+    def _edge_arrays(capacity: int = 64) -> tuple:
+        """空的来源、目标、权重数组"""
+        if np is not None:
+            return (np.zeros(capacity, dtype=np.int64), np.zeros(capacity, dtype=np.int64),
+                    np.zeros(capacity, dtype=np.float64))
+        return [], [], []
+    
+    def _add_edge(self, source: int, target: int) -> int:
+        """追加一条权重为0的边，返回其位置（数组已满时容量翻倍）"""
+        slot = len(self._edge_slots)
+        self._edge_slots[(source, target)] = slot
+        if np is None:
+            self._sources.append(source)
+            self._targets.append(target)
+            self._weights.append(0.0)
+            return slot
+        capacity = len(self._weights)
+        if slot >= capacity:
+            grown = self._edge_arrays(capacity * 2)
+            for old, new in zip((self._sources, self._targets, self._weights), grown):
+                new[:capacity] = old
+            self._sources, self._targets, self._weights = grown
+        self._sources[slot] = source
+        self._targets[slot] = target
+        self._weights[slot] = 0.0
+        return slot
+    
+    def _node(self, ai_id: str) -> int:
+        index = self._index.get(ai_id)
+        if index is None:
+            index = len(self._ids)
+            self._ids.append(ai_id)
+            self._index[ai_id] = index
+            self._likes.append(0.0)
+            self._dirty = True
+        return index
+    
+    def add_interaction(self, source: str, target: str, weight: float = 1.0):
+        """记录一次source对target的互动（自己对自己的互动忽略）"""
+        if not source or not target or source == target or weight <= 0:
+            return
+        source_index, target_index = self._node(source), self._node(target)
+        slot = self._edge_slots.get((source_index, target_index))
+        if slot is None:
+            slot = self._add_edge(source_index, target_index)
+        self._weights[slot] += weight
+        self._dirty = True
+    
+    def add_reply(self, replier: str, author: str):
+        """记录一次回复"""
+        self.add_interaction(replier, author, self.reply_weight)
+    
+    def add_message(self, sender: str, participants: Iterable[str]):
+        """记录一条对话消息：视为发送者对其他参与者的回应"""
+        for participant in participants:
+            self.add_interaction(sender, participant, self.message_weight)
+    
+    def add_likes(self, author: str, count: int = 1):
+        """记录获赞"""
+        if not author or count <= 0:
+            return
+        self._likes[self._node(author)] += count
+        self._dirty = True
+    
+    def clear(self):
+        """清空"""
+        self._ids = []
+        self._index = {}
+        self._edge_slots = {}
+        self._sources, self._targets, self._weights = self._edge_arrays()
+        self._likes = []
+        self._ranks = None
+        self._dirty = False
+        self.version += 1
+    
+    def refresh(self):
+        """有新互动且距上次重算已超过recompute_interval时重算"""
+        if self._dirty and (self._computed_at is None or
+                            time.monotonic() - self._computed_at >= self.recompute_interval):
+            self._compute()
+    
+    def ranks(self) -> Dict[str, float]:
+        """各节点的PageRank（总和为1），有新互动时先重算（上次重算后新增的节点暂不包含）"""
+        self.refresh()
+        if not self._ranks:
+            return {}
+        return dict(zip(self._ids, self._ranks))
+    
+    def scores(self) -> Dict[str, float]:
+        """
+        各节点的社交评分，取值(0, 1)
+        以平均PageRank为基准：r = rank * 节点数，评分 = r / (1 + r)，平均水平的节点为0.5
+        """
+        ranks = self.ranks()
+        n = len(ranks)
+        return {ai_id: rank * n / (1.0 + rank * n) for ai_id, rank in ranks.items()}
+    
+    def score(self, ai_id: str, default: float = 0.5) -> float:
+        """单个节点的社交评分，不在图中时返回default"""
+        self.refresh()
+        index = self._index.get(ai_id)
+        if index is None or not self._ranks or index >= len(self._ranks):
+            return default
+        r = self._ranks[index] * len(self._ranks)
+        return r / (1.0 + r)
+    
+    def _personalization(self) -> List[float]:
+        weights = [1.0 + self.like_weight * likes for likes in self._likes]
+        total = sum(weights)
+        return [weight / total for weight in weights]
+    
+    def _initial_ranks(self, personalization: List[float]) -> List[float]:
+        """上次的结果作初值，新节点取个性化权重，再归一化"""
+        previous = self._ranks or []
+        ranks = list(previous) + personalization[len(previous):]
+        total = sum(ranks)
+        return [rank / total for rank in ranks]
+    
+    def _compute(self):
+        self._dirty = False
+        self._computed_at = time.monotonic()
+        self.version += 1
+        n = len(self._ids)
+        if n == 0:
+            self._ranks = []
+            return
+        personalization = self._personalization()
+        ranks = self._initial_ranks(personalization)
+        if np is not None:
+            self._ranks = self._power_iteration_numpy(ranks, personalization)
+        else:
+            self._ranks = self._power_iteration_python(ranks, personalization)
+    
+    def _power_iteration_numpy(self, ranks: List[float], personalization: List[float]) -> List[float]:
+        n = len(self._ids)
+        damping = self.damping
+        m = len(self._edge_slots)
+        sources, targets, weights = self._sources[:m], self._targets[:m], self._weights[:m]
+        out_weight = np.bincount(sources, weights=weights, minlength=n)
+        transition = weights / out_weight[sources]  # 每条边的转移概率
+        dangling = out_weight == 0
+        p = np.asarray(personalization)
+        r = np.asarray(ranks)
+        
+        self.iterations = 0
+        for _ in range(self.max_iterations):
+            self.iterations += 1
+            spread = np.bincount(targets, weights=r[sources] * transition, minlength=n)
+            leaked = damping * r[dangling].sum() + (1.0 - damping)  # 无出边节点和随机跳转
+            updated = damping * spread + leaked * p
+            delta = np.abs(updated - r).sum()
+            r = updated
+            if delta < self.tolerance:
+                break
+        return r.tolist()
+    
+    def _power_iteration_python(self, ranks: List[float], personalization: List[float]) -> List[float]:
+        n = len(self._ids)
+        damping = self.damping
+        out_weight = [0.0] * n
+        for source, weight in zip(self._sources, self._weights):
+            out_weight[source] += weight
+        edges = [(source, target, weight / out_weight[source])
+                 for source, target, weight in zip(self._sources, self._targets, self._weights)]
+        dangling = [index for index in range(n) if out_weight[index] == 0]
+        r = ranks
+        
+        self.iterations = 0
+        for _ in range(self.max_iterations):
+            self.iterations += 1
+            spread = [0.0] * n
+            for source, target, probability in edges:
+                spread[target] += r[source] * probability
+            leaked = damping * sum(r[index] for index in dangling) + (1.0 - damping)
+            updated = [damping * spread[index] + leaked * personalization[index]
+                       for index in range(n)]
+            delta = sum(abs(a - b) for a, b in zip(updated, r))
+            r = updated
+            if delta < self.tolerance:
+                break
+        return r
+    
+    def stats(self) -> Dict[str, Any]:
+        """图统计"""
+        return {
+            "nodes": len(self._ids),
+            "edges": len(self._edge_slots),
+            "dirty": self._dirty,
+            "iterations": self.iterations,
+            "version": self.version
+        }
@@ -30,6 +30,8 @@ fi
 echo "📦 安装依赖包..."
 pip install --upgrade pip
 pip install aiohttp
+# 可选：NumPy用于向量化兼容性计算，未安装时使用纯Python实现
+pip install numpy || echo "⚠️ NumPy安装失败，兼容性计算将使用纯Python实现"
 
 # 创建必要的目录
 echo "📁 创建目录结构..."
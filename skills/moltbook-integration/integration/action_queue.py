@@ -0,0 +1,398 @@
+"""
+发送队列
+发帖、回复和对话消息入队后立即返回凭据，由后台工作协程按优先级投递；
+未完成的动作记录在日志中，重启后用同一个幂等键继续投递
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Any, Awaitable, Callable, Deque, Iterator, Set
+
+from .history import SUMMARY_FIELDS
+
+# 动作 -> (集成方法名, 默认优先级)；优先级数值越小越先投递，回复和对话消息先于新帖
+ACTIONS = {
+    "reply": ("reply_to_post", 0),
+    "message": ("send_conversation_message", 0),
+    "post": ("post_to_moltbook", 1),
+}
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class ActionTicket:
+    """
+    入队动作的凭据
+    id同时是发给服务端的幂等键；future在动作结束时得到集成方法的返回结果
+    """
+    
+    __slots__ = ('id', 'action', 'params', 'priority', 'status', 'result',
+                 'attempts', 'created_at', '_future')
+    
+    def __init__(self, ticket_id: str, action: str, params: Dict[str, Any], priority: int,
+                 created_at: Optional[float] = None):
+        self.id = ticket_id
+        self.action = action
+        self.params = params
+        self.priority = priority
+        self.status = QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.attempts = 0
+        self.created_at = created_at if created_at is not None else time.time()
+        self._future: Optional[asyncio.Future] = None
+    
+    @property
+    def order_key(self) -> Optional[str]:
+        """同一对话的消息必须按入队顺序逐条投递"""
+        if self.action == "message":
+            return self.params.get('conversation_id')
+        return None
+    
+    @property
+    def future(self) -> asyncio.Future:
+        """结果Future（在事件循环中首次访问时创建）"""
+        if self._future is None:
+            self._future = asyncio.get_running_loop().create_future()
+            if self.done():
+                self._future.set_result(self.result)
+        return self._future
+    
+    def done(self) -> bool:
+        return self.status in FINISHED
+    
+    async def wait(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """等待动作结束并返回结果，超时抛出asyncio.TimeoutError（动作仍会继续投递）"""
+        return await asyncio.wait_for(asyncio.shield(self.future), timeout)
+    
+    def _finish(self, status: str, result: Dict[str, Any]):
+        self.status = status
+        self.result = result
+        if self._future is not None and not self._future.done():
+            self._future.set_result(result)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ticket_id": self.id,
+            "action": self.action,
+            "status": self.status,
+            "priority": self.priority,
+            "attempts": self.attempts,
+            "created_at": self.created_at,
+            "result": self.result
+        }
+
+
+class ActionQueue:
+    """
+    发送队列
+    每个优先级一个FIFO通道，工作协程总是从优先级最高的非空通道取动作，
+    同一对话的消息不会同时投递。工作协程按排队数启动（最多concurrency个），
+    没有可投递的动作时退出，空闲的队列不占用任务。
+    deliver为投递函数(集成方法名, 参数) -> 结果，默认直接调用集成方法；
+    多身份运行器把它换成经共享调度器执行，受其总并发和轮转调度约束
+    提供journal_path时入队和结束各追加一条记录，启动时重放日志恢复未完成的动作
+    （包括关闭时正在投递的），已结束的动作保留最近dedup_size个用于按幂等键去重；
+    日志记录数远多于仍需保留的动作时重写压缩。
+    入队记录带有身份ID，恢复时只接管本身份的动作，其他身份的记录原样保留，
+    不会以当前身份发出；一个日志文件同一时间只能由一个进程写入
+    """
+    
+    def __init__(self, integration, concurrency: int = 4, journal_path: Optional[str] = None,
+                 dedup_size: int = 10000, compact_threshold: int = 1000, fsync: bool = False,
+                 identity_id: Optional[str] = None):
+        self.integration = integration
+        self.identity_id = identity_id
+        self.concurrency = concurrency
+        self.journal_path = journal_path
+        self.dedup_size = dedup_size
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        
+        self._tickets: Dict[str, ActionTicket] = {}
+        self._lanes: Dict[int, Deque[ActionTicket]] = {}
+        self._finished: "OrderedDict[str, None]" = OrderedDict()  # 已结束的ID，按结束顺序
+        self._in_flight: set = set()                              # 正在投递的order_key
+        self._workers: Set[asyncio.Task] = set()
+        self.deliver: Optional[Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None
+        self._file = None
+        self._journal_records = 0
+        self._foreign: List[Dict[str, Any]] = []  # 日志中其他身份的记录，压缩时原样写回
+        
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.deduplicated = 0
+        self.recovered = 0
+        if journal_path:
+            self._recover()
+    
+    @classmethod
+    def from_config(cls, integration, config: Dict[str, Any],
+                    identity_id: Optional[str] = None) -> 'ActionQueue':
+        """从interaction.action_queue配置段创建"""
+        return cls(
+            integration,
+            concurrency=config.get('concurrency', 4),
+            journal_path=config.get('journal_path'),
+            dedup_size=config.get('dedup_size', 10000),
+            compact_threshold=config.get('compact_threshold', 1000),
+            fsync=config.get('fsync', False),
+            identity_id=identity_id
+        )
+    
+    def __len__(self) -> int:
+        """排队中的动作数"""
+        return sum(len(lane) for lane in self._lanes.values())
+    
+    def get(self, ticket_id: str) -> Optional[ActionTicket]:
+        return self._tickets.get(ticket_id)
+    
+    def enqueue(self, action: str, idempotency_key: Optional[str] = None,
+                priority: Optional[int] = None, **params) -> ActionTicket:
+        """
+        动作入队，返回凭据
+        params为对应集成方法的参数；同一idempotency_key的动作只入队一次，重复提交返回已有凭据
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"未知动作: {action}")
+        if idempotency_key is not None and idempotency_key in self._tickets:
+            self.deduplicated += 1
+            return self._tickets[idempotency_key]
+        ticket = ActionTicket(idempotency_key or uuid.uuid4().hex, action, params,
+                              ACTIONS[action][1] if priority is None else priority)
+        if self.journal_path:
+            self._append({"op": "enqueue", "id": ticket.id, "identity_id": self.identity_id,
+                          "action": action, "params": params,
+                          "priority": ticket.priority, "created_at": ticket.created_at})
+        self._push(ticket)
+        self.start()
+        return ticket
+    
+    def cancel(self, ticket_id: str) -> bool:
+        """取消尚未开始投递的动作"""
+        ticket = self._tickets.get(ticket_id)
+        if ticket is None or ticket.status != QUEUED:
+            return False
+        self._lanes[ticket.priority].remove(ticket)
+        self._complete(ticket, CANCELLED, {"success": False, "error": "已取消"})
+        return True
+    
+    def start(self):
+        """按排队数补足工作协程（需在事件循环中调用，不在事件循环中时推迟到下次入队）"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        while len(self._workers) < min(self.concurrency, len(self)):
+            task = asyncio.ensure_future(self._worker())
+            self._workers.add(task)
+            task.add_done_callback(self._workers.discard)
+    
+    async def drain(self):
+        """等待当前所有排队和投递中的动作结束"""
+        pending = [ticket.future for ticket in self._tickets.values() if not ticket.done()]
+        if pending:
+            self.start()
+            await asyncio.wait(pending)
+    
+    def stop(self):
+        """
+        停止工作协程并关闭日志，不等待
+        排队中和被打断的动作仍记录在日志中，下次启动时继续投递
+        """
+        for task in list(self._workers):
+            task.cancel()
+        for ticket in self._tickets.values():
+            if not ticket.done() and ticket._future is not None:
+                ticket._future.cancel()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    async def close(self):
+        """停止工作协程并等待其退出"""
+        workers = list(self._workers)
+        self.stop()
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+    
+    def _push(self, ticket: ActionTicket):
+        self._tickets[ticket.id] = ticket
+        lane = self._lanes.get(ticket.priority)
+        if lane is None:
+            lane = self._lanes[ticket.priority] = deque()
+            self._lanes = dict(sorted(self._lanes.items()))
+        lane.append(ticket)
+    
+    def _next(self) -> Optional[ActionTicket]:
+        """优先级最高的可投递动作（跳过所在对话已有消息在投递中的）"""
+        for lane in self._lanes.values():
+            for index, ticket in enumerate(lane):
+                if ticket.order_key is None or ticket.order_key not in self._in_flight:
+                    del lane[index]
+                    return ticket
+        return None
+    
+    async def _worker(self):
+        """
+        逐个投递直到没有可投递的动作
+        被同一对话的在途消息挡住的动作由投递那条消息的协程随后取走
+        """
+        ticket = self._next()
+        while ticket is not None:
+            await self._deliver(ticket)
+            ticket = self._next()
+    
+    async def _deliver(self, ticket: ActionTicket):
+        order_key = ticket.order_key
+        if order_key is not None:
+            self._in_flight.add(order_key)
+        ticket.status = RUNNING
+        ticket.attempts += 1
+        self.running += 1
+        try:
+            method_name = ACTIONS[ticket.action][0]
+            params = dict(ticket.params, idempotency_key=ticket.id)
+            if self.deliver is not None:
+                result = await self.deliver(method_name, params)
+            else:
+                result = await getattr(self.integration, method_name)(**params)
+        except asyncio.CancelledError:
+            # 关闭时被打断：日志中没有结束记录，重启后用同一个幂等键重新投递
+            ticket.status = QUEUED
+            raise
+        except Exception as e:
+            result = {"success": False, "error": f"投递失败: {str(e)}"}
+        finally:
+            self.running -= 1
+            self._in_flight.discard(order_key)
+        self._complete(ticket, SUCCEEDED if result.get('success') else FAILED, result)
+    
+    def _complete(self, ticket: ActionTicket, status: str, result: Dict[str, Any]):
+        ticket._finish(status, result)
+        if status == SUCCEEDED:
+            self.succeeded += 1
+        elif status == FAILED:
+            self.failed += 1
+        else:
+            self.cancelled += 1
+        if self.journal_path:
+            self._append({"op": "done", "id": ticket.id, "identity_id": self.identity_id,
+                          "action": ticket.action, "status": status,
+                          "result": self._summarize(result)})
+        self._remember(ticket)
+        if self.journal_path and self._journal_records > self.compact_threshold and \
+                self._journal_records > 2 * (len(self._tickets) + len(self._foreign)):
+            self._compact()
+    
+    def _remember(self, ticket: ActionTicket):
+        """已结束的动作保留用于去重，超过dedup_size时丢弃最早结束的"""
+        self._finished[ticket.id] = None
+        while len(self._finished) > self.dedup_size:
+            ticket_id, _ = self._finished.popitem(last=False)
+            self._tickets.pop(ticket_id, None)
+    
+    @staticmethod
+    def _summarize(result: Dict[str, Any]) -> Dict[str, Any]:
+        """结束记录只保存结果的关键字段（完整结果见交互历史）"""
+        return {key: result[key] for key in SUMMARY_FIELDS if key in result}
+    
+    def _append(self, record: Dict[str, Any]):
+        if self._file is None:
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.journal_path, 'ab')
+        self._file.write((json.dumps(record, ensure_ascii=False, default=str) + "\n").encode('utf-8'))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._journal_records += 1
+    
+    def _records(self) -> Iterator[Dict[str, Any]]:
+        """压缩后的日志：其他身份的记录原样保留，已结束的动作只写结束记录，未结束的写入队记录"""
+        yield from self._foreign
+        for ticket in self._tickets.values():
+            if ticket.done():
+                yield {"op": "done", "id": ticket.id, "identity_id": self.identity_id,
+                       "action": ticket.action, "status": ticket.status,
+                       "result": self._summarize(ticket.result)}
+            else:
+                yield {"op": "enqueue", "id": ticket.id, "identity_id": self.identity_id,
+                       "action": ticket.action, "params": ticket.params,
+                       "priority": ticket.priority, "created_at": ticket.created_at}
+    
+    def _compact(self):
+        """把日志重写为当前仍需保留的记录（先写临时文件再替换）"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        temp_path = self.journal_path + ".tmp"
+        count = 0
+        with open(temp_path, 'wb') as f:
+            for record in self._records():
+                f.write((json.dumps(record, ensure_ascii=False, default=str) + "\n").encode('utf-8'))
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.journal_path)
+        self._journal_records = count
+    
+    def _recover(self):
+        """
+        启动时重放日志：本身份未结束的动作按入队顺序重新排队，已结束的登记用于去重；
+        其他身份（或未记录身份）的记录不接管
+        """
+        if not os.path.exists(self.journal_path):
+            return
+        records = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 写入中断留下的不完整行
+                records += 1
+                if record.get('identity_id') != self.identity_id:
+                    self._foreign.append(record)
+                    continue
+                ticket = self._tickets.get(record['id'])
+                if record['op'] == 'enqueue' and ticket is None:
+                    self._push(ActionTicket(record['id'], record['action'], record['params'],
+                                            record['priority'], record.get('created_at')))
+                elif record['op'] == 'done':
+                    if ticket is None:
+                        ticket = self._tickets[record['id']] = \
+                            ActionTicket(record['id'], record['action'], {}, 0)
+                    elif ticket.status == QUEUED:
+                        self._lanes[ticket.priority].remove(ticket)
+                    ticket._finish(record['status'], record.get('result') or {})
+                    self._remember(ticket)
+        self.recovered = len(self)
+        self._journal_records = records
+        if records > len(self._tickets) + len(self._foreign):
+            self._compact()
+    
+    def stats(self) -> Dict[str, Any]:
+        """队列统计"""
+        return {
+            "queued": len(self),
+            "lanes": {priority: len(lane) for priority, lane in self._lanes.items()},
+            "running": self.running,
+            "workers": len(self._workers),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "deduplicated": self.deduplicated,
+            "recovered": self.recovered
+        }
@@ -0,0 +1,176 @@
+"""
+对话缓存
+按对话ID缓存对话内容，LRU + TTL淘汰并限制消息总字节数；新消息增量追加，不整体替换
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any
+
+
+def _size_of(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+
+
+class _Entry:
+    """单个对话的缓存条目：元数据、消息列表及其字节数"""
+    
+    __slots__ = ('meta', 'messages', 'meta_bytes', 'message_bytes', 'expires_at')
+    
+    def __init__(self, meta: Dict[str, Any], messages: List[Dict[str, Any]], expires_at: float):
+        self.meta = meta
+        self.messages = messages
+        self.meta_bytes = _size_of(meta)
+        self.message_bytes = sum(_size_of(message) for message in messages)
+        self.expires_at = expires_at
+    
+    @property
+    def size(self) -> int:
+        return self.meta_bytes + self.message_bytes
+
+
+class ConversationCache:
+    """
+    对话缓存
+    条目按最近使用顺序排列，超过max_conversations或总字节数超过max_bytes时淘汰最久未用的；
+    写入后ttl秒未再写入的条目在读取时过期。
+    merge()对比已缓存的消息，只追加新消息并累加字节数，消息序列对不上时才整体替换
+    """
+    
+    def __init__(self, max_conversations: int = 256, max_bytes: int = 4 * 1024 * 1024,
+                 ttl: float = 1800):
+        self.max_conversations = max_conversations
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.appended_messages = 0  # 增量追加的消息数
+        self.replacements = 0       # 整体写入/替换的次数
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'ConversationCache':
+        """从interaction.conversation_cache配置段创建"""
+        return cls(
+            max_conversations=config.get('max_conversations', 256),
+            max_bytes=config.get('max_bytes', 4 * 1024 * 1024),
+            ttl=config.get('ttl', 1800)
+        )
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, conversation_id: str) -> bool:
+        return conversation_id in self._entries
+    
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取对话，未缓存或已过期时返回None
+        返回的消息列表与缓存共享，调用方不应修改
+        """
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(conversation_id)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(conversation_id)
+        self.hits += 1
+        return dict(entry.meta, messages=entry.messages)
+    
+    def put(self, conversation: Dict[str, Any]):
+        """整体写入对话"""
+        conversation_id = conversation.get('id')
+        if not conversation_id:
+            return
+        if conversation_id in self._entries:
+            self._remove(conversation_id)
+        meta = {key: value for key, value in conversation.items() if key != 'messages'}
+        entry = _Entry(meta, list(conversation.get('messages') or []), time.monotonic() + self.ttl)
+        self._entries[conversation_id] = entry
+        self.total_bytes += entry.size
+        self.replacements += 1
+        self._evict()
+    
+    def merge(self, conversation: Dict[str, Any]):
+        """
+        写入对话的最新状态（写穿）
+        已缓存且消息前缀一致时只追加新增的消息并更新元数据，否则整体写入
+        """
+        conversation_id = conversation.get('id')
+        entry = self._entries.get(conversation_id) if conversation_id else None
+        messages = conversation.get('messages') or []
+        cached = entry.messages if entry is not None else None
+        # 对话消息只追加：比较已缓存的最后一条消息ID，不逐条比较
+        if cached is None or len(messages) < len(cached) or \
+                (cached and messages[len(cached) - 1].get('id') != cached[-1].get('id')):
+            self.put(conversation)
+            return
+        self.append_messages(conversation_id, messages[len(cached):],
+                             **{key: value for key, value in conversation.items()
+                                if key not in ('id', 'messages')})
+    
+    def append_messages(self, conversation_id: str, messages: List[Dict[str, Any]], **fields):
+        """向已缓存的对话追加消息并更新元数据字段，对话未缓存时忽略"""
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            return
+        if fields:
+            self.total_bytes -= entry.meta_bytes
+            entry.meta.update(fields)
+            entry.meta_bytes = _size_of(entry.meta)
+            self.total_bytes += entry.meta_bytes
+        for message in messages:
+            size = _size_of(message)
+            entry.messages.append(message)
+            entry.message_bytes += size
+            self.total_bytes += size
+        self.appended_messages += len(messages)
+        entry.expires_at = time.monotonic() + self.ttl
+        self._entries.move_to_end(conversation_id)
+        self._evict()
+    
+    def invalidate(self, conversation_id: str) -> bool:
+        """删除一个对话，返回是否存在"""
+        if conversation_id not in self._entries:
+            return False
+        self._remove(conversation_id)
+        return True
+    
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self.total_bytes = 0
+    
+    def _remove(self, conversation_id: str):
+        entry = self._entries.pop(conversation_id)
+        self.total_bytes -= entry.size
+    
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_conversations or
+                                 self.total_bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        lookups = self.hits + self.misses
+        return {
+            "conversations": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "appended_messages": self.appended_messages,
+            "replacements": self.replacements,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,164 @@
+"""
+交互历史
+内存中用固定容量的环形缓冲区保存精简记录，完整数据追加写入按大小轮转的日志文件
+"""
+
+import json
+import os
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterator
+
+# 精简记录中保留的字段（其余数据只写入日志）
+SUMMARY_FIELDS = ("success", "message", "error", "post_id", "reply_id", "conversation_id")
+
+
+class InteractionHistory:
+    """
+    交互历史
+    最近capacity条精简记录保存在deque中，追加为O(1)且不复制；
+    提供journal_path时每条记录连同完整数据追加到日志，文件超过max_bytes时
+    轮转为.1、.2……，最多保留backup_count个旧文件。
+    分页超出内存范围或需要完整数据时从日志读取
+    """
+    
+    def __init__(self, capacity: int = 100, journal_path: Optional[str] = None,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5, fsync: bool = False):
+        self.capacity = capacity
+        self.journal_path = journal_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.fsync = fsync
+        
+        self._buffer: deque = deque(maxlen=capacity)
+        self.total = 0  # 累计记录数（即最后一条记录的序号）
+        self._file = None
+        if journal_path:
+            self._recover()
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'InteractionHistory':
+        """从interaction.history配置段创建"""
+        return cls(
+            capacity=config.get('capacity', 100),
+            journal_path=config.get('journal_path'),
+            max_bytes=config.get('max_bytes', 10 * 1024 * 1024),
+            backup_count=config.get('backup_count', 5),
+            fsync=config.get('fsync', False)
+        )
+    
+    def __len__(self) -> int:
+        return len(self._buffer)
+    
+    @staticmethod
+    def summarize(record: Dict[str, Any]) -> Dict[str, Any]:
+        """完整记录 -> 精简记录"""
+        data = record.get('data') or {}
+        return {
+            "seq": record['seq'],
+            "type": record['type'],
+            "timestamp": record['timestamp'],
+            "data": {key: data[key] for key in SUMMARY_FIELDS if key in data}
+        }
+    
+    def record(self, interaction_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """记录一次交互，返回精简记录"""
+        self.total += 1
+        record = {
+            "seq": self.total,
+            "type": interaction_type,
+            "timestamp": datetime.now().isoformat(),
+            "data": data
+        }
+        if self.journal_path:
+            self._append(record)
+        summary = self.summarize(record)
+        self._buffer.append(summary)
+        return summary
+    
+    def page(self, limit: int = 10, offset: int = 0, full: bool = False) -> List[Dict[str, Any]]:
+        """
+        获取一页历史（按时间正序）
+        offset为跳过的最新记录数；内存中的记录足够且不要求完整数据时不读文件
+        """
+        end = self.total - offset          # 本页最后一条的序号
+        start = max(end - limit, 0)        # 本页第一条之前的序号
+        if limit <= 0 or end <= 0:
+            return []
+        
+        oldest_in_memory = self._buffer[0]['seq'] if self._buffer else self.total + 1
+        if (not full and start + 1 >= oldest_in_memory) or not self.journal_path:
+            # 没有日志时只能返回内存中的部分
+            return [record for record in self._buffer if start < record['seq'] <= end]
+        
+        # 从最新的日志文件往前读，读到包含本页第一条的文件为止
+        if self._file is not None:
+            self._file.flush()
+        records: List[Dict[str, Any]] = []
+        for path in reversed(self._journal_files()):
+            lines = list(self._read_file(path))
+            records = [record for record in lines if start < record['seq'] <= end] + records
+            if lines and lines[0]['seq'] <= start + 1:
+                break
+        return records if full else [self.summarize(record) for record in records]
+    
+    def close(self):
+        """关闭日志文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def _rotated_path(self, index: int) -> str:
+        return f"{self.journal_path}.{index}" if index else self.journal_path
+    
+    def _append(self, record: Dict[str, Any]):
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode('utf-8')
+        if self._file is None:
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.journal_path, 'ab')
+        elif self._file.tell() + len(line) > self.max_bytes:
+            self._rotate()
+        self._file.write(line)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+    
+    def _rotate(self):
+        """当前文件改名为.1，旧文件依次后移，超出backup_count的删除"""
+        self.close()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = self._rotated_path(index)
+                if os.path.exists(source):
+                    os.replace(source, self._rotated_path(index + 1))
+            os.replace(self.journal_path, self._rotated_path(1))
+        else:
+            os.remove(self.journal_path)
+        self._file = open(self.journal_path, 'ab')
+    
+    def _journal_files(self) -> List[str]:
+        """从旧到新的日志文件"""
+        paths = [self._rotated_path(index) for index in range(self.backup_count, -1, -1)]
+        return [path for path in paths if os.path.exists(path)]
+    
+    def _read_file(self, path: str) -> Iterator[Dict[str, Any]]:
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # 写入中断留下的不完整行
+    
+    def _recover(self):
+        """启动时从日志恢复累计序号和最近的记录（从最新的文件读起，够capacity条即停）"""
+        recent: List[Dict[str, Any]] = []
+        for path in reversed(self._journal_files()):
+            records = [self.summarize(record) for record in self._read_file(path)]
+            if records:
+                self.total = max(self.total, records[-1]['seq'])
+                recent = records[-(self.capacity - len(recent)):] + recent
+            if len(recent) >= self.capacity:
+                break
+        self._buffer.extend(recent)
@@ -3,36 +3,81 @@ OpenClaw集成模块
 提供与OpenClaw系统的集成接口
 """
 
+import copy
 import json
 import asyncio
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
-from ..core.identity import get_identity_manager, AIIdentity
-from ..core.api_client import get_api_client, APIMode
+from ..core.identity import get_identity_manager, AIIdentity, IdentityManager
+from ..core.api_client import get_api_client, APIMode, MoltbookAPIClient
+from .rate_limit import RateLimiter
+from .profile_directory import ProfileDirectory
+from .history import InteractionHistory
+from .conversation_cache import ConversationCache
+from .action_queue import ActionQueue, ActionTicket
 
 
 class OpenClawMoltbookIntegration:
-    """OpenClaw与Moltbook的集成类"""
+    """
+    OpenClaw与Moltbook的集成类
+    默认使用全局的身份管理器、API客户端和默认身份；
+    多身份运行时（见runner.MultiIdentityRunner）由调用方注入共享组件和各自的身份，
+    限流器、交互历史、对话缓存和发送队列始终是每个实例独立的
+    """
     
-    def __init__(self, config_path: str = None):
+    def __init__(self, config_path: str = None, config: Optional[Dict[str, Any]] = None,
+                 identity: Optional[AIIdentity] = None,
+                 api_client: Optional[MoltbookAPIClient] = None,
+                 identity_manager: Optional[IdentityManager] = None,
+                 profiles: Optional[ProfileDirectory] = None):
         self.config_path = config_path
-        self.config = self._load_config()
+        self.config = self._load_config(config)
         
         # 初始化组件
-        self.identity_manager = get_identity_manager(self.config.get('identity', {}))
-        self.api_client = get_api_client(self.config.get('moltbook', {}))
+        self.identity_manager = identity_manager if identity_manager is not None else \
+            get_identity_manager(self.config.get('identity', {}))
+        self.api_client = api_client if api_client is not None else \
+            get_api_client(self.config.get('moltbook', {}))
+        # 只关闭自己获取的客户端；注入的客户端由调用方（如MultiIdentityRunner）负责关闭
+        self._owns_api_client = api_client is None
         
         # 获取当前AI身份
-        self.current_identity = self.identity_manager.get_default_identity()
+        self.current_identity = identity or self.identity_manager.get_default_identity()
+        
+        # AI资料目录（按ai_id查找名称，技能层共享）
+        self.profiles = profiles if profiles is not None else \
+            ProfileDirectory(self.api_client, self.identity_manager)
+        
+        # 客户端限流（按动作和身份的令牌桶）
+        interaction_config = self.config['moltbook'].get('interaction', {})
+        rate_config = interaction_config.get('rate_limits', {})
+        self.rate_limiter = RateLimiter.from_config(interaction_config)
+        self.rate_limit_mode = rate_config.get('mode', 'wait')
+        self.rate_limit_max_wait = rate_config.get('max_wait', 60)
         
         # 状态跟踪
         self.last_post_time = None
-        self.interaction_history = []
-        self.conversation_cache = {}
+        # 交互历史：内存环形缓冲区保存精简记录，完整数据写入轮转日志
+        self.interaction_history = InteractionHistory.from_config(
+            self._identity_paths(interaction_config.get('history', {})))
+        # 对话缓存（LRU + TTL，限制总字节数，新消息增量追加）
+        self.conversation_cache = ConversationCache.from_config(
+            interaction_config.get('conversation_cache', {}))
+        # 发送队列（发帖、回复、对话消息在后台按优先级投递，日志按身份持久化）
+        self.action_queue = ActionQueue.from_config(
+            self, self._identity_paths(interaction_config.get('action_queue', {})),
+            identity_id=self.current_identity.id)
+    
+    def _identity_paths(self, section: Dict[str, Any]) -> Dict[str, Any]:
+        """配置段中journal_path的{identity_id}替换为当前身份ID，使每个身份使用自己的日志"""
+        path = section.get('journal_path')
+        if not path or '{identity_id}' not in path:
+            return section
+        return dict(section, journal_path=path.replace('{identity_id}', self.current_identity.id))
     
-    def _load_config(self) -> Dict[str, Any]:
-        """加载配置"""
+    def _load_config(self, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """加载配置（默认配置 <- 配置文件 <- overrides）"""
         default_config = {
             "moltbook": {
                 "enabled": True,
@@ -44,11 +89,23 @@ class OpenClawMoltbookIntegration:
                 "interaction": {
                     "post_frequency": "moderate",
                     "reply_strategy": "selective",
-                    "engagement_level": "active"
+                    "engagement_level": "active",
+                    "rate_limits": {
+                        "mode": "wait",
+                        "max_wait": 60
+                    },
+                    "history": {
+                        "capacity": 100,
+                        "journal_path": "/tmp/moltbook_interactions.{identity_id}.jsonl"
+                    },
+                    "action_queue": {
+                        "concurrency": 4,
+                        "journal_path": "/tmp/moltbook_actions.{identity_id}.jsonl"
+                    }
                 }
             },
             "identity": {
-                "storage_path": "/tmp/moltbook_identities.json"
+                "storage_path": "/tmp/moltbook_identities.jsonl"
             }
         }
         
@@ -61,6 +118,9 @@ class OpenClawMoltbookIntegration:
             except (FileNotFoundError, json.JSONDecodeError):
                 pass
         
+        if overrides:
+            self._deep_merge(default_config, copy.deepcopy(overrides))
+        
         return default_config
     
     def _deep_merge(self, base: Dict, update: Dict):
@@ -88,21 +148,46 @@ class OpenClawMoltbookIntegration:
                 stats = self.api_client.get_simulation_stats()
                 print(f"模拟环境: {stats['ai_profiles_count']}个AI, {stats['posts_count']}个帖子")
             
+            # 启动发送队列，继续投递上次未完成的动作
+            self.action_queue.start()
             return True
-            
+        
         except Exception as e:
             print(f"初始化失败: {e}")
             return False
     
+    async def close(self):
+        """
+        关闭集成，停止发送队列（未投递的动作留在队列日志中）；
+        API客户端不是注入的时才释放其连接，共享的客户端不受影响
+        """
+        await self.action_queue.close()
+        if self._owns_api_client:
+            await self.api_client.aclose()
+        self.interaction_history.close()
+    
+    def enqueue(self, action: str, idempotency_key: Optional[str] = None,
+                priority: Optional[int] = None, **params) -> ActionTicket:
+        """
+        把发送动作放入后台队列，立即返回凭据
+        action为post/reply/message，params为post_to_moltbook、reply_to_post、
+        send_conversation_message的参数；ticket.wait()可等待投递结果
+        """
+        return self.action_queue.enqueue(action, idempotency_key, priority, **params)
+    
     async def post_to_moltbook(self, content: str, topic: str = "general", 
-                              tags: List[str] = None) -> Dict[str, Any]:
-        """发布内容到Moltbook"""
+                              tags: List[str] = None,
+                              idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        发布内容到Moltbook
+        idempotency_key传给服务端去重（发送队列重试同一动作时使用同一个键）
+        """
         try:
             if tags is None:
                 tags = []
             
             # 检查发布频率限制
-            if self._check_rate_limit():
+            if not await self._acquire_rate_limit('post'):
                 return {
                     "success": False,
                     "error": "发布频率过高，请稍后再试"
@@ -113,7 +198,8 @@ class OpenClawMoltbookIntegration:
                 self.current_identity,
                 content,
                 topic,
-                tags
+                tags,
+                idempotency_key=idempotency_key
             )
             
             if result.get('success'):
@@ -139,26 +225,28 @@ class OpenClawMoltbookIntegration:
                     "error": result.get('error', '发布失败'),
                     "details": result
                 }
-                
+        
         except Exception as e:
             return {
                 "success": False,
                 "error": f"发布过程中出错: {str(e)}"
             }
     
-    def _check_rate_limit(self) -> bool:
-        """检查发布频率限制"""
-        if self.last_post_time is None:
-            return False
-        
-        # 简单的频率限制：每分钟最多1次
-        time_since_last = (datetime.now() - self.last_post_time).total_seconds()
-        return time_since_last < 60
+    async def _acquire_rate_limit(self, action: str) -> bool:
+        """
+        通过当前身份在该动作上的限流
+        wait模式下排队等待令牌（最长max_wait秒），reject模式下无令牌立即拒绝
+        """
+        identity_id = self.current_identity.id
+        if self.rate_limit_mode == 'reject':
+            return self.rate_limiter.try_acquire(action, identity_id)
+        return await self.rate_limiter.acquire(action, identity_id,
+                                               timeout=self.rate_limit_max_wait)
     
-    async def get_feed(self, limit: int = 10) -> Dict[str, Any]:
-        """获取Moltbook动态"""
+    async def get_feed(self, limit: int = 10, ranked: bool = False) -> Dict[str, Any]:
+        """获取Moltbook动态（ranked为True时按作者社交评分和时间衰减排序）"""
         try:
-            posts = await self.api_client.get_feed(self.current_identity, limit)
+            posts = await self.api_client.get_feed(self.current_identity, limit, ranked=ranked)
             
             if not posts:
                 return {
@@ -167,6 +255,10 @@ class OpenClawMoltbookIntegration:
                     "posts": []
                 }
             
+            # 一次解析全部作者名称，之后逐条格式化只做字典查找
+            await self.profiles.resolve(self.current_identity,
+                                        (post.get('ai_id') for post in posts))
+            
             # 格式化帖子显示
             formatted_posts = []
             for i, post in enumerate(posts, 1):
@@ -175,25 +267,28 @@ class OpenClawMoltbookIntegration:
             
             return {
                 "success": True,
-                "message": f"📰 最新Moltbook动态（{len(posts)}条）",
+                "message": f"📰 {'推荐' if ranked else '最新'}Moltbook动态（{len(posts)}条）",
                 "posts": formatted_posts,
                 "raw_posts": posts
             }
-            
+        
         except Exception as e:
             return {
                 "success": False,
                 "error": f"获取动态失败: {str(e)}"
             }
     
+    async def stream_feed(self, page_size: int = 50):
+        """逐条遍历完整动态流，产出格式化后的帖子"""
+        index = 0
+        async for post in self.api_client.iter_feed(self.current_identity, page_size):
+            index += 1
+            yield self._format_post_for_display(post.to_dict(), index)
+    
     def _format_post_for_display(self, post: Dict[str, Any], index: int) -> str:
         """格式化帖子用于显示"""
         # 获取AI名称
-        ai_name = "未知AI"
-        for profile in self.api_client.simulation_data.get('ai_profiles', []):
-            if profile['id'] == post.get('ai_id'):
-                ai_name = profile['name']
-                break
+        ai_name = self.profiles.name(post.get('ai_id'))
         
         # 格式化时间
         timestamp = post.get('timestamp', '')
@@ -216,13 +311,21 @@ class OpenClawMoltbookIntegration:
         
         return f"{index}. [{ai_name}] {time_str}\n   {content_preview}\n   👍 {likes}  💬 {reply_count}"
     
-    async def reply_to_post(self, post_id: str, content: str) -> Dict[str, Any]:
+    async def reply_to_post(self, post_id: str, content: str,
+                            idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """回复Moltbook帖子"""
         try:
+            if not await self._acquire_rate_limit('reply'):
+                return {
+                    "success": False,
+                    "error": "回复频率过高，请稍后再试"
+                }
+            
             result = await self.api_client.reply_to_post(
                 self.current_identity,
                 post_id,
-                content
+                content,
+                idempotency_key=idempotency_key
             )
             
             if result.get('success'):
@@ -239,7 +342,7 @@ class OpenClawMoltbookIntegration:
                     "error": result.get('error', '回复失败'),
                     "details": result
                 }
-                
+        
         except Exception as e:
             return {
                 "success": False,
@@ -251,6 +354,12 @@ class OpenClawMoltbookIntegration:
                                    topic: str = "") -> Dict[str, Any]:
         """开始与AI对话"""
         try:
+            if not await self._acquire_rate_limit('conversation'):
+                return {
+                    "success": False,
+                    "error": "创建对话频率过高，请稍后再试"
+                }
+            
             result = await self.api_client.start_conversation(
                 self.current_identity,
                 other_ai_ids,
@@ -260,7 +369,8 @@ class OpenClawMoltbookIntegration:
             
             if result.get('success'):
                 conv_id = result.get('conversation_id')
-                self.conversation_cache[conv_id] = result.get('conversation', {})
+                if result.get('conversation'):
+                    self.conversation_cache.put(result['conversation'])
                 self._record_interaction('conversation_start', result)
                 
                 return {
@@ -275,7 +385,7 @@ class OpenClawMoltbookIntegration:
                     "error": result.get('error', '创建对话失败'),
                     "details": result
                 }
-                
+        
         except Exception as e:
             return {
                 "success": False,
@@ -283,19 +393,27 @@ class OpenClawMoltbookIntegration:
             }
     
     async def send_conversation_message(self, conversation_id: str, 
-                                       content: str) -> Dict[str, Any]:
+                                       content: str,
+                                       idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """发送对话消息"""
         try:
+            if not await self._acquire_rate_limit('message'):
+                return {
+                    "success": False,
+                    "error": "发送消息频率过高，请稍后再试"
+                }
+            
             result = await self.api_client.send_message(
                 self.current_identity,
                 conversation_id,
-                content
+                content,
+                idempotency_key=idempotency_key
             )
             
             if result.get('success'):
-                # 更新缓存
-                if conversation_id in self.conversation_cache:
-                    self.conversation_cache[conversation_id] = result.get('conversation', {})
+                # 写穿缓存：只追加新消息
+                if result.get('conversation'):
+                    self.conversation_cache.merge(result['conversation'])
                 
                 self._record_interaction('message_send', result)
                 
@@ -331,23 +449,31 @@ class OpenClawMoltbookIntegration:
                     "error": result.get('error', '发送消息失败'),
                     "details": result
                 }
-                
+        
         except Exception as e:
             return {
                 "success": False,
                 "error": f"发送消息失败: {str(e)}"
             }
     
+    async def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """获取对话（优先读缓存，未命中时请求并写入缓存）"""
+        conversation = self.conversation_cache.get(conversation_id)
+        if conversation is not None:
+            return conversation
+        conversation = await self.api_client.get_conversation(self.current_identity, conversation_id)
+        if conversation:
+            self.conversation_cache.put(conversation)
+        return conversation
+    
     def _get_ai_name(self, ai_id: str) -> str:
         """获取AI名称"""
-        for profile in self.api_client.simulation_data.get('ai_profiles', []):
-            if profile['id'] == ai_id:
-                return profile['name']
-        return "未知AI"
+        return self.profiles.name(ai_id)
     
     async def search_compatible_ais(self, interests: List[str] = None,
-                                   limit: int = 5) -> Dict[str, Any]:
-        """搜索兼容的AI"""
+                                   limit: int = 5, capabilities: List[str] = None,
+                                   min_capability_level: float = 0.0) -> Dict[str, Any]:
+        """搜索兼容的AI（可按能力及最低等级过滤）"""
         try:
             if interests is None:
                 interests = self.current_identity.interests
@@ -355,9 +481,13 @@ class OpenClawMoltbookIntegration:
             results = await self.api_client.search_ais(
                 self.current_identity,
                 interests,
-                limit=limit
+                capabilities,
+                limit=limit,
+                min_capability_level=min_capability_level
             )
             
+            self.profiles.update(results)
+            
             if not results:
                 return {
                     "success": True,
@@ -377,7 +507,7 @@ class OpenClawMoltbookIntegration:
                 "ais": formatted_ais,
                 "raw_ais": results
             }
-            
+        
         except Exception as e:
             return {
                 "success": False,
@@ -415,7 +545,7 @@ class OpenClawMoltbookIntegration:
                 "analytics": formatted_analytics,
                 "raw_analytics": analytics
             }
-            
+        
         except Exception as e:
             return {
                 "success": False,
@@ -464,21 +594,17 @@ class OpenClawMoltbookIntegration:
         return "\n".join(lines)
     
     def _record_interaction(self, interaction_type: str, data: Dict[str, Any]):
-        """记录交互历史"""
-        record = {
-            "type": interaction_type,
-            "timestamp": datetime.now().isoformat(),
-            "data": data
-        }
-        self.interaction_history.append(record)
-        
-        # 保持历史记录大小
-        if len(self.interaction_history) > 100:
-            self.interaction_history = self.interaction_history[-100:]
+        """记录交互历史，并把互动图更新后的社交评分同步到身份"""
+        self.interaction_history.record(interaction_type, data)
+        self.api_client.sync_social_scores(self.identity_manager)
     
-    def get_interaction_history(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """获取交互历史"""
-        return self.interaction_history[-limit:]
+    def get_interaction_history(self, limit: int = 10, offset: int = 0,
+                                full: bool = False) -> List[Dict[str, Any]]:
+        """
+        获取交互历史（按时间正序）
+        offset为跳过的最新记录数，超出内存范围时从日志读取；full为True时返回完整数据
+        """
+        return self.interaction_history.page(limit, offset, full)
     
     def get_status(self) -> Dict[str, Any]:
         """获取集成状态"""
@@ -492,8 +618,11 @@ class OpenClawMoltbookIntegration:
             },
             "mode": self.api_client.mode.value,
             "simulation_stats": stats,
-            "interaction_count": len(self.interaction_history),
+            "interaction_count": self.interaction_history.total,
             "conversation_count": len(self.conversation_cache),
+            "conversation_cache": self.conversation_cache.stats(),
+            "action_queue": self.action_queue.stats(),
+            "rate_limits": self.rate_limiter.stats(),
             "last_post": self.last_post_time.isoformat() if self.last_post_time else None
         }
 
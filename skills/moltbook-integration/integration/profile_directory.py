@@ -0,0 +1,87 @@
+"""
+AI资料目录
+按ai_id缓存AI名称和资料，供集成层和技能层共享，渲染动态时O(1)查找作者名称
+"""
+
+from typing import Dict, Optional, Any, Iterable, Set
+
+from ..core.api_client import MoltbookAPIClient, APIError
+from ..core.identity import AIIdentity
+
+
+class ProfileDirectory:
+    """
+    AI资料目录
+    查找顺序：本地缓存 -> 模拟存储中的资料 -> 身份管理器中的本地身份。
+    API模式下search_ais等返回的资料通过update()登记；
+    resolve()把仍未知的ID合并成一次批量请求获取
+    """
+    
+    def __init__(self, api_client: MoltbookAPIClient, identity_manager=None, max_entries: int = 10000):
+        self.api_client = api_client
+        self.identity_manager = identity_manager
+        self.max_entries = max_entries
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+        self._missing: Set[str] = set()  # 批量请求后仍不存在的ID，避免重复请求
+    
+    def __len__(self) -> int:
+        return len(self._profiles)
+    
+    def update(self, profiles: Iterable[Dict[str, Any]]):
+        """登记资料（如search_ais的结果）"""
+        for profile in profiles:
+            ai_id = profile.get('id') if profile else None
+            if not ai_id:
+                continue
+            if ai_id not in self._profiles and len(self._profiles) >= self.max_entries:
+                # 按插入顺序淘汰最早登记的资料
+                self._profiles.pop(next(iter(self._profiles)))
+            self._profiles[ai_id] = {key: value for key, value in profile.items()
+                                     if key not in ('match_score', 'compatibility')}
+            self._missing.discard(ai_id)
+    
+    def get(self, ai_id: str) -> Optional[Dict[str, Any]]:
+        """按ID获取资料（不发请求）"""
+        profile = self._profiles.get(ai_id)
+        if profile is not None:
+            return profile
+        profile = self.api_client.store.get_profile(ai_id)
+        if profile is not None:
+            return profile
+        if self.identity_manager is not None:
+            identity = self.identity_manager.get_identity(ai_id)
+            if identity is not None:
+                return {"id": identity.id, "name": identity.name,
+                        "description": identity.description, "interests": identity.interests}
+        return None
+    
+    def name(self, ai_id: str, default: str = "未知AI") -> str:
+        """按ID获取AI名称"""
+        profile = self.get(ai_id) if ai_id else None
+        return profile.get('name', default) if profile else default
+    
+    async def resolve(self, ai_identity: AIIdentity, ai_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        批量解析AI名称
+        本地找不到的ID合并成一次请求获取（模拟模式下不发请求），返回ID -> 名称
+        """
+        ai_ids = list(dict.fromkeys(ai_id for ai_id in ai_ids if ai_id))
+        unknown = [ai_id for ai_id in ai_ids
+                   if ai_id not in self._missing and self.get(ai_id) is None]
+        if unknown:
+            try:
+                found = await self.api_client.get_profiles_by_ids(ai_identity, unknown)
+            except APIError:
+                found = {}
+            self.update(profile for profile in found.values() if profile)
+            if len(self._missing) >= self.max_entries:
+                self._missing.clear()
+            self._missing.update(ai_id for ai_id in unknown if not found.get(ai_id))
+        return {ai_id: self.name(ai_id) for ai_id in ai_ids}
+    
+    def stats(self) -> Dict[str, Any]:
+        """目录统计"""
+        return {
+            "cached": len(self._profiles),
+            "missing": len(self._missing)
+        }
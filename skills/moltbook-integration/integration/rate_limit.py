@@ -0,0 +1,171 @@
+"""
+客户端限流模块
+基于令牌桶，按动作类型和AI身份分别限流
+"""
+
+import asyncio
+import time
+from typing import Dict, Any, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    令牌桶
+    以rate个/秒的速度补充令牌，最多积累capacity个。
+    acquire()采用预约方式：令牌不足时先记账再等待，并发调用按到达顺序排队
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated_at = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+    
+    def time_until(self, tokens: float = 1) -> float:
+        """距离可取得tokens个令牌还需等待的秒数"""
+        self._refill()
+        deficit = tokens - self.tokens
+        return deficit / self.rate if deficit > 0 else 0.0
+    
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """立即尝试取令牌，不足时返回False"""
+        self._refill()
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+    
+    async def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        等待直到取得令牌
+        需要等待的时间超过timeout时不占用令牌，直接返回False
+        """
+        wait = self.time_until(tokens)
+        if timeout is not None and wait > timeout:
+            return False
+        self.tokens -= tokens
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+
+class RateLimiter:
+    """
+    按(AI身份, 动作)维护令牌桶的限流器
+    默认速率由post_frequency档位决定，可按动作或按身份覆盖；
+    未配置的动作不限流
+    """
+    
+    # 各档位的默认速率：动作 -> (每分钟次数, 突发容量)
+    FREQUENCY_PRESETS = {
+        "low": {
+            "post": (0.2, 1),
+            "reply": (2, 2),
+            "conversation": (0.5, 1),
+            "message": (6, 3)
+        },
+        "moderate": {
+            "post": (1, 1),
+            "reply": (6, 3),
+            "conversation": (2, 2),
+            "message": (20, 5)
+        },
+        "high": {
+            "post": (6, 3),
+            "reply": (30, 10),
+            "conversation": (10, 5),
+            "message": (60, 10)
+        }
+    }
+    
+    def __init__(self, post_frequency: str = "moderate",
+                 actions: Optional[Dict[str, Dict[str, float]]] = None,
+                 identities: Optional[Dict[str, Dict[str, Dict[str, float]]]] = None):
+        preset = self.FREQUENCY_PRESETS.get(post_frequency, self.FREQUENCY_PRESETS["moderate"])
+        self.post_frequency = post_frequency
+        self.limits: Dict[str, Tuple[float, float]] = dict(preset)
+        for action, limit in (actions or {}).items():
+            self.limits[action] = self._parse_limit(limit, self.limits.get(action))
+        
+        self.identity_limits: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        for identity_id, overrides in (identities or {}).items():
+            self.identity_limits[identity_id] = {
+                action: self._parse_limit(limit, self.limits.get(action))
+                for action, limit in overrides.items()
+            }
+        
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.rejected = 0
+        self.delayed = 0
+    
+    @classmethod
+    def from_config(cls, interaction_config: Dict[str, Any]) -> 'RateLimiter':
+        """从interaction配置段创建"""
+        rate_config = interaction_config.get('rate_limits', {})
+        return cls(
+            post_frequency=interaction_config.get('post_frequency', 'moderate'),
+            actions=rate_config.get('actions'),
+            identities=rate_config.get('identities')
+        )
+    
+    @staticmethod
+    def _parse_limit(limit: Dict[str, float],
+                     default: Optional[Tuple[float, float]]) -> Tuple[float, float]:
+        per_minute = limit.get('per_minute', default[0] if default else 1)
+        burst = limit.get('burst', default[1] if default else 1)
+        return per_minute, burst
+    
+    def _limit_for(self, action: str, identity_id: str) -> Optional[Tuple[float, float]]:
+        overrides = self.identity_limits.get(identity_id)
+        if overrides and action in overrides:
+            return overrides[action]
+        return self.limits.get(action)
+    
+    def bucket(self, action: str, identity_id: str) -> Optional[TokenBucket]:
+        """获取（按需创建）对应的令牌桶，动作不限流时返回None"""
+        key = (identity_id, action)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            limit = self._limit_for(action, identity_id)
+            if limit is None:
+                return None
+            per_minute, burst = limit
+            bucket = TokenBucket(per_minute / 60.0, burst)
+            self._buckets[key] = bucket
+        return bucket
+    
+    def try_acquire(self, action: str, identity_id: str) -> bool:
+        """立即尝试通过限流"""
+        bucket = self.bucket(action, identity_id)
+        if bucket is None or bucket.try_acquire():
+            return True
+        self.rejected += 1
+        return False
+    
+    async def acquire(self, action: str, identity_id: str,
+                      timeout: Optional[float] = None) -> bool:
+        """等待通过限流，超过timeout仍无法通过时返回False"""
+        bucket = self.bucket(action, identity_id)
+        if bucket is None:
+            return True
+        wait = bucket.time_until()
+        if timeout is not None and wait > timeout:
+            self.rejected += 1
+            return False
+        if wait > 0:
+            self.delayed += 1
+        return await bucket.acquire()
+    
+    def stats(self) -> Dict[str, Any]:
+        """限流统计"""
+        return {
+            "post_frequency": self.post_frequency,
+            "buckets": len(self._buckets),
+            "delayed": self.delayed,
+            "rejected": self.rejected
+        }
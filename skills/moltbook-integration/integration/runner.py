@@ -0,0 +1,211 @@
+"""
+多身份运行器
+在一个事件循环中同时驱动多个AI身份，共享连接池和资料目录，按身份轮转调度任务
+"""
+
+import asyncio
+import functools
+import os
+from collections import deque
+from typing import Dict, List, Optional, Any, Awaitable, Callable, Deque, Iterable, Tuple, Union
+
+from ..core.identity import AIIdentity, IdentityManager
+from ..core.api_client import MoltbookAPIClient
+from .openclaw import OpenClawMoltbookIntegration
+from .profile_directory import ProfileDirectory
+
+# 任务：集成实例的方法名，或以集成实例为第一个参数的协程函数
+Action = Union[str, Callable[..., Awaitable[Any]]]
+
+
+class MultiIdentityRunner:
+    """
+    多身份运行器
+    每个身份一个OpenClawMoltbookIntegration（独立的限流器、交互历史和对话缓存），
+    所有身份共享同一个API客户端（连接池）、身份管理器和资料目录。
+    任务按身份排队：同一身份的任务按提交顺序串行执行，不同身份之间轮转调度，
+    最多max_concurrency个任务同时进行，任务多的身份不会挤占其他身份
+    """
+    
+    def __init__(self, config_path: str = None, config: Optional[Dict[str, Any]] = None,
+                 max_concurrency: int = 32, history_dir: Optional[str] = None,
+                 api_client: Optional[MoltbookAPIClient] = None,
+                 identity_manager: Optional[IdentityManager] = None):
+        self.config_path = config_path
+        self.config = config or {}
+        self.max_concurrency = max_concurrency
+        self.history_dir = history_dir  # 各身份交互历史和发送队列日志所在目录，None表示只保存在内存中
+        
+        # 共享组件：未注入时采用第一个身份的集成实例创建的组件
+        self.identity_manager = identity_manager
+        self.api_client = api_client
+        self.profiles: Optional[ProfileDirectory] = None
+        
+        self.agents: Dict[str, OpenClawMoltbookIntegration] = {}
+        self._queues: Dict[str, Deque[Tuple[Action, tuple, dict, asyncio.Future]]] = {}
+        self._ready: Optional[asyncio.Queue] = None  # 有待执行任务且当前空闲的身份，按到达顺序
+        self._scheduled: set = set()                 # 已在_ready中或正在执行任务的身份
+        self._workers: List[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+    
+    def __len__(self) -> int:
+        return len(self.agents)
+    
+    def add_identity(self, identity: AIIdentity) -> OpenClawMoltbookIntegration:
+        """添加身份，返回该身份的集成实例（已存在时直接返回）"""
+        agent = self.agents.get(identity.id)
+        if agent is not None:
+            return agent
+        history_config = {"journal_path": os.path.join(self.history_dir, f"{identity.id}.jsonl")
+                          if self.history_dir else None}
+        queue_config = {"journal_path": os.path.join(self.history_dir, f"{identity.id}.actions.jsonl")
+                        if self.history_dir else None}
+        overrides = {"moltbook": {"interaction": {"history": history_config,
+                                                  "action_queue": queue_config}}}
+        agent = OpenClawMoltbookIntegration(
+            self.config_path, _merged(self.config, overrides),
+            identity=identity,
+            api_client=self.api_client,
+            identity_manager=self.identity_manager,
+            profiles=self.profiles
+        )
+        if self.profiles is None:
+            self.api_client = agent.api_client
+            self.identity_manager = agent.identity_manager
+            self.profiles = agent.profiles
+            agent._owns_api_client = False  # 客户端由所有身份共享，只在close()中关闭
+        self.agents[identity.id] = agent
+        self._queues[identity.id] = deque()
+        # 发送队列经共享调度器投递：受max_concurrency和轮转调度约束，不另起工作协程池
+        agent.action_queue.concurrency = 1
+        agent.action_queue.deliver = functools.partial(self._deliver_action, identity.id)
+        agent.action_queue.start()  # 继续投递该身份上次未完成的动作（不在事件循环中时推迟到入队）
+        return agent
+    
+    def add_identities(self, identities: Iterable[AIIdentity]) -> List[OpenClawMoltbookIntegration]:
+        """批量添加身份"""
+        return [self.add_identity(identity) for identity in identities]
+    
+    def remove_identity(self, identity_id: str) -> bool:
+        """移除身份，尚未执行的任务被取消"""
+        agent = self.agents.pop(identity_id, None)
+        if agent is None:
+            return False
+        for _, _, _, future in self._queues.pop(identity_id, ()):
+            future.cancel()
+        agent.action_queue.stop()
+        agent.interaction_history.close()
+        return True
+    
+    def submit(self, identity_id: str, action: Action, *args, **kwargs) -> asyncio.Future:
+        """
+        提交任务，返回结果的Future
+        action为集成方法名（如"post_to_moltbook"）或async函数(agent, *args, **kwargs)
+        """
+        if identity_id not in self.agents:
+            raise KeyError(f"未知身份: {identity_id}")
+        self._ensure_workers()
+        future = asyncio.get_running_loop().create_future()
+        self._queues[identity_id].append((action, args, kwargs, future))
+        if identity_id not in self._scheduled:
+            self._scheduled.add(identity_id)
+            self._ready.put_nowait(identity_id)
+        return future
+    
+    async def _deliver_action(self, identity_id: str, method_name: str,
+                              params: Dict[str, Any]) -> Any:
+        """发送队列的投递函数：作为该身份的任务排队执行"""
+        return await self.submit(identity_id, method_name, **params)
+    
+    async def run_all(self, action: Action, *args, **kwargs) -> Dict[str, Any]:
+        """让每个身份各执行一次同样的任务，返回身份ID -> 结果（异常作为结果返回）"""
+        futures = {identity_id: self.submit(identity_id, action, *args, **kwargs)
+                   for identity_id in list(self.agents)}
+        results = await asyncio.gather(*futures.values(), return_exceptions=True)
+        return dict(zip(futures, results))
+    
+    def _ensure_workers(self):
+        if self._ready is None:
+            self._ready = asyncio.Queue()
+        if not self._workers:
+            self._workers = [asyncio.ensure_future(self._worker())
+                             for _ in range(self.max_concurrency)]
+    
+    async def _worker(self):
+        while True:
+            identity_id = await self._ready.get()
+            queue = self._queues.get(identity_id)
+            if not queue:
+                self._scheduled.discard(identity_id)
+                continue
+            action, args, kwargs, future = queue.popleft()
+            if not future.cancelled():
+                await self._run(self.agents[identity_id], action, args, kwargs, future)
+            # 还有任务时排到队尾，其他身份先执行
+            if identity_id in self.agents and self._queues[identity_id]:
+                self._ready.put_nowait(identity_id)
+            else:
+                self._scheduled.discard(identity_id)
+    
+    async def _run(self, agent: OpenClawMoltbookIntegration, action: Action,
+                   args: tuple, kwargs: dict, future: asyncio.Future):
+        try:
+            if isinstance(action, str):
+                result = await getattr(agent, action)(*args, **kwargs)
+            else:
+                result = await action(agent, *args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.failed += 1
+            if not future.done():
+                future.set_exception(e)
+            return
+        self.completed += 1
+        if not future.done():
+            future.set_result(result)
+    
+    def stats(self) -> Dict[str, Any]:
+        """运行统计"""
+        return {
+            "identities": len(self.agents),
+            "workers": len(self._workers),
+            "pending": sum(len(queue) for queue in self._queues.values()),
+            "active_identities": len(self._scheduled),
+            "completed": self.completed,
+            "failed": self.failed,
+            "profiles": self.profiles.stats() if self.profiles is not None else None
+        }
+    
+    async def close(self):
+        """停止各身份的发送队列和调度，取消未执行的任务，关闭历史日志和共享连接"""
+        for agent in self.agents.values():
+            await agent.action_queue.close()
+        for task in self._workers:
+            task.cancel()
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for queue in self._queues.values():
+            for _, _, _, future in queue:
+                future.cancel()
+            queue.clear()
+        self._scheduled.clear()
+        self._ready = None
+        for agent in self.agents.values():
+            agent.interaction_history.close()
+        if self.api_client is not None:
+            await self.api_client.aclose()
+
+
+def _merged(base: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """两层字典的深度合并（不修改输入）"""
+    result = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = _merged(result[key], value)
+        else:
+            result[key] = value
+    return result
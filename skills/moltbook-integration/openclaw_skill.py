@@ -27,6 +27,7 @@ class MoltbookSkill:
             "analytics": self.handle_analytics,
             "status": self.handle_status,
             "history": self.handle_history,
+            "queue": self.handle_queue,
             "help": self.handle_help
         }
     
@@ -46,7 +47,7 @@ class MoltbookSkill:
             else:
                 print("❌ Moltbook技能初始化失败")
                 return False
-                
+        
         except Exception as e:
             print(f"❌ Moltbook技能初始化错误: {e}")
             return False
@@ -79,8 +80,8 @@ class MoltbookSkill:
             content = request.replace("在moltbook上发布", "").replace("发布到moltbook", "").strip()
             return "post", {"content": content}
         
-        elif "moltbook动态" in request or "查看moltbook" in request:
-            return "feed", {}
+        elif "moltbook动态" in request or "查看moltbook" in request or "moltbook推荐" in request:
+            return "feed", {"ranked": "推荐" in request}
         
         elif "搜索ai" in request or "查找ai" in request:
             return "search", {}
@@ -129,8 +130,11 @@ class MoltbookSkill:
         if context and 'topics' in context:
             topic = context['topics'][0] if context['topics'] else "general"
         
-        # 执行发布
-        result = await self.integration.post_to_moltbook(content, topic, tags)
+        # 放入发送队列，默认立即返回，args['wait']为真时等待投递结果
+        ticket = self.integration.enqueue('post', content=content, topic=topic, tags=tags)
+        if not args.get('wait'):
+            return self._queued_response(ticket, "📤 帖子已加入发送队列", {"topic": topic})
+        result = await ticket.wait()
         
         if result.get('success'):
             return {
@@ -156,8 +160,9 @@ class MoltbookSkill:
     async def handle_feed(self, args: Dict[str, Any], context: Dict[str, Any] = None) -> Dict[str, Any]:
         """处理获取动态请求"""
         limit = 10
+        ranked = bool(args.get('ranked'))
         
-        result = await self.integration.get_feed(limit)
+        result = await self.integration.get_feed(limit, ranked)
         
         if result.get('success'):
             posts = result.get('posts', [])
@@ -202,15 +207,8 @@ class MoltbookSkill:
     
     def _extract_ai_name(self, post: Dict[str, Any]) -> str:
         """从帖子中提取AI名称"""
-        ai_id = post.get('ai_id', '')
-        
-        # 在模拟数据中查找
-        if hasattr(self.integration.api_client, 'simulation_data'):
-            for profile in self.integration.api_client.simulation_data.get('ai_profiles', []):
-                if profile['id'] == ai_id:
-                    return profile['name']
-        
-        return "AI助手"
+        # 与集成层共享的资料目录（get_feed已批量解析过作者）
+        return self.integration.profiles.name(post.get('ai_id', ''), default="AI助手")
     
     async def handle_reply(self, args: Dict[str, Any], context: Dict[str, Any] = None) -> Dict[str, Any]:
         """处理回复请求"""
@@ -224,7 +222,10 @@ class MoltbookSkill:
                 "suggestions": ["格式：回复 <帖子ID> <内容>"]
             }
         
-        result = await self.integration.reply_to_post(post_id, content)
+        ticket = self.integration.enqueue('reply', post_id=post_id, content=content)
+        if not args.get('wait'):
+            return self._queued_response(ticket, "📤 回复已加入发送队列", {"post_id": post_id})
+        result = await ticket.wait()
         
         if result.get('success'):
             return {
@@ -341,7 +342,11 @@ class MoltbookSkill:
                 "suggestions": ["格式：消息 <对话ID> <内容>"]
             }
         
-        result = await self.integration.send_conversation_message(conversation_id, content)
+        ticket = self.integration.enqueue('message', conversation_id=conversation_id, content=content)
+        if not args.get('wait'):
+            return self._queued_response(ticket, "📤 消息已加入发送队列",
+                                         {"conversation_id": conversation_id})
+        result = await ticket.wait()
         
         if result.get('success'):
             response_data = {
@@ -366,6 +371,42 @@ class MoltbookSkill:
                 "message": result.get('error', '发送消息失败')
             }
     
+    def _queued_response(self, ticket, message: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """入队后立即返回的响应"""
+        return {
+            "success": True,
+            "message": message,
+            "data": dict(data, ticket_id=ticket.id, status=ticket.status),
+            "actions": [
+                {"type": "check_queue", "label": "查看发送状态"}
+            ]
+        }
+    
+    async def handle_queue(self, args: Dict[str, Any], context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """处理发送队列查询（带ticket_id时查看单个动作）"""
+        words = args.get('args') or []
+        ticket_id = args.get('ticket_id') or (words[0] if words else None)
+        queue = self.integration.action_queue
+        
+        if not ticket_id:
+            return {
+                "success": True,
+                "message": f"📮 发送队列：{len(queue)}个待发送",
+                "data": queue.stats()
+            }
+        
+        ticket = queue.get(ticket_id)
+        if ticket is None:
+            return {
+                "success": False,
+                "message": f"未找到发送任务: {ticket_id}"
+            }
+        return {
+            "success": True,
+            "message": f"📮 发送任务状态: {ticket.status}",
+            "data": ticket.to_dict()
+        }
+    
     async def handle_analytics(self, args: Dict[str, Any], context: Dict[str, Any] = None) -> Dict[str, Any]:
         """处理分析请求"""
         timeframe = args.get('timeframe', '7d')
@@ -433,7 +474,8 @@ class MoltbookSkill:
     async def handle_history(self, args: Dict[str, Any], context: Dict[str, Any] = None) -> Dict[str, Any]:
         """处理历史请求"""
         limit = args.get('limit', 10)
-        history = self.integration.get_interaction_history(limit)
+        offset = args.get('offset', 0)
+        history = self.integration.get_interaction_history(limit, offset)
         
         if not history:
             return {
@@ -444,7 +486,7 @@ class MoltbookSkill:
         
         # 格式化历史记录
         formatted_history = []
-        for record in reversed(history[-limit:]):
+        for record in reversed(history):
             formatted_record = {
                 "type": record['type'],
                 "timestamp": record['timestamp'][:19].replace('T', ' '),
@@ -457,7 +499,8 @@ class MoltbookSkill:
             "message": f"📜 最近{len(formatted_history)}次交互",
             "data": {
                 "history": formatted_history,
-                "total_count": len(self.integration.interaction_history)
+                "total_count": self.integration.interaction_history.total,
+                "offset": offset
             },
             "actions": [
                 {"type": "clear_history", "label": "清空历史"},
@@ -494,6 +537,7 @@ class MoltbookSkill:
 2. **查看动态** - 获取Moltbook最新动态
    - "查看Moltbook动态"
    - "Moltbook有什么新消息"
+   - "Moltbook推荐动态"（按作者社交评分排序）
 
 3. **搜索AI** - 查找兼容的AI进行对话
    - "搜索AI [兴趣标签]"
@@ -519,10 +563,15 @@ class MoltbookSkill:
    - "Moltbook历史"
    - "查看我的交互记录"
 
+9. **发送队列** - 查看后台发送状态
+   - "queue"
+   - "queue [任务ID]"
+
 **使用提示：**
 - 当前运行在模拟模式，数据为模拟生成
 - 可以与其他模拟AI进行互动
 - 所有交互都会被记录和分析
+- 发布、回复和消息在后台发送，立即返回任务ID
 
 **示例：**
 - "在Moltbook上发布'AI伦理的重要性'"
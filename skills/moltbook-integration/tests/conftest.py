@@ -0,0 +1,17 @@
+"""
+测试配置
+技能目录名含连字符，不能直接导入：注册为moltbook_integration包，
+测试中通过moltbook_integration.core / moltbook_integration.integration导入
+"""
+
+import os
+import sys
+import types
+
+PACKAGE_NAME = "moltbook_integration"
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if PACKAGE_NAME not in sys.modules:
+    package = types.ModuleType(PACKAGE_NAME)
+    package.__path__ = [PACKAGE_DIR]
+    sys.modules[PACKAGE_NAME] = package
@@ -0,0 +1,178 @@
+"""动作队列：优先级、去重、日志恢复和多身份共享日志"""
+
+import asyncio
+import json
+
+from moltbook_integration.integration.action_queue import ActionQueue
+
+
+class FakeIntegration:
+    """记录调用顺序的集成替身"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    async def post_to_moltbook(self, content, topic="general", tags=None, idempotency_key=None):
+        self.calls.append(("post", content))
+        await asyncio.sleep(0)
+        return {"success": True, "post_id": "post_" + content, "details": "x" * 50}
+    
+    async def reply_to_post(self, post_id, content, idempotency_key=None):
+        self.calls.append(("reply", content))
+        await asyncio.sleep(0)
+        return {"success": True, "reply_id": "reply_" + content}
+    
+    async def send_conversation_message(self, conversation_id, content, idempotency_key=None):
+        self.calls.append(("message", content))
+        await asyncio.sleep(0)
+        return {"success": content != "bad"}
+
+
+def _queue(tmp_path, integration=None, identity_id="agent_a", **kwargs):
+    integration = integration or FakeIntegration()
+    queue = ActionQueue(integration, journal_path=str(tmp_path / "actions.jsonl"),
+                        identity_id=identity_id, **kwargs)
+    return queue, integration
+
+
+def _journal(tmp_path):
+    with open(tmp_path / "actions.jsonl", encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_replies_and_messages_before_posts(tmp_path):
+    async def scenario():
+        queue, integration = _queue(tmp_path, concurrency=1)
+        posts = [queue.enqueue("post", content=str(index)) for index in range(3)]
+        reply = queue.enqueue("reply", post_id="p", content="r")
+        failed = queue.enqueue("message", conversation_id="c", content="bad")
+        await queue.drain()
+        await queue.close()
+        return queue, integration, posts, reply, failed
+    
+    queue, integration, posts, reply, failed = asyncio.run(scenario())
+    # 第一个帖子可能已被工作协程取走，之后回复和私信先于剩余帖子
+    kinds = [kind for kind, _ in integration.calls]
+    assert kinds.index("reply") < kinds.index("post", 1)
+    assert kinds.index("message") < kinds.index("post", 1)
+    assert posts[0].result["post_id"] == "post_0"
+    assert reply.status == "succeeded" and failed.status == "failed"
+    assert queue.stats()["failed"] == 1
+
+
+def test_idempotency_key_deduplicates(tmp_path):
+    async def scenario():
+        queue, integration = _queue(tmp_path)
+        first = queue.enqueue("post", idempotency_key="k1", content="a")
+        second = queue.enqueue("post", idempotency_key="k1", content="b")
+        await queue.drain()
+        await queue.close()
+        return queue, integration, first, second
+    
+    queue, integration, first, second = asyncio.run(scenario())
+    assert first is second
+    assert integration.calls == [("post", "a")]
+    assert queue.deduplicated == 1
+
+
+def test_recovers_pending_actions_after_restart(tmp_path):
+    async def enqueue_then_stop():
+        queue, _ = _queue(tmp_path)
+        done = queue.enqueue("post", content="done")
+        await done.wait()
+        pending = queue.enqueue("post", content="pending")
+        cancelled = queue.enqueue("post", content="cancelled")
+        queue.cancel(cancelled.id)
+        # 模拟进程在投递前退出
+        queue.stop()
+        return done, pending, cancelled
+    
+    done, pending, cancelled = asyncio.run(enqueue_then_stop())
+    
+    async def restart():
+        queue, integration = _queue(tmp_path)
+        assert queue.recovered == 1
+        assert queue.get(done.id).status == "succeeded"
+        assert queue.get(done.id).result == {"success": True, "post_id": "post_done"}
+        assert queue.get(cancelled.id).status == "cancelled"
+        # 已结束的动作重新入队时按幂等键去重
+        assert queue.enqueue("post", idempotency_key=done.id, content="done") is queue.get(done.id)
+        await queue.drain()
+        await queue.close()
+        return queue, integration
+    
+    queue, integration = asyncio.run(restart())
+    assert integration.calls == [("post", "pending")]
+    assert queue.get(pending.id).status == "succeeded"
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    async def enqueue_then_stop():
+        queue, _ = _queue(tmp_path)
+        ticket = queue.enqueue("reply", post_id="p", content="r")
+        queue.stop()
+        return ticket
+    
+    ticket = asyncio.run(enqueue_then_stop())
+    with open(tmp_path / "actions.jsonl", 'ab') as f:
+        f.write(b'{"op": "done", "id": "')
+    
+    async def restart():
+        queue, integration = _queue(tmp_path)
+        await queue.drain()
+        await queue.close()
+        return queue, integration
+    
+    queue, integration = asyncio.run(restart())
+    assert integration.calls == [("reply", "r")]
+    assert queue.get(ticket.id).status == "succeeded"
+
+
+def test_foreign_identity_records_are_preserved(tmp_path):
+    async def enqueue_for_a():
+        queue, _ = _queue(tmp_path, identity_id="agent_a")
+        queue.enqueue("post", content="from_a")
+        queue.stop()
+    
+    asyncio.run(enqueue_for_a())
+    
+    async def run_b():
+        # 每次结束都触发压缩，其他身份的记录也必须保留
+        queue, integration = _queue(tmp_path, identity_id="agent_b", compact_threshold=0)
+        assert len(queue) == 0
+        ticket = queue.enqueue("post", content="from_b")
+        await ticket.wait()
+        await queue.close()
+        return integration
+    
+    integration_b = asyncio.run(run_b())
+    assert integration_b.calls == [("post", "from_b")]
+    owners = {record['identity_id'] for record in _journal(tmp_path)}
+    assert owners == {"agent_a", "agent_b"}
+    
+    async def restart_a():
+        queue, integration = _queue(tmp_path, identity_id="agent_a")
+        assert len(queue) == 1
+        await queue.drain()
+        await queue.close()
+        return integration
+    
+    assert asyncio.run(restart_a()).calls == [("post", "from_a")]
+
+
+def test_compaction_keeps_only_latest_state(tmp_path):
+    async def scenario():
+        queue, _ = _queue(tmp_path, compact_threshold=0)
+        tickets = [queue.enqueue("post", content=str(index)) for index in range(6)]
+        await queue.drain()
+        await queue.close()
+        return tickets
+    
+    tickets = asyncio.run(scenario())
+    records = _journal(tmp_path)
+    assert len(records) <= 2 * len(tickets)
+    latest = {record['id']: record for record in records}
+    assert set(latest) == {ticket.id for ticket in tickets}
+    for record in latest.values():
+        assert record['op'] == "done"
+        assert "details" not in record['result']
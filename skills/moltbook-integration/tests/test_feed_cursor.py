@@ -0,0 +1,78 @@
+"""动态游标：HYBRID模式下回退时不混合真实API与模拟数据的时间线"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from moltbook_integration.core.api_client import APIError, MoltbookAPIClient
+from moltbook_integration.core.identity import IdentityManager
+from moltbook_integration.core.models import Post
+
+
+def _client(mode="hybrid"):
+    client = MoltbookAPIClient({"mode": mode})
+    identity = IdentityManager({}).get_default_identity()
+    return client, identity
+
+
+def test_breaker_opening_after_first_page_ends_iteration():
+    client, identity = _client()
+    calls = []
+    
+    async def api_page(ai_identity, limit, cursor):
+        calls.append(cursor)
+        if len(calls) > 1:
+            raise AssertionError("熔断后不应再请求真实API")
+        # 返回第一页后熔断器打开，下一页只能走回退
+        client._breaker("feed")._open()
+        posts = [Post(id=f"api_{index}", ai_id="remote", content="api", timestamp=datetime.now())
+                 for index in range(limit)]
+        return posts, "opaque-server-cursor"
+    
+    client._api_fetch_feed_page = api_page
+    
+    async def scenario():
+        posts = [post async for post in client.iter_feed(identity, page_size=2)]
+        await client.aclose()
+        return posts
+    
+    posts = asyncio.run(scenario())
+    assert [post.id for post in posts] == ["api_0", "api_1"]
+    assert calls == [None]
+
+
+def test_simulated_cursor_stays_on_simulation_after_recovery():
+    client, identity = _client()
+    breaker = client._breaker("feed")
+    
+    async def api_page(ai_identity, limit, cursor):
+        raise AssertionError("模拟数据的游标不应发给真实API")
+    
+    client._api_fetch_feed_page = api_page
+    
+    async def scenario():
+        breaker._open()
+        first, cursor = await client.fetch_feed_page(identity, limit=2)
+        breaker._close()
+        second, _ = await client.fetch_feed_page(identity, limit=2, cursor=cursor)
+        await client.aclose()
+        return first, cursor, second
+    
+    first, cursor, second = asyncio.run(scenario())
+    assert cursor.startswith(MoltbookAPIClient.SIM_CURSOR_PREFIX)
+    assert len(first) == 2 and second
+    assert not {post.id for post in first} & {post.id for post in second}
+
+
+def test_simulation_mode_rejects_foreign_cursor():
+    client, identity = _client("simulation")
+    
+    async def scenario():
+        try:
+            await client.fetch_feed_page(identity, limit=2, cursor="opaque-server-cursor")
+        finally:
+            await client.aclose()
+    
+    with pytest.raises(APIError):
+        asyncio.run(scenario())
@@ -0,0 +1,91 @@
+"""交互历史：日志轮转、重启恢复和超出内存范围的分页"""
+
+import os
+
+from moltbook_integration.integration.history import InteractionHistory
+
+
+def _history(tmp_path, **kwargs):
+    kwargs.setdefault('capacity', 5)
+    return InteractionHistory(journal_path=str(tmp_path / "history.jsonl"), **kwargs)
+
+
+def _record(history, count, start=0):
+    for index in range(start, start + count):
+        history.record('post', {"success": True, "post_id": f"post_{index}", "details": "x" * 100})
+
+
+def test_ring_buffer_keeps_recent_summaries(tmp_path):
+    history = _history(tmp_path)
+    _record(history, 8)
+    assert len(history) == 5
+    assert history.total == 8
+    page = history.page(limit=3)
+    assert [record['seq'] for record in page] == [6, 7, 8]
+    assert 'details' not in page[0]['data']
+    history.close()
+
+
+def test_page_beyond_memory_reads_journal(tmp_path):
+    history = _history(tmp_path)
+    _record(history, 12)
+    page = history.page(limit=3, offset=8)
+    assert [record['data']['post_id'] for record in page] == ["post_1", "post_2", "post_3"]
+    full = history.page(limit=1, full=True)
+    assert full[0]['data']['details'] == "x" * 100
+    history.close()
+
+
+def test_rotation_keeps_backup_count_files(tmp_path):
+    history = _history(tmp_path, max_bytes=600, backup_count=2)
+    _record(history, 20)
+    history.close()
+    path = history.journal_path
+    assert os.path.exists(path + ".1")
+    assert os.path.exists(path + ".2")
+    assert not os.path.exists(path + ".3")
+    assert all(os.path.getsize(p) <= 600 for p in history._journal_files())
+    
+    # 每个文件两条记录，只剩最近三个文件中的15~20
+    reopened = _history(tmp_path, max_bytes=600, backup_count=2)
+    assert reopened.total == 20
+    # 分页跨越三个文件时按序号拼接
+    assert [record['seq'] for record in reopened.page(limit=4, offset=1)] == [16, 17, 18, 19]
+    # 已被轮转删除的记录不再返回
+    assert [record['seq'] for record in reopened.page(limit=10, offset=5)] == [15]
+    reopened.close()
+
+
+def test_recover_restores_total_and_buffer(tmp_path):
+    history = _history(tmp_path)
+    _record(history, 7)
+    history.close()
+    
+    restarted = _history(tmp_path)
+    assert restarted.total == 7
+    assert [record['seq'] for record in restarted.page(limit=5)] == [3, 4, 5, 6, 7]
+    # 继续记录时序号接着增长
+    _record(restarted, 1, start=7)
+    assert restarted.page(limit=1)[0]['seq'] == 8
+    restarted.close()
+
+
+def test_recover_skips_torn_line(tmp_path):
+    history = _history(tmp_path)
+    _record(history, 3)
+    history.close()
+    with open(history.journal_path, 'ab') as f:
+        f.write(b'{"seq": 4, "type": "po')
+    
+    restarted = _history(tmp_path)
+    assert restarted.total == 3
+    assert [record['seq'] for record in restarted.page(limit=10, full=True)] == [1, 2, 3]
+    restarted.close()
+
+
+def test_memory_only_history(tmp_path):
+    history = InteractionHistory(capacity=3)
+    _record(history, 5)
+    assert [record['seq'] for record in history.page(limit=10)] == [3, 4, 5]
+    assert history.page(limit=2, offset=3) == []
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,83 @@
+"""身份查询：惰性加载和快照模式下只加载产出的身份"""
+
+from moltbook_integration.core.identity import AICapability, IdentityManager
+
+
+def _populate(tmp_path, count=30):
+    manager = IdentityManager({})
+    for index in range(count):
+        identity = manager.create_identity(
+            f"ai_{index}", "测试身份",
+            interests=["ethics"] if index % 3 == 0 else ["science"],
+            capabilities=[AICapability("reasoning", index / count, "推理")]
+        )
+        if index % 2:
+            manager.update_identity(identity.id, {"is_active": False})
+    manager.update_social_scores({identity.id: index / count for index, identity
+                                  in enumerate(sorted(manager.list_identities(), key=lambda i: i.name))})
+    path = str(tmp_path / "identities.jsonl")
+    manager.save_to_file(path)
+    return manager, path
+
+
+def _expected(manager, expression, limit=None, offset=0):
+    return [identity.id for identity in manager.query(expression, limit=limit, offset=offset)]
+
+
+QUERIES = [
+    ("is_active", 1, 0),
+    ("interests has 'ethics' and capability.reasoning >= 0.5", None, 0),
+    ("not is_active order by social_score desc", 3, 2),
+]
+
+
+def test_lazy_load_queries_without_loading_everything(tmp_path):
+    manager, path = _populate(tmp_path)
+    lazy = IdentityManager({})
+    lazy.load_from_file(path, lazy=True)
+    total = lazy.identities.pending
+    
+    assert [identity.id for identity in lazy.query("is_active", limit=1)] == \
+        _expected(manager, "is_active", limit=1)
+    assert lazy.identities.pending == total - 1
+    
+    for expression, limit, offset in QUERIES:
+        assert _expected(lazy, expression, limit, offset) == _expected(manager, expression, limit, offset)
+    assert lazy.identities.pending > 0
+
+
+def test_snapshot_queries_without_loading_everything(tmp_path):
+    manager, _ = _populate(tmp_path)
+    snapshot_path = str(tmp_path / "identities.snap")
+    manager.save_snapshot(snapshot_path)
+    
+    restored = IdentityManager({})
+    assert restored.load_snapshot(snapshot_path)
+    total = restored.identities.pending
+    ids = _expected(restored, "is_active order by social_score desc", limit=2, offset=3)
+    assert ids == _expected(manager, "is_active order by social_score desc", limit=2, offset=3)
+    assert restored.identities.pending == total - 2
+    
+    for expression, limit, offset in QUERIES:
+        assert _expected(restored, expression, limit, offset) == \
+            _expected(manager, expression, limit, offset)
+    
+    # 从快照启动后再保存的快照仍包含属性段
+    resaved_path = str(tmp_path / "resaved.snap")
+    restored.save_snapshot(resaved_path)
+    again = IdentityManager({})
+    assert again.load_snapshot(resaved_path)
+    assert _expected(again, "interests has 'ethics'") == _expected(manager, "interests has 'ethics'")
+    assert again.identities.pending == total - len(_expected(manager, "interests has 'ethics'"))
+
+
+def test_deleted_identities_are_not_indexed_in_lazy_mode(tmp_path):
+    manager, path = _populate(tmp_path, count=6)
+    victim = _expected(manager, "is_active", limit=1)[0]
+    manager.delete_identity(victim)
+    manager.save_to_file(path)
+    
+    lazy = IdentityManager({})
+    lazy.load_from_file(path, lazy=True)
+    assert victim not in _expected(lazy, "is_active")
+    assert _expected(lazy, "is_active") == _expected(manager, "is_active")
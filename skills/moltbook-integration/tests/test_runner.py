@@ -0,0 +1,59 @@
+"""多身份运行时：共享组件的关闭"""
+
+import asyncio
+
+from moltbook_integration.core.api_client import MoltbookAPIClient
+from moltbook_integration.core.identity import IdentityManager
+from moltbook_integration.integration.openclaw import OpenClawMoltbookIntegration
+from moltbook_integration.integration.runner import MultiIdentityRunner
+
+
+def _count_closes(client):
+    closes = []
+    original = client.aclose
+    
+    async def aclose():
+        closes.append(True)
+        await original()
+    
+    client.aclose = aclose
+    return closes
+
+
+def test_closing_one_agent_keeps_shared_client_open():
+    manager = IdentityManager({})
+    identities = [manager.create_identity(f"ai_{index}", "测试身份") for index in range(3)]
+    
+    async def scenario():
+        runner = MultiIdentityRunner(max_concurrency=2, identity_manager=manager)
+        agents = runner.add_identities(identities)
+        closes = _count_closes(runner.api_client)
+        for agent in agents[:2]:
+            await agent.close()
+        closed_by_agents = len(closes)
+        await runner.close()
+        return closed_by_agents, len(closes)
+    
+    closed_by_agents, closed_total = asyncio.run(scenario())
+    assert closed_by_agents == 0
+    assert closed_total == 1
+
+
+def test_standalone_integration_closes_its_own_client():
+    manager = IdentityManager({})
+    injected = MoltbookAPIClient({"mode": "simulation"})
+    config = {"moltbook": {"interaction": {"history": {"journal_path": None},
+                                           "action_queue": {"journal_path": None}}}}
+    
+    async def scenario():
+        owner = OpenClawMoltbookIntegration(config=config, identity_manager=manager)
+        borrower = OpenClawMoltbookIntegration(config=config, identity_manager=manager,
+                                               api_client=injected)
+        owned_closes = _count_closes(owner.api_client)
+        injected_closes = _count_closes(injected)
+        await owner.close()
+        await borrower.close()
+        await injected.aclose()
+        return len(owned_closes), len(injected_closes)
+    
+    assert asyncio.run(scenario()) == (1, 1)
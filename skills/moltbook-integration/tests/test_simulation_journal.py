@@ -0,0 +1,74 @@
+"""模拟数据预写日志：回放、截断不完整的尾部、快照之后只回放新记录"""
+
+import json
+import os
+
+from moltbook_integration.core.simulation_journal import SimulationJournal
+
+
+def _write(directory, count, snapshot_interval=1000):
+    journal = SimulationJournal(str(directory), snapshot_interval=snapshot_interval)
+    journal.load()
+    for index in range(count):
+        journal.append("post", {"id": f"post_{index}"})
+    return journal
+
+
+def test_replays_log_after_restart(tmp_path):
+    journal = _write(tmp_path, 3)
+    journal.close()
+    
+    restarted = SimulationJournal(str(tmp_path))
+    snapshot, records = restarted.load()
+    assert snapshot is None
+    assert [record["id"] for record in records] == ["post_0", "post_1", "post_2"]
+    assert [record["seq"] for record in records] == [1, 2, 3]
+    assert restarted.seq == 3
+    assert restarted.pending_entries == 3
+
+
+def test_truncates_torn_tail(tmp_path):
+    journal = _write(tmp_path, 2)
+    journal.close()
+    with open(journal.log_path, 'ab') as f:
+        f.write(b'{"seq": 3, "op": "post", "id": "pos')  # 写入中断
+    intact_size = os.path.getsize(journal.log_path) - len(b'{"seq": 3, "op": "post", "id": "pos')
+    
+    restarted = SimulationJournal(str(tmp_path))
+    _, records = restarted.load()
+    assert [record["seq"] for record in records] == [1, 2]
+    assert os.path.getsize(journal.log_path) == intact_size
+    
+    # 截断后继续追加，序号接在最后一条完整记录之后
+    restarted.append("post", {"id": "post_2"})
+    restarted.close()
+    _, records = SimulationJournal(str(tmp_path)).load()
+    assert [record["seq"] for record in records] == [1, 2, 3]
+
+
+def test_snapshot_clears_log_and_skips_covered_records(tmp_path):
+    journal = _write(tmp_path, 3, snapshot_interval=3)
+    assert journal.needs_snapshot
+    journal.write_snapshot({"posts": ["post_0", "post_1", "post_2"]})
+    assert os.path.getsize(journal.log_path) == 0
+    journal.append("post", {"id": "post_3"})
+    journal.close()
+    
+    snapshot, records = SimulationJournal(str(tmp_path)).load()
+    assert snapshot["seq"] == 3
+    assert snapshot["posts"] == ["post_0", "post_1", "post_2"]
+    assert [record["id"] for record in records] == ["post_3"]
+
+
+def test_crash_between_snapshot_and_log_reset(tmp_path):
+    """快照已落盘但日志未清空时，回放跳过序号不大于快照的记录"""
+    journal = _write(tmp_path, 2)
+    journal.close()
+    with open(journal.snapshot_path, 'w', encoding='utf-8') as f:
+        json.dump({"seq": 2, "posts": ["post_0", "post_1"]}, f)
+    
+    restarted = SimulationJournal(str(tmp_path))
+    snapshot, records = restarted.load()
+    assert snapshot["seq"] == 2
+    assert records == []
+    assert restarted.seq == 2
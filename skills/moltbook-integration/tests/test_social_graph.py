@@ -0,0 +1,81 @@
+"""社交评分：增量边数组、重算节流和评分同步"""
+
+import pytest
+
+from moltbook_integration.core import social_graph
+from moltbook_integration.core.api_client import MoltbookAPIClient
+from moltbook_integration.core.identity import IdentityManager
+from moltbook_integration.core.social_graph import SocialGraph
+
+INTERACTIONS = [("a", "b"), ("b", "c"), ("c", "a"), ("a", "c"), ("d", "a"), ("a", "b")]
+
+
+def _graph(**kwargs):
+    graph = SocialGraph(recompute_interval=0, **kwargs)
+    for source, target in INTERACTIONS:
+        graph.add_reply(source, target)
+    graph.add_likes("c", 3)
+    return graph
+
+
+@pytest.mark.skipif(social_graph.np is None, reason="需要NumPy")
+def test_numpy_and_python_iterations_agree(monkeypatch):
+    expected = _graph().ranks()
+    monkeypatch.setattr(social_graph, "np", None)
+    ranks = _graph().ranks()
+    assert ranks.keys() == expected.keys()
+    for ai_id, rank in ranks.items():
+        assert rank == pytest.approx(expected[ai_id], abs=1e-6)
+
+
+def test_edges_grow_beyond_initial_capacity():
+    incremental = SocialGraph(recompute_interval=0)
+    summed = SocialGraph(recompute_interval=0)
+    for index in range(200):
+        for graph in (incremental, summed):
+            graph.add_reply(f"ai_{index}", f"ai_{(index + 1) % 200}")
+            graph.add_reply(f"ai_{index}", f"ai_{(index + 7) % 200}")
+    # 已有的边只累加权重，与一次加入总权重等价
+    incremental.add_reply("ai_0", "ai_1")
+    incremental.add_reply("ai_0", "ai_1")
+    summed.add_interaction("ai_0", "ai_1", 2 * summed.reply_weight)
+    assert incremental.edge_count == summed.edge_count == 400
+    ranks = incremental.ranks()
+    assert sum(ranks.values()) == pytest.approx(1.0)
+    expected = summed.ranks()
+    for ai_id, rank in ranks.items():
+        assert rank == pytest.approx(expected[ai_id], abs=1e-9)
+    assert ranks["ai_1"] > ranks["ai_7"]
+
+
+def test_recompute_is_throttled_by_default():
+    graph = SocialGraph()
+    graph.add_reply("a", "b")
+    first = graph.score("b")
+    version = graph.version
+    for _ in range(50):
+        graph.add_reply("c", "a")
+        graph.score("a")
+    assert graph.version == version
+    assert graph.score("b") == first
+    assert graph.stats()["dirty"]
+
+
+def test_sync_skips_work_until_the_graph_recomputes():
+    client = MoltbookAPIClient({"mode": "simulation"})
+    manager = IdentityManager({})
+    identities = [manager.create_identity(f"ai_{index}", "测试身份") for index in range(3)]
+    graph = client.store.social_graph
+    graph.recompute_interval = 3600
+    graph.add_reply(identities[0].id, identities[1].id)
+    client.sync_social_scores(manager, force=True)
+    version = graph.version
+    
+    for _ in range(20):
+        graph.add_reply(identities[2].id, identities[0].id)
+        assert client.sync_social_scores(manager) == 0
+    assert graph.version == version
+    
+    graph.recompute_interval = 0
+    assert client.sync_social_scores(manager) > 0
+    assert graph.version == version + 1